@@ -1,10 +1,15 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, UploadFile, File, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+import time
 import traceback
+from typing import Optional
 
 
 from app.services.graph_loader import get_graph
-from app.services.graph_loader import get_graph_data
+from app.services.graph_data import encode_graph_data, get_graph_data, get_graph_data_etag, negotiate_encoding, parse_bbox
 from app.services.graph_loader import load_graph_from_file
 from app.services.process_nodes import process_points_into_graph
 
@@ -15,17 +20,87 @@ from app.services.tsp_solver import solve_tsp_greedy
 from app.utils.path_utils import map_path_indices_to_ids, reconstruct_full_path
 
 from app.services.tsp_solver import solve_tsp_dynamic_programming
-
-from app.services.process_nodes import load_points_from_uploaded_file
+from app.services.tsp_solver import solve_tsp_branch_and_bound
+from app.services.tsp_solver import solve_tsp_local_search, rotate_to_start
+from app.services.tsp_solver import AUTO_MEMORY_BUDGET_MB, AUTO_TIME_BUDGET_S, solve_tsp_auto
+from app.services.tsp_solver import PORTFOLIO_WORKERS, solve_tsp_portfolio
+from app.services.tsp_solver import HeldKarpTooLargeError, solve_tsp_dynamic_programming_parallel
+from app.models.tsp_result import TSPResult
+
+from app.services.process_nodes import load_points_from_uploaded_file, parse_points
 from app.services.graph_loader import get_graph
 
-from app.services.process_nodes import get_selected_nodes
+from app.services.process_nodes import get_selected_nodes, add_selected_point, remove_selected_point
 from app.services.distance_matrix import build_distance_matrix_with_paths,get_distance_matrix, set_distance_matrix
-
-
+from app.services.distance_matrix import add_stop_to_matrix, remove_stop_from_matrix
+from app.services.routing_graph import get_graph_version, graph_lock
+from app.services.route_search import find_route, get_route_search
+from app.services.solve import build_stops_matrix, path_coordinates
+from app.services.result_cache import cache_stats, get_cached_matrix, get_cached_result, store_matrix, store_result
+
+from app.services.graph_loader import graph_summary, parse_graph_file, set_graph, spool_upload, UploadTooLargeError
+from app.services.jobs import cancel_job, job_to_dict, submit_job, wait_for_job
+from app.services.metrics import HTTP_DURATION, HTTP_REQUESTS, REGISTRY, SOLVER_DURATION, stage_timer
+from app.services.workspaces import create_workspace, current_workspace_summary, delete_workspace
+from app.services.workspaces import reset_current_workspace_id, set_current_workspace_id, workspace_exists
+
+
+
+
+#fija el workspace de cada petición a partir del encabezado X-Workspace-Id (sin encabezado se usa "default")
+#un id que no creó POST /workspaces (o que ya se eliminó o venció) responde 404 sin llegar a la ruta
+class WorkspaceMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        workspace_id = dict(scope["headers"]).get(b"x-workspace-id", b"").decode("latin-1").strip()
+        creating = scope["method"] == "POST" and scope["path"] == "/workspaces"
+        if workspace_id and not creating and not workspace_exists(workspace_id):
+            response = JSONResponse(status_code=404, content={"detail": f"Workspace {workspace_id} not found."})
+            return await response(scope, receive, send)
+        token = set_current_workspace_id(workspace_id)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            reset_current_workspace_id(token)
+
+
+#cuenta las peticiones y mide su duración (hasta enviar la respuesta completa) por ruta, método y estado
+#se usa la plantilla de la ruta (/stops/{index}), no la URL, para no crear una serie por cada valor
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        start = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = getattr(scope.get("route"), "path", "unmatched")
+            HTTP_DURATION.labels(method=scope["method"], route=route).observe(time.perf_counter() - start)
+            HTTP_REQUESTS.labels(method=scope["method"], route=route, status=str(status["code"])).inc()
+
+
+#extensiones aceptadas para el grafo (el formato real se reconoce por el contenido)
+_GRAPH_EXTENSIONS = (".osm", ".osm.gz", ".osm.bz2", ".osm.pbf")
+_GRAPH_EXTENSIONS_ERROR = f"Only {', '.join(_GRAPH_EXTENSIONS)} files are supported"
 
 
 app = FastAPI()
+app.add_middleware(WorkspaceMiddleware)
+app.add_middleware(MetricsMiddleware)
 #para que se puedan hacer peticiones al API desde el front
 app.add_middleware(
     CORSMiddleware,
@@ -37,31 +112,52 @@ app.add_middleware(
 
 
 @app.post("/upload-graph")
-async def upload_graph(file: UploadFile = File(...)):
-    if not file.filename.endswith(".osm"):
-        raise HTTPException(status_code=400, detail="Only .osm files are supported")
+def upload_graph(file: UploadFile = File(...)):
+    if not file.filename.endswith(_GRAPH_EXTENSIONS):
+        raise HTTPException(status_code=400, detail=_GRAPH_EXTENSIONS_ERROR)
 
     try:
         result = load_graph_from_file(file.file)
         return result
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
         traceback.print_exc() 
         raise HTTPException(status_code=500, detail=f"Error loading graph: {str(e)}")
 
 
 
+#bbox=min_lon,min_lat,max_lon,max_lat filtra el área visible, zoom (< 16) agrupa los nodos cercanos y
+#format elige json, columnar o binary. La respuesta lleva un ETag según la versión del grafo: con
+#If-None-Match igual se responde 304 sin volver a armarla
 @app.get("/graph-data")
-def graph_data():
+def graph_data(request: Request, bbox: Optional[str] = None, zoom: Optional[int] = None, format: str = "json"):
     try:
-        return get_graph_data()
+        options = {"bbox": parse_bbox(bbox), "zoom": zoom, "format": format}
+        #la etiqueta depende de la codificación negociada: identity, gzip y br no comparten ETag
+        negotiated = negotiate_encoding(request.headers.get("accept-encoding", ""))
+        etag = get_graph_data_etag(**options, encoding=negotiated)
+        headers = {"Vary": "Accept-Encoding, X-Workspace-Id"}
+        if etag is not None:
+            headers["ETag"] = etag
+            if_none_match = request.headers.get("if-none-match", "")
+            if if_none_match.strip() == "*" or etag in [tag.strip() for tag in if_none_match.split(",")]:
+                return Response(status_code=304, headers=headers)
+
+        data = get_graph_data(**options)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+    body, media_type, encoding = encode_graph_data(data, negotiated)
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type=media_type, headers=headers)
+
 
 
 
 @app.post("/upload-points")
-async def upload_points(file: UploadFile = File(...)):
+def upload_points(file: UploadFile = File(...)):
     try:
         G = get_graph()
         node_ids = load_points_from_uploaded_file(file.file, G)
@@ -89,7 +185,7 @@ def build_matrix():
         if not node_ids or len(node_ids) < 2:
             raise HTTPException(status_code=400, detail="At least 2 points are required.")
 
-        matrix = build_distance_matrix_with_paths(G, node_ids)
+        matrix = _build_matrix(G, node_ids)
         set_distance_matrix(matrix)
 
         return {
@@ -103,31 +199,195 @@ def build_matrix():
         raise HTTPException(status_code=500, detail=str(e))
 
 
-#solución de TSP para programación dinámica
-@app.get("/tsp/dynamic")
-def run_held_karp():
+#agrega un punto a la matriz ya construida: solo se calcula la fila y columna nuevas
+@app.post("/stops")
+def add_stop(lat: float, lon: float):
     try:
-        matrix = get_distance_matrix()
-        node_ids = get_selected_nodes()
+        matrix, node_ids = _current_matrix_and_nodes()
+        if len(matrix.distances) != len(node_ids):
+            raise ValueError("The matrix does not match the selected points; rebuild the matrix.")
+
+        with graph_lock:
+            node_id = add_selected_point(get_graph(), lat, lon)
+            try:
+                matrix = add_stop_to_matrix(get_graph(), matrix, node_id)
+            except ValueError:
+                remove_selected_point(len(node_ids))
+                raise
+        set_distance_matrix(matrix)
 
-        if not matrix or not node_ids:
-            raise HTTPException(status_code=400, detail="Missing matrix or selected nodes.")
+        return {
+            "status": "success",
+            "numPoints": len(node_ids) + 1,
+            "index": len(node_ids),
+            "nodeId": node_id
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        traceback.print_exc()
+        raise HTTPException(status_code=400, detail=str(e))
 
-        result = solve_tsp_dynamic_programming(matrix.distances)
 
-        real_path = map_path_indices_to_ids(result.path, node_ids)
-        full_path = reconstruct_full_path(result.path, matrix.paths)
+#quita el punto de la posición index (de la lista de nodos seleccionados) y su fila y columna de la matriz
+@app.delete("/stops/{index}")
+def remove_stop(index: int):
+    try:
+        matrix, node_ids = _current_matrix_and_nodes()
+        if len(matrix.distances) != len(node_ids):
+            raise ValueError("The matrix does not match the selected points; rebuild the matrix.")
+        matrix = remove_stop_from_matrix(matrix, index)
+        node_id = remove_selected_point(index)
+        set_distance_matrix(matrix)
+
+        return {"status": "success", "numPoints": len(node_ids) - 1, "nodeId": node_id}
+    except HTTPException:
+        raise
+    except IndexError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        traceback.print_exc()
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+#ruta entre dos puntos sin construir una matriz: por ids de nodo (source, target) o por coordenadas,
+#que se ubican en el nodo más cercano. algorithm: astar (por defecto) o bidirectional
+@app.get("/route")
+def route(source: Optional[int] = None, target: Optional[int] = None,
+    from_lat: Optional[float] = None, from_lon: Optional[float] = None,
+    to_lat: Optional[float] = None, to_lon: Optional[float] = None,
+    algorithm: str = "astar"):
+    try:
+        G = get_graph()
+        if source is None or target is None:
+            if None in (from_lat, from_lon, to_lat, to_lon):
+                raise ValueError("Provide source and target node ids or from_lat, from_lon, to_lat and to_lon.")
+            search = get_route_search(G)
+            source = search.nearest_node(from_lat, from_lon) if source is None else source
+            target = search.nearest_node(to_lat, to_lon) if target is None else target
+
+        distance, path, visited = find_route(G, source, target, algorithm)
+        if not path:
+            raise HTTPException(status_code=404, detail=f"No route from {source} to {target}.")
 
         return {
             "status": "success",
-            "result": {
-                "algorithmName": result.algorithmName,
-                "path": real_path,  # esto para las estadísticas
-                "total_cost": result.total_cost,
-                "execution_time": result.execution_time
-            },
-            "fullPath": full_path  # esto se dibuja en el mapa (con nodos intermedios)
+            "source": source,
+            "target": target,
+            "distance": distance,
+            "path": path,
+            "visitedNodes": visited
         }
+    except HTTPException:
+        raise
+    except Exception as e:
+        traceback.print_exc()
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+#matriz y nodos seleccionados actuales, necesarios para resolver el TSP
+def _current_matrix_and_nodes():
+    matrix = get_distance_matrix()
+    node_ids = get_selected_nodes()
+
+    if not matrix or not node_ids:
+        raise HTTPException(status_code=400, detail="Missing matrix or selected nodes.")
+
+    return matrix, node_ids
+
+
+#matriz de los puntos dados, del caché si ya se calculó con la misma versión del grafo
+def _build_matrix(G, node_ids):
+    matrix = get_cached_matrix(G, node_ids)
+    if matrix is None:
+        matrix = build_distance_matrix_with_paths(G, node_ids)
+        store_matrix(G, node_ids, matrix)
+    return matrix
+
+
+#resuelve el TSP con el algoritmo dado y arma la respuesta con la ruta en ids reales y el camino completo
+#el resultado se guarda en caché según la huella de la matriz y el algoritmo
+def _tsp_response(solver, matrix, node_ids, algorithm: str, cache_key: Optional[str] = None) -> dict:
+    result = _solve_cached(solver, matrix, algorithm, cache_key)
+
+    real_path = map_path_indices_to_ids(result.path, node_ids)
+    with stage_timer("reconstruct_path"):
+        full_path = reconstruct_full_path(result.path, matrix.paths)
+
+    return {
+        "status": "success",
+        "result": {
+            "algorithmName": result.algorithmName,
+            "path": real_path,  # esto para las estadísticas
+            "total_cost": result.total_cost,
+            "execution_time": result.execution_time,
+            "provenOptimal": result.provenOptimal
+        },
+        "fullPath": full_path  # esto se dibuja en el mapa (con nodos intermedios)
+    }
+
+
+#resultado del algoritmo sobre la matriz, del caché si ya se resolvió la misma matriz con ese algoritmo
+#cache_key distingue ejecuciones del mismo algoritmo con otras opciones (por defecto el nombre del algoritmo)
+def _solve_cached(solver, matrix, algorithm: str, cache_key: Optional[str] = None) -> TSPResult:
+    cache_key = algorithm if cache_key is None else cache_key
+    result = get_cached_result(matrix, cache_key)
+    if result is None:
+        start = time.perf_counter()
+        with stage_timer("solve"):
+            result = solver(matrix.distances)
+        SOLVER_DURATION.labels(algorithm=algorithm).observe(time.perf_counter() - start)
+        store_result(matrix, cache_key, result)
+    return result
+
+
+#algoritmos con presupuesto de tiempo y/o memoria y cantidad de procesos
+_BUDGETED_ALGORITHMS = ("auto", "portfolio", "dynamic-parallel")
+
+
+#auto, portfolio o dynamic-parallel con los presupuestos dados (None = los de AUTO_TIME_BUDGET_S,
+#AUTO_MEMORY_BUDGET_MB, PORTFOLIO_WORKERS y HELD_KARP_WORKERS); retorna (solver, clave de caché): con otro
+#presupuesto el resultado puede ser distinto
+def _budgeted_solver(algorithm: str, time_budget: Optional[float], memory_budget_mb: Optional[float],
+    workers: Optional[int] = None):
+    if time_budget is not None and time_budget <= 0 or memory_budget_mb is not None and memory_budget_mb <= 0:
+        raise HTTPException(status_code=400, detail="Budgets must be positive.")
+    if workers is not None and workers <= 0:
+        raise HTTPException(status_code=400, detail="Workers must be positive.")
+    time_budget = AUTO_TIME_BUDGET_S if time_budget is None else time_budget
+    memory_budget_mb = AUTO_MEMORY_BUDGET_MB if memory_budget_mb is None else memory_budget_mb
+
+    if algorithm == "dynamic-parallel":
+        #el resultado siempre es el óptimo (o un error si no cabe), no depende del presupuesto
+        def solver(distances):
+            return solve_tsp_dynamic_programming_parallel(distances, workers=workers, memory_budget_mb=memory_budget_mb)
+        return solver, "dynamic-parallel"
+
+    if algorithm == "portfolio":
+        workers = PORTFOLIO_WORKERS if workers is None else workers
+
+        def solver(distances):
+            return solve_tsp_portfolio(distances, time_budget_s=time_budget, memory_budget_mb=memory_budget_mb,
+                workers=workers)
+        return solver, f"portfolio?time={time_budget:g}&memory={memory_budget_mb:g}&workers={workers}"
+
+    def solver(distances):
+        return solve_tsp_auto(distances, time_budget_s=time_budget, memory_budget_mb=memory_budget_mb)
+    return solver, f"auto?time={time_budget:g}&memory={memory_budget_mb:g}"
+
+
+#respuesta JSON ya serializada, para medir cuánto toma serializar (el camino completo puede ser largo)
+def _json_response(data: dict) -> JSONResponse:
+    with stage_timer("serialize"):
+        return JSONResponse(content=data)
+
+
+#solución de TSP para programación dinámica
+@app.get("/tsp/dynamic")
+def run_held_karp():
+    try:
+        matrix, node_ids = _current_matrix_and_nodes()
+        return _json_response(_tsp_response(solve_tsp_dynamic_programming, matrix, node_ids, "dynamic"))
 
     except Exception as e:
         import traceback
@@ -139,27 +399,8 @@ def run_held_karp():
 @app.get("/tsp/brute-force")
 def run_brute_force():
     try:
-        matrix = get_distance_matrix()
-        node_ids = get_selected_nodes()
-
-        if not matrix or not node_ids:
-            raise HTTPException(status_code=400, detail="Missing matrix or selected nodes.")
-
-        result = solve_tsp_brute_force(matrix.distances)
-
-        real_path = map_path_indices_to_ids(result.path, node_ids)
-        full_path = reconstruct_full_path(result.path, matrix.paths)
-
-        return {
-            "status": "success",
-            "result": {
-                "algorithmName": result.algorithmName,
-                "path": real_path,
-                "total_cost": result.total_cost,
-                "execution_time": result.execution_time
-            },
-            "fullPath": full_path
-        }
+        matrix, node_ids = _current_matrix_and_nodes()
+        return _json_response(_tsp_response(solve_tsp_brute_force, matrix, node_ids, "brute-force"))
 
     except Exception as e:
         import traceback
@@ -172,34 +413,335 @@ def run_brute_force():
 @app.get("/tsp/greedy")
 def run_greedy():
     try:
-        matrix = get_distance_matrix()
-        node_ids = get_selected_nodes()
+        matrix, node_ids = _current_matrix_and_nodes()
+        return _json_response(_tsp_response(solve_tsp_greedy, matrix, node_ids, "greedy"))
 
-        if not matrix or not node_ids:
-            raise HTTPException(status_code=400, detail="Missing matrix or selected nodes.")
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=str(e))
 
-        result = solve_tsp_greedy(matrix.distances)
 
-        real_path = map_path_indices_to_ids(result.path, node_ids)
-        full_path = reconstruct_full_path(result.path, matrix.paths)
+# Ramificación y poda (exacto)
+@app.get("/tsp/branch-and-bound")
+def run_branch_and_bound():
+    try:
+        matrix, node_ids = _current_matrix_and_nodes()
+        return _json_response(_tsp_response(solve_tsp_branch_and_bound, matrix, node_ids, "branch-and-bound"))
 
-        return {
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# Búsqueda local (2-opt + Or-opt) a partir del greedy
+@app.get("/tsp/local-search")
+def run_local_search():
+    try:
+        matrix, node_ids = _current_matrix_and_nodes()
+        return _json_response(_tsp_response(solve_tsp_local_search, matrix, node_ids, "local-search"))
+
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+#todo el proceso en una sola petición (ubicar los puntos, matriz, TSP y camino completo) sin usar ni
+#modificar el estado del workspace: no inserta nodos en el grafo ni cambia los puntos o la matriz guardados
+#los puntos van en JSON {"stops": [[lat, lon], ...] o [{"lat": .., "lon": ..}, ...], "algorithm": ..,
+#"toleranceM": .., "start": .., "timeBudget": .., "memoryBudgetMB": .., "workers": ..} o como archivo (multipart, campo file, una pareja "lat lon" por línea)
+#con los demás campos en el formulario. algorithm: local-search por defecto; start: índice del punto
+#donde empieza el recorrido
+@app.post("/solve")
+async def solve(request: Request):
+    try:
+        options = await _solve_options(request)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Invalid request: {str(e)}")
+    #el cálculo no debe bloquear el event loop
+    return await run_in_threadpool(_solve, **options)
+
+
+async def _solve_options(request: Request) -> dict:
+    if request.headers.get("content-type", "").startswith("multipart/form-data"):
+        form = await request.form()
+        upload = form.get("file")
+        if upload is None or isinstance(upload, str):
+            raise HTTPException(status_code=400, detail="Missing stops file.")
+        points = parse_points(await upload.read())
+        fields = dict(form)
+    else:
+        fields = await request.json()
+        if not isinstance(fields, dict):
+            raise ValueError("Expected a JSON object.")
+        points = [_parse_stop(stop) for stop in fields.get("stops") or []]
+
+    def number(name: str) -> Optional[float]:
+        value = fields.get(name)
+        return float(value) if value not in (None, "") else None
+
+    return {
+        "points": points,
+        "algorithm": str(fields.get("algorithm") or "local-search"),
+        "tolerance_m": number("toleranceM"),
+        "start": int(fields.get("start") or 0),
+        "time_budget": number("timeBudget"),
+        "memory_budget_mb": number("memoryBudgetMB"),
+        "workers": int(fields["workers"]) if fields.get("workers") not in (None, "") else None,
+    }
+
+
+#un punto como [lat, lon] o {"lat": .., "lon": ..}
+def _parse_stop(stop) -> tuple:
+    if isinstance(stop, dict):
+        return float(stop["lat"]), float(stop["lon"])
+    lat, lon = stop
+    return float(lat), float(lon)
+
+
+def _solve(points: list, algorithm: str, tolerance_m: Optional[float], start: int,
+    time_budget: Optional[float], memory_budget_mb: Optional[float], workers: Optional[int]) -> JSONResponse:
+    solver = _tsp_solvers().get(algorithm)
+    if solver is None:
+        raise HTTPException(status_code=400, detail=f"Unknown algorithm: {algorithm}")
+    cache_key = None
+    if algorithm in _BUDGETED_ALGORITHMS:
+        solver, cache_key = _budgeted_solver(algorithm, time_budget, memory_budget_mb, workers)
+    if len(points) < 2:
+        raise HTTPException(status_code=400, detail="At least 2 points are required.")
+    if not 0 <= start < len(points):
+        raise HTTPException(status_code=400, detail=f"Start index {start} is out of range.")
+
+    try:
+        G = get_graph()
+        stops, matrix = build_stops_matrix(G, points, tolerance_m)
+        result = _solve_cached(solver, matrix, algorithm, cache_key)
+        order = rotate_to_start(result.path, start)
+        node_ids = [stop.node_id for stop in stops]
+
+        with stage_timer("reconstruct_path"):
+            full_path = reconstruct_full_path(order, matrix.paths)
+            coordinates = path_coordinates(matrix.paths.routing, full_path)
+
+        return _json_response({
             "status": "success",
+            "numPoints": len(stops),
+            "stops": [
+                {"nodeId": stop.node_id, "latitude": stop.latitude, "longitude": stop.longitude, "virtual": stop.virtual}
+                for stop in stops
+            ],
             "result": {
                 "algorithmName": result.algorithmName,
-                "path": real_path,  # esto para las estadísticas
+                "order": order,  # posiciones de los puntos recibidos
+                "path": map_path_indices_to_ids(order, node_ids),
                 "total_cost": result.total_cost,
-                "execution_time": result.execution_time
+                "execution_time": result.execution_time,
+                "provenOptimal": result.provenOptimal
             },
-            "fullPath": full_path  # esto se dibuja en el mapa (con nodos intermedios)
-        }
+            #los nodos virtuales no están en el grafo, por eso también van las coordenadas de cada nodo
+            "fullPath": full_path,
+            "fullPathCoordinates": coordinates
+        })
+    except HeldKarpTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=str(e))
+
 
+# Automático: algoritmo exacto si cabe en el tiempo (segundos) y memoria (MB), si no el mejor recorrido
+# que encuentre la búsqueda local iterada hasta el límite de tiempo
+@app.get("/tsp/auto")
+def run_auto(time_budget: Optional[float] = None, memory_budget_mb: Optional[float] = None):
+    try:
+        solver, cache_key = _budgeted_solver("auto", time_budget, memory_budget_mb)
+        matrix, node_ids = _current_matrix_and_nodes()
+        return _json_response(_tsp_response(solver, matrix, node_ids, "auto", cache_key))
+
+    except HTTPException:
+        raise
     except Exception as e:
-        import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# Programación dinámica en varios procesos (workers, por defecto HELD_KARP_WORKERS); si la memoria estimada
+# no cabe en memory_budget_mb (o en la memoria compartida libre) responde 413 sin empezar
+@app.get("/tsp/dynamic-parallel")
+def run_held_karp_parallel(workers: Optional[int] = None, memory_budget_mb: Optional[float] = None):
+    try:
+        solver, cache_key = _budgeted_solver("dynamic-parallel", None, memory_budget_mb, workers)
+        matrix, node_ids = _current_matrix_and_nodes()
+        return _json_response(_tsp_response(solver, matrix, node_ids, "dynamic-parallel", cache_key))
+
+    except HTTPException:
+        raise
+    except HeldKarpTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except Exception as e:
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# Portafolio: varios algoritmos a la vez en procesos distintos (workers, por defecto PORTFOLIO_WORKERS)
+# compartiendo el mejor recorrido; termina cuando uno prueba el óptimo o se acaba el tiempo
+@app.get("/tsp/portfolio")
+def run_portfolio(time_budget: Optional[float] = None, memory_budget_mb: Optional[float] = None,
+    workers: Optional[int] = None):
+    try:
+        solver, cache_key = _budgeted_solver("portfolio", time_budget, memory_budget_mb, workers)
+        matrix, node_ids = _current_matrix_and_nodes()
+        return _json_response(_tsp_response(solver, matrix, node_ids, "portfolio", cache_key))
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+#algoritmos disponibles para /solve y los trabajos en segundo plano (se buscan al momento de la petición)
+def _tsp_solvers() -> dict:
+    return {
+        "brute-force": solve_tsp_brute_force,
+        "dynamic": solve_tsp_dynamic_programming,
+        "greedy": solve_tsp_greedy,
+        "branch-and-bound": solve_tsp_branch_and_bound,
+        "local-search": solve_tsp_local_search,
+        "auto": solve_tsp_auto,
+        "portfolio": solve_tsp_portfolio,
+        "dynamic-parallel": solve_tsp_dynamic_programming_parallel,
+    }
+
+
+# --- Trabajos en segundo plano: retornan un jobId para consultar con GET /jobs/{job_id} ---
+@app.post("/jobs/upload-graph")
+def submit_upload_graph(file: UploadFile = File(...)):
+    if not file.filename.endswith(_GRAPH_EXTENSIONS):
+        raise HTTPException(status_code=400, detail=_GRAPH_EXTENSIONS_ERROR)
+
+    # el archivo del request se cierra al responder, se copia a un temporal que usa el trabajo
+    try:
+        temp = spool_upload(file.file)
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+    def compute():
+        with temp:
+            return parse_graph_file(temp)
+
+    def commit(G):
+        set_graph(G)
+        return graph_summary(G)
+
+    return job_to_dict(submit_job("upload-graph", compute, commit))
+
+
+@app.post("/jobs/build-matrix")
+def submit_build_matrix():
+    try:
+        G = get_graph()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    node_ids = list(get_selected_nodes())
+
+    if not node_ids or len(node_ids) < 2:
+        raise HTTPException(status_code=400, detail="At least 2 points are required.")
+    version = get_graph_version(G)
+
+    def compute():
+        return _build_matrix(G, node_ids)
+
+    #si mientras corría se cargó otro grafo o cambiaron los puntos, la matriz ya no corresponde y no se guarda
+    def commit(matrix):
+        with graph_lock:
+            if get_graph() is not G or get_graph_version(G) != version or list(get_selected_nodes()) != node_ids:
+                raise ValueError("Stale matrix: the graph or the selected points changed while the job was running.")
+            set_distance_matrix(matrix)
+        return {"status": "success", "numPoints": len(node_ids)}
+
+    return job_to_dict(submit_job("build-matrix", compute, commit))
+
+
+#time_budget, memory_budget_mb y workers solo aplican a los algoritmos auto, portfolio y dynamic-parallel
+@app.post("/jobs/tsp/{algorithm}")
+def submit_tsp(algorithm: str, time_budget: Optional[float] = None, memory_budget_mb: Optional[float] = None,
+    workers: Optional[int] = None):
+    solver = _tsp_solvers().get(algorithm)
+    if solver is None:
+        raise HTTPException(status_code=404, detail=f"Unknown algorithm: {algorithm}")
+    cache_key = None
+    if algorithm in _BUDGETED_ALGORITHMS:
+        solver, cache_key = _budgeted_solver(algorithm, time_budget, memory_budget_mb, workers)
+    try:
+        matrix, node_ids = _current_matrix_and_nodes()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return job_to_dict(submit_job(f"tsp/{algorithm}",
+        lambda: _tsp_response(solver, matrix, node_ids, algorithm, cache_key)))
+
+
+#estado del trabajo; con wait > 0 espera hasta esa cantidad de segundos a que termine
+@app.get("/jobs/{job_id}")
+def get_job_status(job_id: str, wait: float = 0.0):
+    try:
+        return job_to_dict(wait_for_job(job_id, min(max(wait, 0.0), 60.0)))
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+
+
+#un trabajo en cola queda "cancelled" de inmediato; uno que ya corre responde "running" con
+#cancelRequested: true hasta que llega a un punto de cancelación (entre bloques de filas de la matriz,
+#capas de Held-Karp, iteraciones de los solvers, etapas de la carga del grafo) y pasa a "cancelled";
+#consultar GET /jobs/{job_id} para saber cuándo se liberó
+@app.delete("/jobs/{job_id}")
+def cancel_job_route(job_id: str):
+    try:
+        return job_to_dict(cancel_job(job_id))
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+
+
+#métricas en formato de texto de Prometheus: duración de las peticiones y de cada etapa, tamaño del grafo
+#y de la matriz, cachés y workspaces
+@app.get("/metrics")
+def get_metrics():
+    return Response(content=generate_latest(REGISTRY), media_type=CONTENT_TYPE_LATEST)
+
+
+#aciertos y fallos de los cachés de matrices y de resultados
+@app.get("/cache/stats")
+def get_cache_stats():
+    return cache_stats()
+
+
+# --- Workspaces: cada cliente trabaja con su propio grafo, puntos y matriz (encabezado X-Workspace-Id) ---
+@app.post("/workspaces")
+def create_workspace_route():
+    workspace = create_workspace()
+    return {"status": "success", "workspaceId": workspace.id}
+
+
+#solo el workspace de la petición (encabezado X-Workspace-Id): los ids de los demás no se publican
+@app.get("/workspaces/current")
+def current_workspace_route():
+    return current_workspace_summary()
+
+
+@app.delete("/workspaces/{workspace_id}")
+def delete_workspace_route(workspace_id: str):
+    if not delete_workspace(workspace_id):
+        raise HTTPException(status_code=404, detail=f"Workspace {workspace_id} not found.")
+    return {"status": "success", "workspaceId": workspace_id}
+
+
 def main():
     # # simular grafo
     # G = get_graph()
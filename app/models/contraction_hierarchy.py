@@ -0,0 +1,21 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+#jerarquía de contracción de un grafo no dirigido: los nodos se contraen uno por uno (rank) y por cada
+#camino que pasaba por el nodo contraído se agrega un atajo entre sus vecinos
+#solo se guardan las aristas hacia nodos de mayor rango: las del índice denso i están en
+#up_neighbors[up_offsets[i]:up_offsets[i + 1]] con su peso en up_weights
+@dataclass(frozen=True)
+class ContractionHierarchy:
+    #ids reales de la copia CSR con la que se armó, la posición es el índice denso
+    node_ids: np.ndarray
+    #orden en que se contrajo cada nodo (0 = el primero)
+    rank: np.ndarray
+    up_offsets: np.ndarray
+    up_neighbors: np.ndarray
+    up_weights: np.ndarray
+    #nodo contraído (índice denso) que reemplaza cada atajo, -1 si es una arista del grafo
+    up_middle: np.ndarray
+    #versión del grafo networkx a partir de la cual se construyó
+    version: int = 0
@@ -1,9 +1,12 @@
 from dataclasses import dataclass
-from typing import List
+from typing import List, Optional, Sequence
 
 @dataclass
 class DistanceMatrixResult:
     #representa distancia desde nodo i hasta nodo j
     distances: List[List[float]]
-    #representa la ruta con la menor distancia para llegar desde i hasta j
-    paths: List[List[List[int]]]
+    #representa la ruta con la menor distancia para llegar desde i hasta j (paths[i][j])
+    #puede ser una lista de listas o MatrixPaths, que arma cada camino solo cuando se pide
+    paths: Sequence[Sequence[List[int]]]
+    #huella de las distancias (para el caché de resultados), None si la matriz no se armó con distance_matrix
+    fingerprint: Optional[str] = None
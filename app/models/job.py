@@ -0,0 +1,24 @@
+from dataclasses import dataclass, field
+from typing import Any, Optional
+import time
+
+#estados posibles de un trabajo
+JOB_PENDING = "pending"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+
+@dataclass
+class Job:
+    id: str
+    kind: str
+    status: str = JOB_PENDING
+    result: Any = None
+    error: Optional[str] = None
+    #se pidió cancelar mientras corría: se detiene en el siguiente punto de cancelación o, si termina antes,
+    #el resultado se descarta
+    cancel_requested: bool = False
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
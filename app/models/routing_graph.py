@@ -0,0 +1,17 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+#copia compacta (CSR) del grafo para rutas: los nodos se numeran con índices densos 0..V-1
+#los vecinos del nodo i están en neighbors[offsets[i]:offsets[i + 1]] con su peso en weights
+@dataclass(frozen=True)
+class RoutingGraph:
+    #ids reales (OSM) ordenados de menor a mayor, la posición es el índice denso
+    node_ids: np.ndarray
+    offsets: np.ndarray
+    neighbors: np.ndarray
+    weights: np.ndarray
+    latitudes: np.ndarray
+    longitudes: np.ndarray
+    #versión del grafo networkx a partir de la cual se construyó
+    version: int = 0
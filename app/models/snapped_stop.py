@@ -0,0 +1,12 @@
+from dataclasses import dataclass
+
+#punto a visitar ubicado sobre el grafo sin modificarlo (POST /solve)
+@dataclass(frozen=True)
+class SnappedStop:
+    #id del nodo en la matriz: un nodo del grafo o uno virtual (mayor a los ids del grafo)
+    node_id: int
+    #coordenadas del punto ya proyectado sobre la arista (o del nodo existente)
+    latitude: float
+    longitude: float
+    #True si el punto no coincide con un nodo del grafo y quedó como nodo virtual sobre una arista
+    virtual: bool
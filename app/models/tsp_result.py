@@ -7,3 +7,5 @@ class TSPResult:
     total_cost: float
     execution_time: float  # en segundos 
     algorithmName: str
+    #True si el recorrido es el óptimo (algoritmo exacto que terminó), False si es el mejor encontrado
+    provenOptimal: bool = False
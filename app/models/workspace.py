@@ -0,0 +1,21 @@
+from dataclasses import dataclass, field
+from typing import List, Optional
+import time
+
+import networkx as nx
+
+from app.models.distance_matrix_result import DistanceMatrixResult
+
+#estado de trabajo de un usuario: grafo, nodos seleccionados y matriz de distancias
+@dataclass
+class Workspace:
+    id: str
+    graph: Optional[nx.Graph] = None
+    #False mientras el grafo sea el grafo base compartido (solo lectura); al insertar puntos se copia
+    owns_graph: bool = False
+    selected_node_ids: List[int] = field(default_factory=list)
+    distance_matrix: Optional[DistanceMatrixResult] = None
+    created_at: float = field(default_factory=time.monotonic)
+    last_access: float = field(default_factory=time.monotonic)
+    #memoria estimada (bytes) de lo que es propio del workspace
+    estimated_bytes: int = 0
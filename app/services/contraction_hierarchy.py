@@ -0,0 +1,378 @@
+import heapq
+import math
+import os
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import networkx as nx
+import numpy as np
+
+from app.models.contraction_hierarchy import ContractionHierarchy
+from app.models.routing_graph import RoutingGraph
+from app.services.graph_cache import load_hierarchy, save_hierarchy
+from app.services.routing_graph import get_routing_graph, graph_lock, splits_since
+
+#"1" arma la jerarquía de contracción al cargar el grafo (o la lee del caché de grafos) y la matriz de
+#distancias se calcula con ella en lugar de un Dijkstra por punto
+CONTRACTION_HIERARCHY = os.environ.get("CONTRACTION_HIERARCHY", "0") == "1"
+
+#nodos que puede fijar la búsqueda de testigos antes de rendirse (se agrega el atajo aunque no haga falta)
+_WITNESS_SETTLED = 60
+
+#punto de entrada a la jerarquía: (índice denso, distancia desde el punto, camino con ids reales hasta él)
+Access = Tuple[int, float, List[int]]
+
+
+#contrae los nodos de menor a mayor prioridad (atajos que agrega - aristas que quita + vecinos ya
+#contraídos), con actualización perezosa de la prioridad. Un atajo u - x por el nodo v se agrega solo si la
+#búsqueda de testigos no encuentra otro camino de u a x igual o más corto que no pase por v
+#requiere un grafo no dirigido (la copia CSR tiene las dos direcciones de cada arista)
+def build_contraction_hierarchy(routing: RoutingGraph) -> ContractionHierarchy:
+    n = len(routing.node_ids)
+    offsets = routing.offsets.tolist()
+    neighbors = routing.neighbors.tolist()
+    weights = routing.weights.tolist()
+
+    #aristas de los nodos sin contraer: vecino -> (peso, nodo que reemplaza o -1)
+    adjacency: List[Dict[int, Tuple[float, int]]] = [
+        {neighbors[k]: (weights[k], -1) for k in range(offsets[u], offsets[u + 1])} for u in range(n)
+    ]
+    contracted_neighbors = [0] * n
+    rank = [0] * n
+    upward: List[List[Tuple[int, float, int]]] = [[] for _ in range(n)]
+
+    def shortcuts(v: int) -> List[Tuple[int, int, float]]:
+        around = list(adjacency[v].items())
+        found = []
+        for i, (u, (weight_u, _)) in enumerate(around[:-1]):
+            targets = {x: weight_u + weight_x for x, (weight_x, _) in around[i + 1:]}
+            witness = _witness_search(adjacency, u, v, max(targets.values()))
+            found.extend((u, x, d) for x, d in targets.items() if witness.get(x, math.inf) > d)
+        return found
+
+    def priority(v: int, found: list) -> int:
+        return len(found) - len(adjacency[v]) + contracted_neighbors[v]
+
+    heap = [(priority(v, shortcuts(v)), v) for v in range(n)]
+    heapq.heapify(heap)
+    order = 0
+    while heap:
+        _, v = heapq.heappop(heap)
+        found = shortcuts(v)
+        current = priority(v, found)
+        if heap and current > heap[0][0]:
+            heapq.heappush(heap, (current, v))
+            continue
+
+        rank[v] = order
+        order += 1
+        upward[v] = [(x, weight, middle) for x, (weight, middle) in adjacency[v].items()]
+        for x in adjacency[v]:
+            del adjacency[x][v]
+            contracted_neighbors[x] += 1
+        adjacency[v] = {}
+        for u, x, d in found:
+            if d < adjacency[u].get(x, (math.inf,))[0]:
+                adjacency[u][x] = (d, v)
+                adjacency[x][u] = (d, v)
+
+    up_offsets = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum([len(edges) for edges in upward], out=up_offsets[1:])
+    edges = [edge for node_edges in upward for edge in node_edges]
+    return ContractionHierarchy(
+        node_ids=routing.node_ids,
+        rank=np.array(rank, dtype=np.int32),
+        up_offsets=up_offsets,
+        up_neighbors=np.array([e[0] for e in edges], dtype=np.int32),
+        up_weights=np.array([e[1] for e in edges], dtype=np.float64),
+        up_middle=np.array([e[2] for e in edges], dtype=np.int32),
+        version=routing.version,
+    )
+
+
+#Dijkstra acotado desde u sin pasar por skip, hasta max_distance o _WITNESS_SETTLED nodos fijados
+#retorna las distancias encontradas (cotas superiores de la distancia real)
+def _witness_search(adjacency, u: int, skip: int, max_distance: float) -> Dict[int, float]:
+    dist = {u: 0.0}
+    heap = [(0.0, u)]
+    settled = 0
+    while heap and settled < _WITNESS_SETTLED:
+        d, w = heapq.heappop(heap)
+        if d > dist[w]:
+            continue
+        if d > max_distance:
+            break
+        settled += 1
+        for x, (weight, _) in adjacency[w].items():
+            nd = d + weight
+            if x != skip and nd < dist.get(x, math.inf):
+                dist[x] = nd
+                heapq.heappush(heap, (nd, x))
+    return dist
+
+
+#jerarquía lista para consultar: aristas hacia arriba como listas de Python y el nodo intermedio de cada atajo
+class HierarchySearch:
+
+    def __init__(self, hierarchy: ContractionHierarchy):
+        self.hierarchy = hierarchy
+        self.version = hierarchy.version
+        self._offsets = hierarchy.up_offsets.tolist()
+        self._neighbors = hierarchy.up_neighbors.tolist()
+        self._weights = hierarchy.up_weights.tolist()
+        middles = hierarchy.up_middle.tolist()
+        self._middle: Dict[Tuple[int, int], int] = {}
+        for v in range(len(hierarchy.node_ids)):
+            for k in range(self._offsets[v], self._offsets[v + 1]):
+                middle = middles[k]
+                if middle >= 0:
+                    self._middle[_pair(v, self._neighbors[k])] = middle
+
+    #índice denso del nodo, None si no existía cuando se armó la jerarquía
+    def dense_index(self, node_id: int) -> Optional[int]:
+        node_ids = self.hierarchy.node_ids
+        k = int(np.searchsorted(node_ids, node_id))
+        if k < len(node_ids) and node_ids[k] == node_id:
+            return k
+        return None
+
+    #Dijkstra solo por aristas hacia nodos de mayor rango, desde uno o más puntos de entrada
+    #retorna (distancias, predecesores) de los nodos fijados del espacio de búsqueda
+    #un nodo al que se llega más corto bajando desde un nodo de mayor rango ya alcanzado no es parte de
+    #ningún camino más corto hacia arriba y se descarta sin expandirlo (stall-on-demand); como el grafo es
+    #no dirigido, las aristas que bajan hacia u son las mismas que suben desde u
+    def upward(self, access: Sequence[Access]) -> Tuple[Dict[int, float], Dict[int, int]]:
+        offsets, neighbors, weights = self._offsets, self._neighbors, self._weights
+        dist: Dict[int, float] = {}
+        pred: Dict[int, int] = {}
+        settled: Dict[int, float] = {}
+        heap = []
+        for node, d, _ in access:
+            if d < dist.get(node, math.inf):
+                dist[node] = d
+                pred[node] = -1
+                heap.append((d, node))
+        heapq.heapify(heap)
+        inf = math.inf
+        while heap:
+            d, u = heapq.heappop(heap)
+            if d > dist[u] or u in settled:
+                continue
+            start, end = offsets[u], offsets[u + 1]
+            stalled = False
+            for k in range(start, end):
+                if dist.get(neighbors[k], inf) + weights[k] < d:
+                    stalled = True
+                    break
+            if stalled:
+                continue
+            settled[u] = d
+            for k in range(start, end):
+                v = neighbors[k]
+                nd = d + weights[k]
+                if nd < dist.get(v, inf):
+                    dist[v] = nd
+                    pred[v] = u
+                    heapq.heappush(heap, (nd, v))
+        return settled, pred
+
+    #reemplaza los atajos del camino (índices densos) por los nodos que representan, retorna ids reales
+    def unpack(self, dense_path: List[int]) -> List[int]:
+        node_ids = self.hierarchy.node_ids
+        path = [int(node_ids[dense_path[0]])]
+        for a, b in zip(dense_path, dense_path[1:]):
+            stack = [(a, b)]
+            while stack:
+                x, y = stack.pop()
+                middle = self._middle.get(_pair(x, y))
+                if middle is None:
+                    path.append(int(node_ids[y]))
+                else:
+                    stack.append((middle, y))
+                    stack.append((x, middle))
+        return path
+
+
+#nodos insertados después de armar la jerarquía (ver routing_graph.record_edge_split): cada uno queda sobre
+#una arista que ya existía, en una cadena [a, ..., b] con su distancia desde a. Se entra a la jerarquía
+#por los dos extremos de la cadena
+class _SplitChains:
+
+    def __init__(self, splits: tuple):
+        #nodo insertado -> cadena (id del primer nodo insertado en esa arista)
+        self.chain_of: Dict[int, int] = {}
+        #cadena -> (nodos en orden de a hasta b, distancia de cada uno desde a)
+        self.chains: Dict[int, Tuple[List[int], List[float]]] = {}
+        for _, u, v, new_id, _, weight_u, weight_v in splits:
+            chain = self.chain_of.get(u, self.chain_of.get(v))
+            if chain is None:
+                chain = new_id
+                self.chains[chain] = ([u, v], [0.0, weight_u + weight_v])
+            nodes, positions = self.chains[chain]
+            i, j = nodes.index(u), nodes.index(v)
+            position = positions[i] + weight_u if j > i else positions[i] - weight_u
+            at = max(i, j)
+            nodes.insert(at, new_id)
+            positions.insert(at, position)
+            self.chain_of[new_id] = chain
+
+    #caminos desde el nodo hasta los dos extremos de su cadena: [(extremo, distancia, camino), ...]
+    def ends(self, node_id: int) -> Optional[List[Tuple[int, float, List[int]]]]:
+        chain = self.chain_of.get(node_id)
+        if chain is None:
+            return None
+        nodes, positions = self.chains[chain]
+        k = nodes.index(node_id)
+        return [
+            (nodes[0], positions[k], nodes[k::-1]),
+            (nodes[-1], positions[-1] - positions[k], nodes[k:]),
+        ]
+
+    #(distancia, camino) sin salir de la cadena entre dos nodos de la misma cadena, None si no lo están
+    def direct(self, source_id: int, target_id: int) -> Optional[Tuple[float, List[int]]]:
+        chain = self.chain_of.get(source_id)
+        if chain is None or chain != self.chain_of.get(target_id):
+            return None
+        nodes, positions = self.chains[chain]
+        i, j = nodes.index(source_id), nodes.index(target_id)
+        path = nodes[i:j + 1] if i <= j else nodes[j:i + 1][::-1]
+        return abs(positions[j] - positions[i]), path
+
+
+#consultas sobre la jerarquía para los nodos del grafo actual: los nodos insertados después de armarla
+#entran por los extremos de su arista. Los caminos quedan con los nodos de la versión de la jerarquía;
+#MatrixPaths completa los saltos por aristas que se dividieron después (version)
+class HierarchyQuery:
+
+    def __init__(self, search: HierarchySearch, splits: tuple):
+        self.search = search
+        self.version = search.version
+        self._chains = _SplitChains(splits)
+
+    def access(self, node_id: int) -> Optional[List[Access]]:
+        dense = self.search.dense_index(node_id)
+        if dense is not None:
+            return [(dense, 0.0, [node_id])]
+        ends = self._chains.ends(node_id)
+        if ends is None:
+            return None
+        return [(self.search.dense_index(end), d, path) for end, d, path in ends]
+
+    #tabla de distancias entre todos los puntos (n x n), None si algún punto no se puede ubicar
+    #cada punto hace una sola búsqueda hacia arriba; la distancia entre dos puntos es el mínimo de
+    #d(a, x) + d(b, x) sobre los nodos x que comparten sus espacios de búsqueda
+    def table(self, node_ids: Sequence[int]) -> Optional[np.ndarray]:
+        access = [self.access(node_id) for node_id in node_ids]
+        if any(entry is None for entry in access):
+            return None
+
+        n = len(node_ids)
+        owners, nodes, dists = [], [], []
+        for i, entry in enumerate(access):
+            dist, _ = self.search.upward(entry)
+            owners.extend([i] * len(dist))
+            nodes.extend(dist.keys())
+            dists.extend(dist.values())
+
+        owners = np.array(owners, dtype=np.int64)
+        nodes = np.array(nodes, dtype=np.int64)
+        dists = np.array(dists, dtype=np.float64)
+        order = np.argsort(nodes, kind="stable")
+        owners, nodes, dists = owners[order], nodes[order], dists[order]
+        bounds = np.flatnonzero(np.diff(nodes)) + 1
+        starts = np.concatenate([[0], bounds])
+        ends = np.concatenate([bounds, [len(nodes)]])
+
+        table = np.full((n, n), np.inf)
+        #un nodo que está en un solo espacio de búsqueda no une a ningún par de puntos
+        for start, end in zip(starts[ends - starts > 1].tolist(), ends[ends - starts > 1].tolist()):
+            group = owners[start:end]
+            d = dists[start:end]
+            block = np.ix_(group, group)
+            table[block] = np.minimum(table[block], d[:, None] + d[None, :])
+
+        #puntos sobre la misma arista: también se puede ir por la arista sin pasar por sus extremos
+        same_chain: Dict[int, List[int]] = {}
+        for i, node_id in enumerate(node_ids):
+            chain = self._chains.chain_of.get(node_id)
+            if chain is not None:
+                same_chain.setdefault(chain, []).append(i)
+        for stops in same_chain.values():
+            for a, i in enumerate(stops):
+                for j in stops[a + 1:]:
+                    d, _ = self._chains.direct(node_ids[i], node_ids[j])
+                    if d < table[i, j]:
+                        table[i, j] = table[j, i] = d
+        np.fill_diagonal(table, 0.0)
+        return table
+
+    #camino más corto (ids reales) entre dos nodos, [] si no hay camino, None si algún nodo no se puede ubicar
+    def path(self, source_id: int, target_id: int) -> Optional[List[int]]:
+        source_access = self.access(source_id)
+        target_access = self.access(target_id)
+        if source_access is None or target_access is None:
+            return None
+        if source_id == target_id:
+            return [source_id]
+
+        source_dist, source_pred = self.search.upward(source_access)
+        target_dist, target_pred = self.search.upward(target_access)
+        best, meeting = math.inf, -1
+        for x, d in source_dist.items():
+            other = target_dist.get(x)
+            if other is not None and d + other < best:
+                best, meeting = d + other, x
+
+        direct = self._chains.direct(source_id, target_id)
+        if direct is not None and direct[0] <= best:
+            return direct[1]
+        if meeting < 0:
+            return []
+
+        up = _tree_path(source_pred, meeting)
+        down = _tree_path(target_pred, meeting)[::-1]
+        middle = self.search.unpack(up + down[1:])
+        prefix = next(path for node, _, path in source_access if node == up[0])
+        suffix = next(path for node, _, path in target_access if node == down[-1])
+        return prefix[:-1] + middle + suffix[::-1][1:]
+
+
+def _tree_path(pred: Dict[int, int], node: int) -> List[int]:
+    path = [node]
+    while pred[path[-1]] != -1:
+        path.append(pred[path[-1]])
+    path.reverse()
+    return path
+
+
+def _pair(u: int, v: int) -> Tuple[int, int]:
+    return (u, v) if u <= v else (v, u)
+
+
+#lee la jerarquía del caché de grafos (clave key) o la arma y la guarda, y la deja en G.graph
+#los grafos dirigidos no usan la jerarquía
+def prepare_contraction_hierarchy(G: nx.Graph, key: str) -> Optional[ContractionHierarchy]:
+    if G.is_directed():
+        return None
+    hierarchy = load_hierarchy(key)
+    if hierarchy is None:
+        hierarchy = build_contraction_hierarchy(get_routing_graph(G))
+        save_hierarchy(key, hierarchy)
+    G.graph["_contraction_hierarchy"] = hierarchy
+    return hierarchy
+
+
+#consultas sobre la jerarquía del grafo en su versión actual, None si el grafo no tiene jerarquía o
+#cambió de otra forma que insertando nodos en aristas
+def get_hierarchy_query(G: nx.Graph) -> Optional[HierarchyQuery]:
+    hierarchy = G.graph.get("_contraction_hierarchy")
+    if hierarchy is None or G.is_directed():
+        return None
+    splits = splits_since(G, hierarchy.version)
+    if splits is None:
+        return None
+    with graph_lock:
+        search = G.graph.get("_hierarchy_search")
+        if search is None or search.hierarchy is not hierarchy:
+            search = HierarchySearch(hierarchy)
+            G.graph["_hierarchy_search"] = search
+    return HierarchyQuery(search, splits)
@@ -0,0 +1,105 @@
+import math
+import networkx as nx
+from typing import Dict, List, Optional, Tuple
+
+from app.services.routing_graph import get_graph_version
+
+#metros por grado de latitud (el menor valor, en el ecuador), así una celda nunca mide menos que la tolerancia
+_METERS_PER_DEGREE = 110_574.0
+_EARTH_RADIUS_M = 6_371_008.8
+
+
+#índice de coordenadas -> nodo y asignador de ids nuevos, se mantiene junto con el grafo
+#la búsqueda exacta es un diccionario (lat, lon) -> id; la búsqueda con tolerancia usa una malla
+#de celdas del tamaño de la tolerancia y solo revisa las 9 celdas alrededor del punto
+class CoordinateIndex:
+
+    def __init__(self, G: nx.Graph):
+        self._coords: Dict[int, Tuple[float, float]] = {}
+        self._exact: Dict[Tuple[float, float], int] = {}
+        for nid, data in G.nodes(data=True):
+            lat, lon = data.get("latitude"), data.get("longitude")
+            self._coords[nid] = (lat, lon)
+            #si hay nodos con las mismas coordenadas se queda con el primero, como el recorrido de G.nodes
+            self._exact.setdefault((lat, lon), nid)
+
+        self._next_id = max(G.nodes) + 1 if G.number_of_nodes() > 0 else 0
+        self._grid: Optional[Dict[Tuple[int, int], List[int]]] = None
+        self._grid_tolerance = 0.0
+        latitudes = [lat for lat, _ in self._coords.values() if lat is not None]
+        max_abs_lat = min(89.0, max(abs(lat) for lat in latitudes)) if latitudes else 0.0
+        self._lon_scale = math.cos(math.radians(max_abs_lat))
+        self.version = get_graph_version(G)
+
+    #copia independiente para una copia del grafo
+    def copy(self) -> "CoordinateIndex":
+        clone = CoordinateIndex.__new__(CoordinateIndex)
+        clone.__dict__.update(self.__dict__)
+        clone._coords = dict(self._coords)
+        clone._exact = dict(self._exact)
+        clone._grid = None
+        return clone
+
+    #nuevo id secuencial (mayor id del grafo + 1) sin recorrer los nodos
+    def allocate_id(self) -> int:
+        new_id = self._next_id
+        self._next_id += 1
+        return new_id
+
+    #registra un nodo insertado en el grafo
+    def add(self, nid: int, lat: float, lon: float, version: int):
+        self._coords[nid] = (lat, lon)
+        self._exact.setdefault((lat, lon), nid)
+        self._next_id = max(self._next_id, nid + 1)
+        if self._grid is not None:
+            self._grid.setdefault(self._cell(lat, lon), []).append(nid)
+        self.version = version
+
+    #busca un nodo con esas coordenadas exactas, o el más cercano a menos de tolerance_m metros
+    def find(self, lat: float, lon: float, tolerance_m: float = 0.0) -> Optional[int]:
+        existing = self._exact.get((lat, lon))
+        if existing is not None or tolerance_m <= 0:
+            return existing
+
+        if self._grid is None or self._grid_tolerance != tolerance_m:
+            self._build_grid(tolerance_m)
+
+        best = None
+        best_distance = tolerance_m
+        cx, cy = self._cell(lat, lon)
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                for nid in self._grid.get((cx + dx, cy + dy), ()):
+                    distance = _haversine_m(lat, lon, *self._coords[nid])
+                    if distance <= best_distance:
+                        best, best_distance = nid, distance
+        return best
+
+    def _build_grid(self, tolerance_m: float):
+        self._grid_tolerance = tolerance_m
+        self._grid = {}
+        for nid, (lat, lon) in self._coords.items():
+            if lat is not None and lon is not None:
+                self._grid.setdefault(self._cell(lat, lon), []).append(nid)
+
+    #celda de la malla; en longitud se escala con el coseno de la mayor latitud del grafo
+    def _cell(self, lat: float, lon: float) -> Tuple[int, int]:
+        size = self._grid_tolerance / _METERS_PER_DEGREE
+        return math.floor(lat / size), math.floor(lon * self._lon_scale / size)
+
+
+def _haversine_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlmb = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    return 2 * _EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+
+#retorna el índice de coordenadas del grafo; se arma al cargar el grafo y se guarda en G.graph
+def get_coordinate_index(G: nx.Graph) -> CoordinateIndex:
+    index = G.graph.get("_coordinate_index")
+    if index is None or index.version != get_graph_version(G):
+        index = CoordinateIndex(G)
+        G.graph["_coordinate_index"] = index
+    return index
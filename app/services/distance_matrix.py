@@ -1,52 +1,252 @@
+import math
+import multiprocessing
+import os
 import networkx as nx
-from typing import List
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Tuple
 from app.models.distance_matrix_result import DistanceMatrixResult
+from app.models.routing_graph import RoutingGraph
+from app.services.contraction_hierarchy import get_hierarchy_query
+from app.services.jobs import raise_if_cancelled
+from app.services.matrix_paths import MatrixPaths
+from app.services.metrics import MATRIX_POINTS, timed
+from app.services.result_cache import matrix_fingerprint
+from app.services.routing_graph import as_csgraph, get_edge_splits, get_routing_graph
+from app.services.routing_graph import node_indices, shortest_path_trees, splits_since
+from scipy.sparse.csgraph import dijkstra
+from app.services.workspaces import current_workspace, set_workspace_distance_matrix
 from typing import Optional
 
 
 
 
 
-_last_distance_matrix: Optional[DistanceMatrixResult] = None
 
+#número de procesos y tamaño de bloque (filas por tarea) para construir la matriz en paralelo
+#con 1 proceso la matriz se construye en el proceso actual
+MATRIX_WORKERS = int(os.environ.get("MATRIX_WORKERS", "1"))
+MATRIX_CHUNK_SIZE = int(os.environ.get("MATRIX_CHUNK_SIZE", "0"))
+#memoria máxima para guardar los árboles de predecesores de la matriz; si no caben los caminos se recalculan
+MATRIX_PATHS_BUDGET_MB = float(os.environ.get("MATRIX_PATHS_BUDGET_MB", "256"))
+
+#celdas (filas x nodos del grafo) que se calculan en cada llamada a Dijkstra
+_SEARCH_BATCH_CELLS = 1 << 22
+
+#copia de solo lectura del grafo dentro de cada proceso trabajador
+_worker_routing: Optional[RoutingGraph] = None
+_worker_csgraph = None
+
+#la última matriz construida en el workspace de la petición
 def get_distance_matrix() -> DistanceMatrixResult:
-    if _last_distance_matrix is None:
+    matrix = current_workspace().distance_matrix
+    if matrix is None:
         raise ValueError("Distance matrix has not been built yet.")
-    return _last_distance_matrix
+    return matrix
 
 def set_distance_matrix(matrix: DistanceMatrixResult):
-    global _last_distance_matrix
-    _last_distance_matrix = matrix
+    set_workspace_distance_matrix(matrix)
+
+
+#Dijkstra de un lote de filas sobre la copia CSR, retorna [(i, distancias a los nodos de la matriz, predecesores), ...]
+#los predecesores (arreglo de V enteros) solo se retornan si keep_predecessors
+#cada búsqueda se corta en limits[i] (ver _row_limits): solo se recorre la zona del grafo que alcanza para
+#fijar los puntos que necesita la fila, no todo el grafo
+def _compute_rows(routing: RoutingGraph, csgraph, indices: np.ndarray, rows: List[int], keep_predecessors: bool,
+    limits: np.ndarray) -> List[Tuple[int, np.ndarray, Optional[np.ndarray]]]:
+
+    result = []
+    #se limita el tamaño del lote para no crear matrices (filas x V) demasiado grandes
+    batch = max(1, _SEARCH_BATCH_CELLS // max(1, len(routing.node_ids)))
+    #scipy acepta un solo límite por llamada: las filas con límites parecidos van en el mismo lote
+    rows = sorted(rows, key=lambda i: limits[i])
+
+    for start in range(0, len(rows), batch):
+        #en los procesos del pool no hay un trabajo actual y no hace nada
+        raise_if_cancelled()
+        block = rows[start:start + batch]
+        dist, pred = shortest_path_trees(routing, indices[block], csgraph, limit=max(limits[i] for i in block))
+
+        for r, i in enumerate(block):
+            #si no hay un camino hasta ese nodo (no debería pasar ya que es grafo conexo) queda en infinito
+            result.append((i, dist[r, indices], pred[r].copy() if keep_predecessors else None))
+
+    return result
+
+
+#se ejecuta una vez por proceso: guarda la copia del grafo que se envía al crear el pool
+def _init_matrix_worker(routing: RoutingGraph):
+    global _worker_routing, _worker_csgraph
+    _worker_routing = routing
+    _worker_csgraph = as_csgraph(routing)
+
+
+def _compute_rows_in_worker(indices: np.ndarray, rows: List[int], keep_predecessors: bool, limits: np.ndarray):
+    return _compute_rows(_worker_routing, _worker_csgraph, indices, rows, keep_predecessors, limits)
+
+
+#reparte las filas entre procesos, el grafo se envía una sola vez a cada proceso (initializer)
+#los procesos se crean con spawn y no con fork: el pool se abre desde hilos de peticiones y de trabajos, y
+#con fork el proceso hijo puede heredar un lock tomado por otro hilo (p. ej. graph_lock) y quedarse bloqueado
+def _compute_rows_parallel(routing: RoutingGraph, indices: np.ndarray, n: int, keep_predecessors: bool,
+    limits: np.ndarray, workers: int, chunk_size: int):
+    if chunk_size <= 0:
+        chunk_size = max(1, math.ceil(n / (workers * 4)))
+    chunks = [list(range(start, min(start + chunk_size, n))) for start in range(0, n, chunk_size)]
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_matrix_worker, initargs=(routing,)) as pool:
+        futures = [pool.submit(_compute_rows_in_worker, indices, rows, keep_predecessors, limits) for rows in chunks]
+        try:
+            for future in futures:
+                yield from future.result()
+                raise_if_cancelled()
+        except BaseException:
+            #al cancelar (o si falla un bloque) los bloques que siguen en cola no se calculan
+            pool.shutdown(cancel_futures=True)
+            raise
+
+
+#distancia hasta la que debe llegar la búsqueda de cada fila para fijar todos los puntos que necesita
+#con el primer punto como pivote p: d(i, j) <= d(i, p) + d(p, j), así que basta con
+#d(i, p) + max d(p, j) sobre las columnas j de la fila (j > i en grafos no dirigidos)
+#cuesta una búsqueda completa sin predecesores desde p (dos en grafos dirigidos), a cambio cada fila solo
+#recorre la zona de los puntos; si algún punto no se alcanza desde p el límite queda en infinito
+def _row_limits(csgraph, indices: np.ndarray, symmetric: bool) -> np.ndarray:
+    n = len(indices)
+    from_pivot = dijkstra(csgraph, directed=True, indices=indices[0])[indices]
+    to_pivot = from_pivot if symmetric else dijkstra(csgraph.T, directed=True, indices=indices[0])[indices]
+
+    if symmetric:
+        #máximo de from_pivot[j] para j > i
+        farthest = np.empty(n, dtype=np.float64)
+        farthest[-1] = 0.0
+        farthest[:-1] = np.maximum.accumulate(from_pivot[::-1])[::-1][1:]
+    else:
+        farthest = np.full(n, from_pivot.max())
+    limits = to_pivot + farthest
+    #margen para que los redondeos de la suma no dejen afuera un punto justo en el borde
+    return limits * (1 + 1e-9) + 1e-9
 
 
 #construye matriz de distancia para usar en los algoritmos
 #recibe grafo y lista de nodos que se quieren visitar, retorna objeto con matriz de distancias y caminos
-    #lo hace con shortest path
-def build_distance_matrix_with_paths(G: nx.Graph, node_ids: List[int]
+    #hace un solo Dijkstra por fila (no uno por pareja) sobre la copia CSR del grafo, cortado a la distancia
+    #que alcanza para fijar los puntos de la fila (ver _row_limits), y en grafos no dirigidos
+    #aprovecha la simetría: la columna se llena con la fila
+    #los caminos no se arman aquí: se guarda el árbol de predecesores de cada fila (si caben en
+    #MATRIX_PATHS_BUDGET_MB, si no se recalculan al pedirlos) y cada camino se arma con paths[i][j]
+    #con workers > 1 las filas se reparten en un ProcessPoolExecutor (por defecto MATRIX_WORKERS)
+    #si el grafo tiene jerarquía de contracción (CONTRACTION_HIERARCHY) la tabla sale de ella, sin Dijkstra
+@timed("build_matrix")
+def build_distance_matrix_with_paths(G: nx.Graph, node_ids: List[int],
+    workers: Optional[int] = None, chunk_size: Optional[int] = None
 ) -> DistanceMatrixResult:
-    
+
     n = len(node_ids)
-    #inicializa con 0
-    distances = [[0.0 for _ in range(n)] for _ in range(n)]
-    #inicializa con listas vacías
-    paths = [[[] for _ in range(n)] for _ in range(n)]
-
-    for i in range(n):
-        for j in range(n):
-            #cuando un nodo se evalúa a si mismo
-            if i == j:
-                distances[i][j] = 0.0
-                paths[i][j] = [node_ids[i]]
-            else:
-                try:
-                    #funciones shortest path -> usan Dijkstra dado que se le pasa weight. Si no se le pasa usa BFS
-                    path = nx.shortest_path(G, source=node_ids[i], target=node_ids[j], weight="weight") #usa atributo llamado weight en la arista
-                    dist = nx.shortest_path_length(G, source=node_ids[i], target=node_ids[j], weight="weight")
-                    distances[i][j] = dist
-                    paths[i][j] = path
-                    #si no hay un camino hasta ese nodo (no debería pasar ya que es grafo conexo)
-                except nx.NetworkXNoPath:
-                    distances[i][j] = float('inf')
-                    paths[i][j] = []
-
-    return DistanceMatrixResult(distances=distances, paths=paths)
+    MATRIX_POINTS.set(n)
+    symmetric = not G.is_directed()
+    routing = get_routing_graph(G)
+
+    hierarchy = get_hierarchy_query(G)
+    table = hierarchy.table(node_ids) if hierarchy is not None and n > 1 else None
+    if table is not None:
+        paths = MatrixPaths(routing, node_ids, [None] * n, symmetric, get_edge_splits(G), legs=hierarchy)
+        distances = table.tolist()
+        return DistanceMatrixResult(distances=distances, paths=paths, fingerprint=matrix_fingerprint(distances))
+
+    return matrix_from_routing(routing, node_ids, symmetric, get_edge_splits(G), workers, chunk_size)
+
+
+#matriz de distancias (con Dijkstra por fila) sobre una copia CSR, sin pasar por el grafo networkx
+#sirve también para copias CSR con nodos que no están en el grafo (ver routing_graph.extend_routing_graph)
+def matrix_from_routing(routing: RoutingGraph, node_ids: List[int], symmetric: bool, splits: tuple = (),
+    workers: Optional[int] = None, chunk_size: Optional[int] = None
+) -> DistanceMatrixResult:
+
+    n = len(node_ids)
+    workers = MATRIX_WORKERS if workers is None else workers
+    chunk_size = MATRIX_CHUNK_SIZE if chunk_size is None else chunk_size
+    indices = node_indices(routing, node_ids)
+
+    #en grafos no dirigidos la última fila ya queda completa por simetría
+    last_row = n - 1 if symmetric else n
+    #un arreglo de predecesores (int32) por fila
+    keep_predecessors = last_row * len(routing.node_ids) * 4 <= MATRIX_PATHS_BUDGET_MB * 1024 * 1024
+
+    csgraph = as_csgraph(routing)
+    limits = _row_limits(csgraph, indices, symmetric) if n > 0 else np.zeros(0)
+
+    if workers > 1 and n > 2:
+        rows = _compute_rows_parallel(routing, indices, last_row, keep_predecessors, limits, workers, chunk_size)
+    else:
+        rows = _compute_rows(routing, csgraph, indices, list(range(last_row)), keep_predecessors, limits)
+
+    distances = np.zeros((n, n), dtype=np.float64)
+    predecessors: List[Optional[np.ndarray]] = [None] * n
+    for i, dist_row, pred in rows:
+        if symmetric:
+            distances[i, i + 1:] = dist_row[i + 1:]
+            distances[i + 1:, i] = dist_row[i + 1:]
+        else:
+            distances[i] = dist_row
+        predecessors[i] = pred
+    #cuando un nodo se evalúa a si mismo
+    np.fill_diagonal(distances, 0.0)
+
+    trees = [(routing, pred) if pred is not None else None for pred in predecessors]
+    paths = MatrixPaths(routing, node_ids, trees, symmetric, splits)
+    distances = distances.tolist()
+    return DistanceMatrixResult(distances=distances, paths=paths, fingerprint=matrix_fingerprint(distances))
+
+
+#agrega un punto al final de la matriz calculando solo su fila y su columna (un Dijkstra, dos si el
+#grafo es dirigido); las demás distancias se conservan. Insertar nodos para puntos nuevos no cambia las
+#distancias entre los nodos que ya existían (la arista se divide en dos que suman lo mismo), cualquier
+#otro cambio del grafo obliga a reconstruir la matriz
+@timed("add_stop")
+def add_stop_to_matrix(G: nx.Graph, matrix: DistanceMatrixResult, node_id: int) -> DistanceMatrixResult:
+    paths = _incremental_paths(matrix)
+    if splits_since(G, paths.version) is None:
+        raise ValueError("The graph changed since the matrix was built; rebuild the matrix.")
+
+    routing = get_routing_graph(G)
+    indices = node_indices(routing, paths.node_ids + [node_id])
+    csgraph = as_csgraph(routing)
+    dist, pred = shortest_path_trees(routing, [indices[-1]], csgraph)
+    row = dist[0, indices]
+    if paths.symmetric:
+        column = row
+    else:
+        column = dijkstra(csgraph.T, directed=True, indices=indices[-1])[indices]
+    row[-1] = 0.0
+
+    distances = [old + [float(column[i])] for i, old in enumerate(matrix.distances)] + [row.tolist()]
+    tree = None
+    if paths.nbytes + pred[0].nbytes <= MATRIX_PATHS_BUDGET_MB * 1024 * 1024:
+        tree = (routing, pred[0])
+    return DistanceMatrixResult(
+        distances=distances,
+        paths=paths.with_stop(routing, node_id, tree, get_edge_splits(G)),
+        fingerprint=matrix_fingerprint(distances),
+    )
+
+
+#quita el punto de la posición index de la matriz, sin recalcular nada
+def remove_stop_from_matrix(matrix: DistanceMatrixResult, index: int) -> DistanceMatrixResult:
+    paths = _incremental_paths(matrix)
+    if not 0 <= index < len(paths):
+        raise IndexError(f"Stop {index} is not in the matrix.")
+
+    distances = [row[:index] + row[index + 1:] for k, row in enumerate(matrix.distances) if k != index]
+    return DistanceMatrixResult(
+        distances=distances,
+        paths=paths.without_stop(index),
+        fingerprint=matrix_fingerprint(distances),
+    )
+
+
+def _incremental_paths(matrix: DistanceMatrixResult) -> MatrixPaths:
+    if not isinstance(matrix.paths, MatrixPaths):
+        raise ValueError("The matrix does not support incremental updates; rebuild the matrix.")
+    return matrix.paths
@@ -0,0 +1,108 @@
+import networkx as nx
+import numpy as np
+import shapely
+from shapely.geometry import LineString, Point
+from shapely.strtree import STRtree
+from typing import Dict, List, Optional, Tuple
+
+from app.services.routing_graph import get_graph_version
+
+
+#índice espacial (STRtree) de las aristas del grafo para encontrar la arista más cercana a un punto
+#el árbol se arma una vez con los segmentos originales; cuando una arista se divide, las dos mitades
+#quedan sobre el mismo segmento, así que el árbol sigue sirviendo y solo se actualiza la lista
+#de aristas vivas de ese segmento
+class EdgeIndex:
+
+    def __init__(self, G: nx.Graph):
+        edges = list(G.edges())
+        coords = np.empty((len(edges), 2, 2), dtype=np.float64)
+        for k, (u, v) in enumerate(edges):
+            # shapely espera coordenadas como (x, y) = (lon, lat)
+            coords[k, 0] = (G.nodes[u]["longitude"], G.nodes[u]["latitude"])
+            coords[k, 1] = (G.nodes[v]["longitude"], G.nodes[v]["latitude"])
+
+        self._tree = STRtree(shapely.linestrings(coords)) if edges else None
+        #segmento original -> aristas del grafo que hoy lo cubren
+        self._segments: List[List[Tuple[int, int]]] = [[edge] for edge in edges]
+        #arista (u, v) -> segmentos donde está (más de uno si hay aristas paralelas)
+        self._segments_of: Dict[Tuple[int, int], List[int]] = {}
+        for k, (u, v) in enumerate(edges):
+            self._segments_of.setdefault(_edge_key(u, v), []).append(k)
+        #orden de inserción de los nodos, define el orden en que G.edges() recorre las aristas
+        self._position: Dict[int, int] = {node: k for k, node in enumerate(G.nodes)}
+        self.version = get_graph_version(G)
+
+    #copia independiente para una copia del grafo; el árbol (inmutable) se comparte
+    def copy(self) -> "EdgeIndex":
+        clone = EdgeIndex.__new__(EdgeIndex)
+        clone._tree = self._tree
+        clone._segments = [list(live) for live in self._segments]
+        clone._segments_of = {key: list(segments) for key, segments in self._segments_of.items()}
+        clone._position = dict(self._position)
+        clone.version = self.version
+        return clone
+
+    #retorna ((u, v), línea) de la arista más cercana al punto (distancia perpendicular en lon/lat)
+    #si hay empate se queda con la primera arista en el orden de G.edges(), igual que el recorrido completo
+    def nearest_edge(self, G: nx.Graph, point: Point) -> Optional[Tuple[Tuple[int, int], LineString]]:
+        if self._tree is None:
+            return None
+
+        #distancia al segmento original más cercano; las aristas vivas pueden diferir en el último decimal,
+        #por eso se revisan todos los segmentos dentro de un margen mínimo
+        _, distances = self._tree.query_nearest(point, return_distance=True)
+        radius = float(distances.min()) * (1 + 1e-9) + 1e-12
+        candidates = self._tree.query(point, predicate="dwithin", distance=radius)
+
+        best = None
+        for k in candidates.tolist():
+            for a, b in self._segments[k]:
+                #misma orientación con la que G.edges() reporta la arista
+                u, v = (a, b) if self._position[a] <= self._position[b] else (b, a)
+                line = LineString([
+                    (G.nodes[u]["longitude"], G.nodes[u]["latitude"]),
+                    (G.nodes[v]["longitude"], G.nodes[v]["latitude"])
+                ])
+                distance = point.distance(line)
+                if best is None or distance < best[0] or (
+                    distance == best[0] and self._edge_rank(G, u, v) < self._edge_rank(G, *best[1])
+                ):
+                    best = (distance, (u, v), line)
+
+        if best is None:
+            return None
+        return best[1], best[2]
+
+    #posición de la arista en el recorrido de G.edges(): (posición de u, posición de v entre los vecinos de u)
+    def _edge_rank(self, G: nx.Graph, u: int, v: int) -> Tuple[int, int]:
+        return self._position[u], list(G.adj[u]).index(v)
+
+    #registra que la arista (u, v) se reemplazó por (u, new_id) y (new_id, v)
+    def split_edge(self, u: int, v: int, new_id: int, version: int):
+        key = _edge_key(u, v)
+        segment = self._segments_of[key].pop()
+        if not self._segments_of[key]:
+            del self._segments_of[key]
+
+        live = self._segments[segment]
+        position = live.index((u, v)) if (u, v) in live else live.index((v, u))
+        live[position:position + 1] = [(u, new_id), (new_id, v)]
+        self._segments_of.setdefault(_edge_key(u, new_id), []).append(segment)
+        self._segments_of.setdefault(_edge_key(new_id, v), []).append(segment)
+        self._position[new_id] = len(self._position)
+        self.version = version
+
+
+def _edge_key(u: int, v: int) -> Tuple[int, int]:
+    return (u, v) if u <= v else (v, u)
+
+
+#retorna el índice de aristas del grafo; se arma al cargar el grafo y se guarda en G.graph
+#si el grafo cambió por fuera de insert_node_into_graph se vuelve a armar
+def get_edge_index(G: nx.Graph) -> EdgeIndex:
+    index = G.graph.get("_edge_index")
+    if index is None or index.version != get_graph_version(G):
+        index = EdgeIndex(G)
+        G.graph["_edge_index"] = index
+    return index
@@ -0,0 +1,76 @@
+import networkx as nx
+import numpy as np
+
+#elipsoide WGS84 (el mismo que usa geopy.distance.geodesic)
+_WGS84_A = 6_378_137.0
+_WGS84_F = 1 / 298.257223563
+#radio medio de la Tierra para haversine
+_EARTH_RADIUS_M = 6_371_008.8
+
+#métodos para el peso (metros) de las aristas:
+#   "osmnx": usa el atributo length que calcula osmnx (largo siguiendo la geometría de la vía);
+#            las aristas sin length se calculan con "ellipsoidal"
+#   "ellipsoidal": fórmula de Andoyer-Lambert sobre WGS84 entre los extremos de la arista. Frente a
+#            geodesic (Karney) el error relativo es menor a 2e-6 (menos de 2 mm en una arista de 1 km)
+#   "haversine": esfera de radio medio entre los extremos, error relativo de hasta 0.56 % frente a geodesic
+WEIGHT_METHODS = ("osmnx", "ellipsoidal", "haversine")
+
+
+#distancia en metros entre arreglos de coordenadas (grados) en una esfera
+def haversine_m(lat1: np.ndarray, lon1: np.ndarray, lat2: np.ndarray, lon2: np.ndarray) -> np.ndarray:
+    phi1, phi2 = np.radians(lat1), np.radians(lat2)
+    dphi = phi2 - phi1
+    dlmb = np.radians(np.asarray(lon2) - np.asarray(lon1))
+    h = np.sin(dphi / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(dlmb / 2) ** 2
+    return 2 * _EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(h, 0.0, 1.0)))
+
+
+#distancia en metros entre arreglos de coordenadas (grados) en el elipsoide WGS84 (Andoyer-Lambert):
+#ángulo central entre las latitudes reducidas corregido a primer orden por el achatamiento
+def ellipsoidal_m(lat1: np.ndarray, lon1: np.ndarray, lat2: np.ndarray, lon2: np.ndarray) -> np.ndarray:
+    beta1 = np.arctan((1 - _WGS84_F) * np.tan(np.radians(lat1)))
+    beta2 = np.arctan((1 - _WGS84_F) * np.tan(np.radians(lat2)))
+    dlmb = np.radians(np.asarray(lon2) - np.asarray(lon1))
+
+    h = np.sin((beta2 - beta1) / 2) ** 2 + np.cos(beta1) * np.cos(beta2) * np.sin(dlmb / 2) ** 2
+    sigma = 2 * np.arcsin(np.sqrt(np.clip(h, 0.0, 1.0)))
+
+    p = (beta1 + beta2) / 2
+    q = (beta2 - beta1) / 2
+    with np.errstate(divide="ignore", invalid="ignore"):
+        x = (sigma - np.sin(sigma)) * np.sin(p) ** 2 * np.cos(q) ** 2 / np.cos(sigma / 2) ** 2
+        y = (sigma + np.sin(sigma)) * np.cos(p) ** 2 * np.sin(q) ** 2 / np.sin(sigma / 2) ** 2
+        distance = _WGS84_A * (sigma - _WGS84_F / 2 * (x + y))
+    #puntos iguales: la corrección queda 0/0
+    return np.where(sigma > 0, distance, 0.0)
+
+
+#calcula el peso de todas las aristas en una sola pasada vectorizada y lo guarda en el atributo weight
+def assign_edge_weights(G: nx.Graph, method: str = "osmnx"):
+    if method not in WEIGHT_METHODS:
+        raise ValueError(f"Unknown weight method: {method}. Use one of {', '.join(WEIGHT_METHODS)}.")
+
+    edges = list(G.edges(data=True))
+    if not edges:
+        return
+
+    latitudes = {nid: lat for nid, lat in G.nodes(data="latitude")}
+    longitudes = {nid: lon for nid, lon in G.nodes(data="longitude")}
+    lat1 = np.fromiter((latitudes[u] for u, _, _ in edges), dtype=np.float64, count=len(edges))
+    lon1 = np.fromiter((longitudes[u] for u, _, _ in edges), dtype=np.float64, count=len(edges))
+    lat2 = np.fromiter((latitudes[v] for _, v, _ in edges), dtype=np.float64, count=len(edges))
+    lon2 = np.fromiter((longitudes[v] for _, v, _ in edges), dtype=np.float64, count=len(edges))
+
+    if method == "haversine":
+        weights = haversine_m(lat1, lon1, lat2, lon2)
+    else:
+        weights = ellipsoidal_m(lat1, lon1, lat2, lon2)
+
+    if method == "osmnx":
+        lengths = np.fromiter(
+            (data.get("length", np.nan) for _, _, data in edges), dtype=np.float64, count=len(edges)
+        )
+        weights = np.where(np.isnan(lengths), weights, lengths)
+
+    for (_, _, data), weight in zip(edges, weights.tolist()):
+        data["weight"] = weight
@@ -0,0 +1,195 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from collections import deque
+from typing import List, Optional, Tuple
+
+import networkx as nx
+import numpy as np
+
+from app.models.contraction_hierarchy import ContractionHierarchy
+from app.models.routing_graph import RoutingGraph
+
+#carpeta del caché de grafos procesados; vacío desactiva el caché
+GRAPH_CACHE_DIR = os.environ.get("GRAPH_CACHE_DIR", os.path.join(tempfile.gettempdir(), "tsp-graph-cache"))
+
+#se incrementa cuando cambia lo que se guarda, así no se leen cachés con otro formato
+_CACHE_FORMAT = 1
+
+#copia CSR guardada junto al grafo; se abre con mmap (solo lectura) y no se copia a memoria
+_ROUTING_FIELDS = ("node_ids", "offsets", "neighbors", "weights", "latitudes", "longitudes")
+#jerarquía de contracción (opcional), en la subcarpeta hierarchy del grafo
+_HIERARCHY_FIELDS = ("node_ids", "rank", "up_offsets", "up_neighbors", "up_weights", "up_middle")
+
+
+#clave del caché: contenido del archivo + método con el que se calcularon los pesos
+def cache_key(content_hash: str, weight_method: str) -> str:
+    return hashlib.sha256(f"{content_hash}:{weight_method}:{_CACHE_FORMAT}".encode()).hexdigest()
+
+
+def _cache_path(key: str) -> Optional[str]:
+    if not GRAPH_CACHE_DIR:
+        return None
+    return os.path.join(GRAPH_CACHE_DIR, key)
+
+
+#guarda el grafo procesado (nodos, coordenadas, aristas con su peso y la copia CSR) como arreglos .npy
+#se escribe en una carpeta temporal y se renombra al final para que nunca quede un caché a medias
+def save_graph(key: str, G: nx.Graph, routing: RoutingGraph):
+    path = _cache_path(key)
+    if path is None or os.path.isdir(path):
+        return
+
+    os.makedirs(GRAPH_CACHE_DIR, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix=f".{key}-", dir=GRAPH_CACHE_DIR)
+    try:
+        node_ids = np.fromiter(G.nodes, dtype=np.int64, count=G.number_of_nodes())
+        arrays = {
+            "node_ids": node_ids,
+            "node_latitudes": np.array([G.nodes[n]["latitude"] for n in G.nodes], dtype=np.float64),
+            "node_longitudes": np.array([G.nodes[n]["longitude"] for n in G.nodes], dtype=np.float64),
+        }
+
+        edges = [
+            (u, v, k, data.get("weight", 1.0), data.get("length", np.nan))
+            for u, v in _insertion_order(G)
+            for k, data in G[u][v].items()
+        ]
+        arrays["edge_sources"] = np.array([e[0] for e in edges], dtype=np.int64)
+        arrays["edge_targets"] = np.array([e[1] for e in edges], dtype=np.int64)
+        arrays["edge_keys"] = np.array([e[2] for e in edges], dtype=np.int64)
+        arrays["edge_weights"] = np.array([e[3] for e in edges], dtype=np.float64)
+        arrays["edge_lengths"] = np.array([e[4] for e in edges], dtype=np.float64)
+
+        for field in _ROUTING_FIELDS:
+            arrays[f"routing_{field}"] = getattr(routing, field)
+
+        for name, array in arrays.items():
+            np.save(os.path.join(staging, f"{name}.npy"), array)
+
+        with open(os.path.join(staging, "meta.json"), "w") as f:
+            json.dump({"format": _CACHE_FORMAT, "crs": G.graph.get("crs")}, f)
+
+        os.replace(staging, path)
+    except OSError:
+        #otro proceso ya guardó el mismo grafo (la carpeta destino existe) o no hay espacio:
+        #el caché es opcional, se sigue sin él
+        shutil.rmtree(staging, ignore_errors=True)
+
+
+#carga el grafo guardado con esa clave, o None si no está en el caché
+#la copia CSR queda lista en G.graph (con la versión 0 del grafo), abierta con mmap
+def load_graph(key: str) -> Optional[nx.Graph]:
+    path = _cache_path(key)
+    if path is None or not os.path.isdir(path):
+        return None
+
+    try:
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        if meta.get("format") != _CACHE_FORMAT:
+            return None
+
+        def load(name: str, mmap: bool = False) -> np.ndarray:
+            return np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r" if mmap else None)
+
+        G = nx.MultiGraph()
+        if meta.get("crs") is not None:
+            G.graph["crs"] = meta["crs"]
+
+        latitudes = load("node_latitudes").tolist()
+        longitudes = load("node_longitudes").tolist()
+        G.add_nodes_from(
+            (nid, {"latitude": lat, "longitude": lon, "y": lat, "x": lon})
+            for nid, lat, lon in zip(load("node_ids").tolist(), latitudes, longitudes)
+        )
+
+        lengths = load("edge_lengths")
+        G.add_edges_from(
+            (u, v, k, {"weight": w} if np.isnan(length) else {"weight": w, "length": length})
+            for u, v, k, w, length in zip(
+                load("edge_sources").tolist(), load("edge_targets").tolist(), load("edge_keys").tolist(),
+                load("edge_weights").tolist(), lengths.tolist()
+            )
+        )
+
+        G.graph["_routing_graph"] = RoutingGraph(
+            **{field: load(f"routing_{field}", mmap=True) for field in _ROUTING_FIELDS}, version=0
+        )
+        return G
+    except (OSError, ValueError, KeyError):
+        #caché dañado o incompleto: se vuelve a procesar el archivo
+        return None
+
+
+#guarda la jerarquía de contracción junto al grafo ya guardado con esa clave (versión 0 del grafo)
+def save_hierarchy(key: str, hierarchy: ContractionHierarchy):
+    path = _cache_path(key)
+    if path is None or not os.path.isdir(path) or os.path.isdir(os.path.join(path, "hierarchy")):
+        return
+
+    staging = tempfile.mkdtemp(prefix=".hierarchy-", dir=path)
+    try:
+        for field in _HIERARCHY_FIELDS:
+            np.save(os.path.join(staging, f"{field}.npy"), getattr(hierarchy, field))
+        os.replace(staging, os.path.join(path, "hierarchy"))
+    except OSError:
+        shutil.rmtree(staging, ignore_errors=True)
+
+
+#jerarquía de contracción guardada para esa clave (abierta con mmap), o None
+def load_hierarchy(key: str) -> Optional[ContractionHierarchy]:
+    path = _cache_path(key)
+    if path is None or not os.path.isdir(os.path.join(path, "hierarchy")):
+        return None
+    try:
+        return ContractionHierarchy(
+            **{field: np.load(os.path.join(path, "hierarchy", f"{field}.npy"), mmap_mode="r")
+               for field in _HIERARCHY_FIELDS},
+            version=0,
+        )
+    except (OSError, ValueError):
+        return None
+
+
+#parejas de vecinos en un orden de inserción que reproduce el orden de G.adj de cada nodo,
+#así el grafo cargado recorre nodos y aristas igual que el original (los desempates dependen de ese orden)
+def _insertion_order(G: nx.Graph) -> List[Tuple[int, int]]:
+    neighbors = {u: list(G.adj[u]) for u in G}
+    head = {u: 0 for u in G}
+
+    def at_head(u: int, v: int) -> bool:
+        return head[u] < len(neighbors[u]) and neighbors[u][head[u]] == v
+
+    #una pareja se puede insertar cuando es la siguiente en el orden de sus dos extremos
+    def ready_pair(u: int) -> Optional[Tuple[int, int]]:
+        if head[u] >= len(neighbors[u]):
+            return None
+        v = neighbors[u][head[u]]
+        return (u, v) if at_head(v, u) else None
+
+    order = []
+    pending = deque(pair for pair in map(ready_pair, G) if pair is not None)
+    done = set()
+    while pending:
+        u, v = pending.popleft()
+        if (u, v) in done or (v, u) in done:
+            continue
+        done.add((u, v))
+        order.append((u, v))
+        head[u] += 1
+        if v != u:
+            head[v] += 1
+        for w in (u, v):
+            pair = ready_pair(w)
+            if pair is not None:
+                pending.append(pair)
+
+    #no debería pasar (el grafo original se armó en algún orden), pero si quedan parejas se agregan al final
+    for u, v in G.edges():
+        if (u, v) not in done and (v, u) not in done:
+            done.add((u, v))
+            order.append((u, v))
+    return order
@@ -0,0 +1,244 @@
+import gzip
+import hashlib
+import json
+import struct
+from typing import Optional, Tuple, Union
+
+import networkx as nx
+import numpy as np
+import shapely
+from shapely import STRtree
+
+from app.services.routing_graph import get_graph_version, graph_lock
+from app.services.workspaces import current_workspace
+
+#brotli es opcional: si no está instalado se usa gzip
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+GRAPH_DATA_FORMATS = ("json", "columnar", "binary")
+
+#desde este zoom (escala de mapas web, 0 = mundo entero) se envían todos los nodos
+_DETAIL_ZOOM = 16
+#por debajo de _DETAIL_ZOOM los nodos se agrupan en celdas de este tamaño en pixeles de pantalla
+_CLUSTER_PIXELS = 24
+#coordenadas enteras en grados * 1e7 (resolución ~1 cm) en los formatos columnar y binary
+_COORDINATE_SCALE = 10_000_000
+#las respuestas más pequeñas no se comprimen
+_MIN_COMPRESS_BYTES = 1024
+
+#sufijo de la ETag por codificación: cada codificación es una representación distinta y no comparte etiqueta
+_ENCODING_SUFFIX = {"br": "-br", "gzip": "-gz"}
+
+#formato binary (little-endian): encabezado "TSPG", versión, flags, nodos, aristas y luego los arreglos
+#ids (int64), lat y lon (int32, grados * 1e7), count (uint32, solo si flags & 1), from y to (uint32, posición del nodo)
+_BINARY_MAGIC = b"TSPG"
+_BINARY_VERSION = 1
+_BINARY_HAS_COUNTS = 1
+
+BoundingBox = Tuple[float, float, float, float]
+
+
+#nodos y aristas del grafo como arreglos, con árboles espaciales para filtrar por área visible
+#se arma una vez por versión del grafo y se guarda en G.graph
+class GraphDataIndex:
+
+    def __init__(self, G: nx.Graph):
+        nodes = list(G.nodes)
+        position = {nid: k for k, nid in enumerate(nodes)}
+        self.node_ids = np.array(nodes, dtype=np.int64)
+        self.latitudes = np.array([G.nodes[n]["latitude"] for n in nodes], dtype=np.float64)
+        self.longitudes = np.array([G.nodes[n]["longitude"] for n in nodes], dtype=np.float64)
+
+        #mismas aristas y en el mismo orden que G.edges()
+        edges = list(G.edges())
+        self.sources = np.array([position[u] for u, _ in edges], dtype=np.int64)
+        self.targets = np.array([position[v] for _, v in edges], dtype=np.int64)
+
+        self._node_tree = STRtree(shapely.points(self.longitudes, self.latitudes))
+        segments = np.stack([
+            np.column_stack([self.longitudes[self.sources], self.latitudes[self.sources]]),
+            np.column_stack([self.longitudes[self.targets], self.latitudes[self.targets]]),
+        ], axis=1)
+        self._edge_tree = STRtree(shapely.linestrings(segments)) if len(edges) else None
+        self.version = get_graph_version(G)
+
+    #posiciones de los nodos y aristas dentro del área; se incluyen las aristas que cruzan el área
+    #aunque sus extremos queden por fuera (y esos extremos, para poder dibujarlas)
+    def select(self, bbox: Optional[BoundingBox]) -> Tuple[np.ndarray, np.ndarray]:
+        if bbox is None:
+            return np.arange(len(self.node_ids)), np.arange(len(self.sources))
+
+        area = shapely.box(*bbox)
+        edges = np.sort(self._edge_tree.query(area, predicate="intersects")) if self._edge_tree is not None \
+            else np.empty(0, dtype=np.int64)
+        nodes = np.union1d(
+            self._node_tree.query(area, predicate="intersects"),
+            np.concatenate([self.sources[edges], self.targets[edges]]),
+        )
+        return nodes.astype(np.int64), edges
+
+
+def get_graph_data_index(G: nx.Graph) -> GraphDataIndex:
+    with graph_lock:
+        index = G.graph.get("_graph_data_index")
+        if index is None or index.version != get_graph_version(G):
+            index = GraphDataIndex(G)
+            G.graph["_graph_data_index"] = index
+        return index
+
+
+#"min_lon,min_lat,max_lon,max_lat" -> tupla (o None si no se envía)
+def parse_bbox(value: Optional[str]) -> Optional[BoundingBox]:
+    if value is None or value == "":
+        return None
+    try:
+        min_lon, min_lat, max_lon, max_lat = (float(part) for part in value.split(","))
+    except ValueError:
+        raise ValueError("bbox must be min_lon,min_lat,max_lon,max_lat.")
+    if min_lon > max_lon or min_lat > max_lat:
+        raise ValueError("bbox must be min_lon,min_lat,max_lon,max_lat.")
+    return min_lon, min_lat, max_lon, max_lat
+
+
+#etiqueta que cambia cuando cambia el grafo (o los parámetros), None si no hay grafo cargado
+#encoding es la codificación negociada (negotiate_encoding): cuerpos con distinta codificación tienen etiquetas distintas
+def get_graph_data_etag(bbox: Optional[BoundingBox] = None, zoom: Optional[int] = None,
+    format: str = "json", encoding: Optional[str] = None) -> Optional[str]:
+    G = current_workspace().graph
+    if G is None:
+        return None
+    identity = G.graph.get("graph_key") or f"graph-{id(G)}"
+    digest = hashlib.sha1(f"{identity}:{get_graph_version(G)}:{bbox}:{zoom}:{format}".encode()).hexdigest()
+    return f'"{digest[:32]}{_ENCODING_SUFFIX.get(encoding, "")}"'
+
+
+#nodos y aristas del grafo para dibujar el mapa
+#   bbox: solo lo que está dentro del área; zoom < 16: nodos agrupados en celdas (con su cantidad en count)
+#   format: "json" (lista de objetos), "columnar" (un arreglo por campo, coordenadas enteras con delta)
+#   o "binary" (bytes, ver _BINARY_MAGIC)
+def get_graph_data(bbox: Optional[BoundingBox] = None, zoom: Optional[int] = None,
+    format: str = "json") -> Union[dict, bytes]:
+    G = current_workspace().graph
+    if G is None:
+        raise ValueError("Graph not loaded yet.")
+    if format not in GRAPH_DATA_FORMATS:
+        raise ValueError(f"Unknown format: {format}. Use one of {', '.join(GRAPH_DATA_FORMATS)}.")
+
+    index = get_graph_data_index(G)
+    nodes, edges = index.select(bbox)
+    ids = index.node_ids[nodes]
+    latitudes = index.latitudes[nodes]
+    longitudes = index.longitudes[nodes]
+    #posición de cada nodo dentro de la respuesta
+    local = np.full(len(index.node_ids), -1, dtype=np.int64)
+    local[nodes] = np.arange(len(nodes))
+    sources = local[index.sources[edges]]
+    targets = local[index.targets[edges]]
+    counts = None
+
+    if zoom is not None and zoom < _DETAIL_ZOOM and len(nodes):
+        ids, latitudes, longitudes, counts, sources, targets = _cluster(
+            ids, latitudes, longitudes, sources, targets, zoom
+        )
+
+    if format == "columnar":
+        return _columnar(ids, latitudes, longitudes, counts, sources, targets)
+    if format == "binary":
+        return _binary(ids, latitudes, longitudes, counts, sources, targets)
+
+    id_list = ids.tolist()
+    node_list = [
+        {"id": nid, "lat": lat, "lon": lon}
+        for nid, lat, lon in zip(id_list, latitudes.tolist(), longitudes.tolist())
+    ]
+    if counts is not None:
+        for node, count in zip(node_list, counts.tolist()):
+            node["count"] = count
+    edge_list = [{"from": id_list[a], "to": id_list[b]} for a, b in zip(sources.tolist(), targets.tolist())]
+    return {"nodes": node_list, "edges": edge_list}
+
+
+#agrupa los nodos en celdas de _CLUSTER_PIXELS pixeles al zoom dado: cada celda queda como un nodo
+#(id del primer nodo de la celda, posición promedio) y las aristas entre celdas distintas se dejan una vez
+def _cluster(ids, latitudes, longitudes, sources, targets, zoom: int):
+    cell = 360.0 / (256 * 2 ** max(zoom, 0)) * _CLUSTER_PIXELS
+    cells = np.column_stack([np.floor(longitudes / cell), np.floor(latitudes / cell)]).astype(np.int64)
+    _, first, cluster_of, counts = np.unique(cells, axis=0, return_index=True, return_inverse=True,
+        return_counts=True)
+    cluster_of = cluster_of.ravel()
+
+    cluster_lat = np.bincount(cluster_of, weights=latitudes) / counts
+    cluster_lon = np.bincount(cluster_of, weights=longitudes) / counts
+
+    a, b = cluster_of[sources], cluster_of[targets]
+    keep = a != b
+    pairs = np.unique(np.column_stack([np.minimum(a, b), np.maximum(a, b)])[keep], axis=0).reshape(-1, 2)
+    return ids[first], cluster_lat, cluster_lon, counts, pairs[:, 0], pairs[:, 1]
+
+
+def _to_fixed(values: np.ndarray) -> np.ndarray:
+    return np.round(values * _COORDINATE_SCALE).astype(np.int64)
+
+
+#un arreglo por campo; lat y lon en grados * 1e7 codificados como diferencias con el nodo anterior
+#(el primero es absoluto), las aristas usan la posición del nodo en los arreglos
+def _columnar(ids, latitudes, longitudes, counts, sources, targets) -> dict:
+    nodes = {
+        "id": ids.tolist(),
+        "lat": np.diff(_to_fixed(latitudes), prepend=0).tolist(),
+        "lon": np.diff(_to_fixed(longitudes), prepend=0).tolist(),
+    }
+    if counts is not None:
+        nodes["count"] = counts.tolist()
+    return {
+        "format": "columnar",
+        "coordinateScale": _COORDINATE_SCALE,
+        "coordinateEncoding": "delta",
+        "nodes": nodes,
+        "edges": {"from": sources.tolist(), "to": targets.tolist()},
+    }
+
+
+def _binary(ids, latitudes, longitudes, counts, sources, targets) -> bytes:
+    flags = _BINARY_HAS_COUNTS if counts is not None else 0
+    parts = [
+        _BINARY_MAGIC + struct.pack("<IIII", _BINARY_VERSION, flags, len(ids), len(sources)),
+        ids.astype("<i8").tobytes(),
+        _to_fixed(latitudes).astype("<i4").tobytes(),
+        _to_fixed(longitudes).astype("<i4").tobytes(),
+    ]
+    if counts is not None:
+        parts.append(counts.astype("<u4").tobytes())
+    parts.append(sources.astype("<u4").tobytes())
+    parts.append(targets.astype("<u4").tobytes())
+    return b"".join(parts)
+
+
+#codificación de la respuesta según Accept-Encoding: "br" (si brotli está instalado), "gzip" o None
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    accepted = {part.split(";")[0].strip().lower() for part in accept_encoding.split(",")}
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+#cuerpo de la respuesta con la codificación negociada, retorna (cuerpo, content-type, content-encoding)
+#los cuerpos pequeños se envían sin comprimir
+def encode_graph_data(data: Union[dict, bytes], encoding: Optional[str]) -> Tuple[bytes, str, Optional[str]]:
+    if isinstance(data, bytes):
+        body, media_type = data, "application/octet-stream"
+    else:
+        body, media_type = json.dumps(data, separators=(",", ":")).encode(), "application/json"
+
+    if len(body) < _MIN_COMPRESS_BYTES:
+        return body, media_type, None
+    if encoding == "br":
+        return brotli.compress(body, quality=5), media_type, "br"
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=6), media_type, "gzip"
+    return body, media_type, None
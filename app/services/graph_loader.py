@@ -1,61 +1,61 @@
 import networkx as nx #para grafos
-from geopy.distance import geodesic #para distancias
 
 import osmnx as ox #para cargar archivo OSM en el grafo
 
 from typing import BinaryIO
+import bz2
+import gzip
+import hashlib
+import os
+import tempfile
 
-# variable para el grafo, al inicio es nulo
-_loaded_graph: nx.Graph | None = None
+from app.services.contraction_hierarchy import CONTRACTION_HIERARCHY, prepare_contraction_hierarchy
+from app.services.coordinate_index import get_coordinate_index
+from app.services.edge_weights import assign_edge_weights
+from app.services.graph_cache import cache_key
+from app.services.graph_cache import load_graph as load_cached_graph, save_graph as save_cached_graph
+from app.services.jobs import raise_if_cancelled
+from app.services.metrics import GRAPH_EDGES, GRAPH_NODES, timed
+from app.services.edge_index import get_edge_index
+from app.services.routing_graph import get_routing_graph
+from app.services.workspaces import current_workspace, find_base_graph, register_base_graph
+from app.services.workspaces import set_workspace_graph
 
+#método con el que se calcula el peso de las aristas (ver edge_weights.WEIGHT_METHODS), forma parte de la clave del caché
+WEIGHT_METHOD = os.environ.get("EDGE_WEIGHT_METHOD", "osmnx")
 
-def get_graph() -> nx.Graph:
-    if _loaded_graph is None:
-        raise ValueError("No graph has been loaded yet.")
-    return _loaded_graph
+#tamaño máximo del archivo subido; el archivo se copia a disco por bloques y se corta al pasar el límite
+MAX_UPLOAD_MB = float(os.environ.get("MAX_UPLOAD_MB", "1024"))
+#un archivo comprimido puede crecer a lo sumo esta cantidad de veces al descomprimirlo
+_MAX_COMPRESSION_RATIO = 20
+_CHUNK_SIZE = 1 << 20
 
-#carga el grafo desde un archivo XML recibido (por upload)
-import networkx as nx
-import osmnx as ox
-from geopy.distance import geodesic
-from typing import BinaryIO
-import tempfile
 
-_loaded_graph: nx.Graph | None = None
+#el archivo (o su contenido descomprimido) supera el tamaño permitido
+class UploadTooLargeError(ValueError):
+    pass
 
+
+#grafo del workspace de la petición
 def get_graph() -> nx.Graph:
-    if _loaded_graph is None:
+    G = current_workspace().graph
+    if G is None:
         raise ValueError("No graph has been loaded yet.")
-    return _loaded_graph
-
-#carga el grafo desde un archivo XML recibido (por upload)
-def load_graph_from_file(file: BinaryIO) -> dict:
-    global _loaded_graph
-
-    # Guardar archivo en un archivo temporal
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".osm") as temp:
-        temp.write(file.read())
-        temp_path = temp.name
-
-    # Cargar el grafo desde el archivo temporal
-    G = ox.graph_from_xml(temp_path, simplify=True)
+    return G
 
-    if G.is_directed():
-        G = G.to_undirected()
+#el grafo es del workspace de la petición (encabezado X-Workspace-Id); cargarlo borra los puntos y la matriz
+def set_graph(G: nx.Graph):
+    set_workspace_graph(G)
 
-    for node_id, data in G.nodes(data=True):
-        data["latitude"] = data.get("y")
-        data["longitude"] = data.get("x")
 
-    for u, v, data in G.edges(data=True):
-        node_1 = G.nodes[u]
-        node_2 = G.nodes[v]
-        coord_1 = (node_1["latitude"], node_1["longitude"])
-        coord_2 = (node_2["latitude"], node_2["longitude"])
-        data["weight"] = geodesic(coord_1, coord_2).meters
+#carga el grafo desde un archivo XML recibido (por upload)
+def load_graph_from_file(file: BinaryIO) -> dict:
+    G = parse_graph_file(file)
+    set_graph(G)
+    return graph_summary(G)
 
-    _loaded_graph = G
 
+def graph_summary(G: nx.Graph) -> dict:
     return {
         "status": "success",
         "nodes": G.number_of_nodes(),
@@ -63,23 +63,130 @@ def load_graph_from_file(file: BinaryIO) -> dict:
     }
 
 
+#arma el grafo (con pesos e índices) a partir del archivo, sin reemplazar el grafo cargado
+#acepta .osm en XML, comprimido con gzip o bz2, o .osm.pbf (si está instalado osmium); el formato se
+#reconoce por los primeros bytes. El archivo nunca se lee completo a memoria: se copia a disco por bloques
+#si otro workspace ya cargó un archivo con el mismo contenido se reutiliza ese grafo (solo lectura);
+#si el archivo ya se procesó antes (aunque el servidor se haya reiniciado) se lee del caché en disco
+@timed("load_graph")
+def parse_graph_file(file: BinaryIO) -> nx.Graph:
+    #los archivos temporales se borran al terminar, también si hay un error
+    with tempfile.TemporaryDirectory(prefix="osm-upload-") as workdir:
+        upload_path = os.path.join(workdir, "upload")
+        limit = _upload_limit()
+        with open(upload_path, "wb") as target:
+            content_hash = _copy_limited(file, target, limit)
+
+        key = cache_key(content_hash, WEIGHT_METHOD)
+        shared = find_base_graph(key)
+        if shared is not None:
+            return shared
+
+        G = load_cached_graph(key)
+        if G is None:
+            #como trabajo en segundo plano se puede cancelar entre las etapas (la lectura con osmnx no se corta)
+            xml_path = _to_osm_xml(upload_path, workdir, limit * _MAX_COMPRESSION_RATIO)
+            raise_if_cancelled()
+            G = _graph_from_osm(xml_path)
+            raise_if_cancelled()
+            #se guarda en disco para las próximas cargas del mismo archivo
+            save_cached_graph(key, G, get_routing_graph(G))
+
+    #copia compacta (CSR) que usan las rutas y la matriz de distancias (ya viene del caché si se leyó de ahí)
+    get_routing_graph(G)
+    #índice espacial de aristas para ubicar los puntos que se suben
+    get_edge_index(G)
+    #índice de coordenadas -> nodo y asignador de ids para los puntos nuevos
+    get_coordinate_index(G)
+    #jerarquía de contracción para la matriz de distancias (opcional, se guarda junto al grafo en el caché)
+    if CONTRACTION_HIERARCHY:
+        prepare_contraction_hierarchy(G, key)
+
+    G.graph["graph_key"] = key
+    register_base_graph(key, G)
+    GRAPH_NODES.set(G.number_of_nodes())
+    GRAPH_EDGES.set(G.number_of_edges())
+    return G
+
+
+#copia el archivo subido a un temporal (con el mismo límite de tamaño) para leerlo cuando la petición
+#ya terminó, p. ej. desde un trabajo en segundo plano; lanza UploadTooLargeError sin dejar el temporal
+def spool_upload(file: BinaryIO) -> BinaryIO:
+    temp = tempfile.TemporaryFile()
+    try:
+        _copy_limited(file, temp, _upload_limit())
+    except BaseException:
+        temp.close()
+        raise
+    temp.seek(0)
+    return temp
+
+
+def _upload_limit() -> int:
+    return int(MAX_UPLOAD_MB * 1024 * 1024)
+
+
+#copia por bloques hasta limit bytes, retorna el sha256 de lo copiado
+def _copy_limited(source: BinaryIO, target: BinaryIO, limit: int) -> str:
+    digest = hashlib.sha256()
+    total = 0
+    while True:
+        chunk = source.read(_CHUNK_SIZE)
+        if not chunk:
+            return digest.hexdigest()
+        raise_if_cancelled()
+        total += len(chunk)
+        if total > limit:
+            raise UploadTooLargeError(f"File exceeds the maximum size of {limit // (1024 * 1024)} MB.")
+        digest.update(chunk)
+        target.write(chunk)
+
+
+#retorna la ruta de un .osm en XML: descomprime gzip/bz2 y convierte PBF, el XML plano se usa tal cual
+def _to_osm_xml(path: str, workdir: str, limit: int) -> str:
+    with open(path, "rb") as f:
+        header = f.read(16)
+
+    xml_path = os.path.join(workdir, "graph.osm")
+    if header.startswith(b"\x1f\x8b"):
+        opener = gzip.open
+    elif header.startswith(b"BZh"):
+        opener = bz2.open
+    elif b"OSMHeader" in header:
+        _pbf_to_xml(path, xml_path)
+        return xml_path
+    else:
+        return path
+
+    with opener(path, "rb") as source, open(xml_path, "wb") as target:
+        _copy_limited(source, target, limit)
+    return xml_path
+
+
+#PBF -> XML con pyosmium (dependencia opcional)
+def _pbf_to_xml(pbf_path: str, xml_path: str):
+    try:
+        import osmium
+    except ImportError:
+        raise ValueError("Reading .osm.pbf files requires the osmium package.")
+
+    with osmium.SimpleWriter(xml_path) as writer:
+        for obj in osmium.FileProcessor(pbf_path):
+            writer.add(obj)
+
+
+#procesa el XML: carga con osmnx, pasa a no dirigido y calcula el peso (metros) de todas las aristas
+def _graph_from_osm(temp_path: str) -> nx.Graph:
+    # Cargar el grafo desde el archivo temporal
+    G = ox.graph_from_xml(temp_path, simplify=True)
 
+    if G.is_directed():
+        G = G.to_undirected()
 
+    for node_id, data in G.nodes(data=True):
+        data["latitude"] = data.get("y")
+        data["longitude"] = data.get("x")
 
+    assign_edge_weights(G, WEIGHT_METHOD)
 
-def get_graph_data() -> dict:
-    if _loaded_graph is None:
-        raise ValueError("Graph not loaded yet.")
-
-    nodes = [
-        {"id": nid, "lat": data["latitude"], "lon": data["longitude"]}
-        for nid, data in _loaded_graph.nodes(data=True)
-    ]
-
-    edges = [
-        {"from": u, "to": v}
-        for u, v in _loaded_graph.edges()
-    ]
-
-    return {"nodes": nodes, "edges": edges}
-
+    return G
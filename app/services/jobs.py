@@ -0,0 +1,150 @@
+import contextvars
+import os
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from app.models.job import Job, JOB_CANCELLED, JOB_FAILED, JOB_PENDING, JOB_RUNNING, JOB_SUCCEEDED
+
+#cantidad de trabajos que se ejecutan a la vez (el resto espera en cola)
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "2"))
+#trabajos terminados que se conservan para consultar su resultado
+JOB_HISTORY_LIMIT = int(os.environ.get("JOB_HISTORY_LIMIT", "200"))
+
+_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="job")
+#trabajo que corre en el hilo actual (None fuera de un trabajo), para los puntos de cancelación
+_current_job: contextvars.ContextVar[Optional[Job]] = contextvars.ContextVar("job", default=None)
+_jobs: "OrderedDict[str, Job]" = OrderedDict()
+_futures: Dict[str, Future] = {}
+_lock = threading.Lock()
+#los pasos que cambian el estado compartido (grafo, matriz) se aplican de a uno
+_commit_lock = threading.Lock()
+
+
+#se pidió cancelar el trabajo que corre en este hilo
+class JobCancelledError(Exception):
+    pass
+
+
+#encola un trabajo; compute hace el cálculo pesado y commit (opcional) aplica el resultado al estado
+#compartido y retorna lo que se muestra al consultar el trabajo. Si el trabajo se cancela mientras
+#corre, commit no se ejecuta. El trabajo corre con el contexto de la petición (mismo workspace)
+def submit_job(kind: str, compute: Callable[[], Any], commit: Optional[Callable[[Any], Any]] = None) -> Job:
+    job = Job(id=uuid.uuid4().hex, kind=kind)
+    with _lock:
+        _jobs[job.id] = job
+        _forget_finished_jobs()
+        context = contextvars.copy_context()
+        _futures[job.id] = _executor.submit(context.run, _run_job, job, compute, commit)
+    return job
+
+
+def get_job(job_id: str) -> Job:
+    with _lock:
+        job = _jobs.get(job_id)
+    if job is None:
+        raise KeyError(f"Job {job_id} not found.")
+    return job
+
+
+#espera hasta timeout segundos a que el trabajo termine, retorna el trabajo en su estado actual
+def wait_for_job(job_id: str, timeout: float) -> Job:
+    job = get_job(job_id)
+    future = _futures.get(job_id)
+    if future is not None and timeout > 0:
+        try:
+            future.result(timeout=timeout)
+        except Exception:
+            pass
+    return job
+
+
+#un trabajo en cola se cancela de inmediato; uno que ya está corriendo se marca y sigue en "running" hasta
+#que llega a un punto de cancelación (raise_if_cancelled) y se detiene, o termina y su resultado se descarta
+def cancel_job(job_id: str) -> Job:
+    job = get_job(job_id)
+    with _lock:
+        if job.status == JOB_PENDING:
+            future = _futures.get(job_id)
+            if future is not None and future.cancel():
+                job.status = JOB_CANCELLED
+                job.finished_at = time.time()
+        elif job.status == JOB_RUNNING:
+            job.cancel_requested = True
+    return job
+
+
+#True si se pidió cancelar el trabajo que corre en este hilo (siempre False fuera de un trabajo)
+def cancel_requested() -> bool:
+    job = _current_job.get()
+    return job is not None and job.cancel_requested
+
+
+#punto de cancelación para los ciclos largos (filas de la matriz, capas de Held-Karp, búsquedas de los
+#solvers): si se pidió cancelar el trabajo actual lanza JobCancelledError y el hilo queda libre
+def raise_if_cancelled():
+    if cancel_requested():
+        raise JobCancelledError("Job cancelled.")
+
+
+def job_to_dict(job: Job) -> dict:
+    data = {
+        "jobId": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "createdAt": job.created_at,
+        "startedAt": job.started_at,
+        "finishedAt": job.finished_at,
+    }
+    if job.status == JOB_SUCCEEDED:
+        data["result"] = job.result
+    if job.error is not None:
+        data["error"] = job.error
+    if job.cancel_requested and job.status == JOB_RUNNING:
+        data["cancelRequested"] = True
+    return data
+
+
+def _run_job(job: Job, compute: Callable[[], Any], commit: Optional[Callable[[Any], Any]]):
+    with _lock:
+        if job.status == JOB_CANCELLED:
+            return
+        job.status = JOB_RUNNING
+        job.started_at = time.time()
+
+    #el trabajo corre en una copia del contexto de la petición, el valor no sale de aquí
+    _current_job.set(job)
+    try:
+        value = compute()
+        with _commit_lock:
+            if job.cancel_requested:
+                status, result = JOB_CANCELLED, None
+            else:
+                status, result = JOB_SUCCEEDED, commit(value) if commit is not None else value
+        with _lock:
+            job.status, job.result = status, result
+            job.finished_at = time.time()
+    except JobCancelledError:
+        with _lock:
+            job.status = JOB_CANCELLED
+            job.finished_at = time.time()
+    except Exception as e:
+        traceback.print_exc()
+        with _lock:
+            job.status = JOB_FAILED
+            job.error = str(e)
+            job.finished_at = time.time()
+    finally:
+        with _lock:
+            _futures.pop(job.id, None)
+
+
+#conserva solo los últimos JOB_HISTORY_LIMIT trabajos terminados (se llama con _lock tomado)
+def _forget_finished_jobs():
+    finished = [jid for jid, job in _jobs.items() if job.finished_at is not None]
+    for jid in finished[:max(0, len(finished) - JOB_HISTORY_LIMIT)]:
+        del _jobs[jid]
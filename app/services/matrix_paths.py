@@ -0,0 +1,214 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.models.routing_graph import RoutingGraph
+from app.services.routing_graph import NO_PREDECESSOR, as_csgraph, path_from_predecessors, shortest_path_trees
+
+#árboles recalculados (cuando no se guardaron los predecesores) que se conservan por matriz
+_RECOMPUTED_TREES = 32
+
+#árbol de caminos más cortos de un origen: la copia CSR sobre la que se calculó y sus predecesores
+Tree = Tuple[RoutingGraph, np.ndarray]
+
+
+#caminos de la matriz de distancias sin materializar los n² caminos: se guarda un arreglo de predecesores
+#por origen (o ninguno) y cada camino se arma cuando se pide con paths[a][b]
+#en grafos no dirigidos el camino a -> b sale del árbol de min(a, b) (invertido si hace falta), igual que
+#cuando la matriz guardaba la columna como el camino invertido de la fila
+#al agregar puntos (with_stop) los árboles anteriores se conservan aunque el grafo tenga nodos nuevos:
+#los saltos por aristas que se dividieron después se completan con el nodo insertado (splits)
+#si la matriz se calculó con la jerarquía de contracción (legs) no se guardan árboles: cada camino se arma
+#con una consulta a la jerarquía
+class MatrixPaths:
+
+    def __init__(self, routing: RoutingGraph, node_ids: Sequence[int], trees: List[Optional[Tree]],
+        symmetric: bool, splits: tuple = (), legs=None):
+        #copia CSR de la versión más reciente del grafo (la de los árboles recalculados)
+        self.routing = routing
+        self.node_ids = list(node_ids)
+        #árbol de cada origen, None si no se guardó (se recalcula al pedir un camino)
+        self.trees = trees
+        self.symmetric = symmetric
+        #aristas divididas en el grafo, ver routing_graph.record_edge_split
+        self.splits = splits
+        #consultas punto a punto (contraction_hierarchy.HierarchyQuery) o None
+        self.legs = legs
+        self._split_maps: Dict[int, Dict[Tuple[int, int], int]] = {}
+        self._recomputed: "OrderedDict[int, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    #versión del grafo para la que los caminos son válidos
+    @property
+    def version(self) -> int:
+        return self.routing.version
+
+    def __len__(self) -> int:
+        return len(self.node_ids)
+
+    def __getitem__(self, a: int) -> "_PathRow":
+        if not -len(self) <= a < len(self):
+            raise IndexError("path row out of range")
+        return _PathRow(self, a % len(self))
+
+    def __iter__(self) -> Iterator["_PathRow"]:
+        return (_PathRow(self, a) for a in range(len(self)))
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, MatrixPaths):
+            other = other.to_list()
+        return self.to_list() == other
+
+    #todos los caminos como listas (n² caminos, solo para matrices pequeñas o pruebas)
+    def to_list(self) -> List[List[List[int]]]:
+        return [list(row) for row in self]
+
+    #memoria de los arreglos de predecesores guardados
+    @property
+    def nbytes(self) -> int:
+        return sum(tree[1].nbytes for tree in self.trees if tree is not None)
+
+    #copia con un punto más al final, con su árbol (o None) calculado sobre routing
+    def with_stop(self, routing: RoutingGraph, node_id: int, tree: Optional[Tree], splits: tuple) -> "MatrixPaths":
+        return MatrixPaths(routing, self.node_ids + [node_id], self.trees + [tree], self.symmetric, splits,
+            self.legs)
+
+    #copia sin el punto de la posición index
+    def without_stop(self, index: int) -> "MatrixPaths":
+        return MatrixPaths(
+            self.routing,
+            self.node_ids[:index] + self.node_ids[index + 1:],
+            self.trees[:index] + self.trees[index + 1:],
+            self.symmetric,
+            self.splits,
+            self.legs,
+        )
+
+    #camino (ids reales) entre los puntos a y b de la matriz, [] si no hay camino
+    def path(self, a: int, b: int) -> List[int]:
+        if a == b or self.node_ids[a] == self.node_ids[b]:
+            return [self.node_ids[a]]
+
+        if not self.symmetric:
+            path = self._path_from_tree(a, b)
+            return path if path is not None else self._fallback_path(a, b)
+
+        first, second = min(a, b), max(a, b)
+        path = self._path_from_tree(first, second)
+        if path is None:
+            #árbol sin guardar o calculado antes de que existiera el otro punto
+            path = self._path_from_tree(second, first)
+            if path is not None:
+                path = path[::-1]
+        if path is None:
+            path = self._fallback_path(first, second)
+        return path if first == a else path[::-1]
+
+    def _path_from_tree(self, row: int, other: int) -> Optional[List[int]]:
+        tree = self.trees[row]
+        if tree is None:
+            return None
+        routing, pred = tree
+        source = _dense_index(routing, self.node_ids[row])
+        target = _dense_index(routing, self.node_ids[other])
+        #el árbol se corta a la distancia de los puntos que tenía la matriz al construirse: un punto agregado
+        #después puede quedar afuera y su camino se busca por otro lado
+        if target is None or (target != source and pred[target] == NO_PREDECESSOR):
+            return None
+        return self._expand(path_from_predecessors(routing, pred, source, target), routing.version)
+
+    #completa los saltos por aristas que se dividieron después de calcular el árbol (versión since)
+    def _expand(self, path: List[int], since: int) -> List[int]:
+        if since >= self.version or len(path) < 2:
+            return path
+        splits = self._split_map(since)
+        if not splits:
+            return path
+
+        expanded = [path[0]]
+        for a, b in zip(path, path[1:]):
+            expanded.extend(_expand_hop(a, b, splits))
+        return expanded
+
+    #arista (u, v) -> nodo que se insertó en ella, para las divisiones posteriores a la versión since
+    def _split_map(self, since: int) -> Dict[Tuple[int, int], int]:
+        with self._lock:
+            splits = self._split_maps.get(since)
+            if splits is None:
+                splits = {
+                    _edge_key(u, v): new_id
+                    for version, u, v, new_id, was_shortest, *_ in self.splits
+                    if since < version <= self.version and was_shortest
+                }
+                self._split_maps[since] = splits
+            return splits
+
+    #camino sin un árbol guardado: de la jerarquía si la hay (y conoce los dos puntos), si no con Dijkstra
+    def _fallback_path(self, row: int, other: int) -> List[int]:
+        if self.legs is not None:
+            path = self.legs.path(self.node_ids[row], self.node_ids[other])
+            if path is not None:
+                return self._expand(path, self.legs.version)
+        return self._recomputed_path(row, other)
+
+    #Dijkstra desde el origen de la fila sobre la versión actual del grafo (cuando no hay un árbol útil)
+    def _recomputed_path(self, row: int, other: int) -> List[int]:
+        source = _dense_index(self.routing, self.node_ids[row])
+        target = _dense_index(self.routing, self.node_ids[other])
+        with self._lock:
+            pred = self._recomputed.get(row)
+            if pred is not None:
+                self._recomputed.move_to_end(row)
+
+        if pred is None:
+            _, trees = shortest_path_trees(self.routing, [source], as_csgraph(self.routing))
+            pred = trees[0]
+            with self._lock:
+                self._recomputed[row] = pred
+                while len(self._recomputed) > _RECOMPUTED_TREES:
+                    self._recomputed.popitem(last=False)
+        return path_from_predecessors(self.routing, pred, source, target)
+
+
+#fila paths[a] de la matriz de caminos
+class _PathRow:
+
+    def __init__(self, paths: MatrixPaths, a: int):
+        self._paths = paths
+        self._a = a
+
+    def __len__(self) -> int:
+        return len(self._paths)
+
+    def __getitem__(self, b: int) -> List[int]:
+        if not -len(self) <= b < len(self):
+            raise IndexError("path column out of range")
+        return self._paths.path(self._a, b % len(self))
+
+    def __iter__(self) -> Iterator[List[int]]:
+        return (self._paths.path(self._a, b) for b in range(len(self)))
+
+    def __eq__(self, other) -> bool:
+        return list(self) == list(other)
+
+
+#índice denso del nodo en la copia CSR, None si el nodo no existía en esa versión
+def _dense_index(routing: RoutingGraph, node_id: int) -> Optional[int]:
+    k = int(np.searchsorted(routing.node_ids, node_id))
+    if k < len(routing.node_ids) and routing.node_ids[k] == node_id:
+        return k
+    return None
+
+
+def _edge_key(u: int, v: int) -> Tuple[int, int]:
+    return (u, v) if u <= v else (v, u)
+
+
+#nodos después de a hasta b, pasando por los nodos insertados en la arista (a, b)
+def _expand_hop(a: int, b: int, splits: Dict[Tuple[int, int], int]) -> List[int]:
+    middle = splits.get(_edge_key(a, b))
+    if middle is None:
+        return [b]
+    return _expand_hop(a, middle, splits) + _expand_hop(middle, b, splits)
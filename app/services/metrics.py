@@ -0,0 +1,63 @@
+import functools
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram
+
+#límites (segundos) de los histogramas de duración
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+#registro propio de la aplicación (sin las métricas del proceso del registro global de prometheus_client);
+#los módulos con estado propio (cachés, workspaces) registran aquí un collector que lo lee al exportar
+REGISTRY = CollectorRegistry()
+
+HTTP_REQUESTS = Counter(
+    "tsp_http_requests", "HTTP requests by route template, method and status.", ("method", "route", "status"),
+    registry=REGISTRY)
+HTTP_DURATION = Histogram(
+    "tsp_http_request_duration_seconds", "HTTP request latency, including JSON serialization.", ("method", "route"),
+    buckets=LATENCY_BUCKETS, registry=REGISTRY)
+STAGE_DURATION = Histogram(
+    "tsp_stage_duration_seconds", "Duration of each processing stage.", ("stage",),
+    buckets=LATENCY_BUCKETS, registry=REGISTRY)
+STAGE_FAILURES = Counter(
+    "tsp_stage_failures", "Stages that ended with an exception.", ("stage",), registry=REGISTRY)
+SOLVER_DURATION = Histogram(
+    "tsp_solver_duration_seconds", "Duration of each TSP solver run (cache misses only).", ("algorithm",),
+    buckets=LATENCY_BUCKETS, registry=REGISTRY)
+GRAPH_NODES = Gauge("tsp_graph_nodes", "Nodes of the most recently loaded graph.", registry=REGISTRY)
+GRAPH_EDGES = Gauge("tsp_graph_edges", "Edges of the most recently loaded graph.", registry=REGISTRY)
+MATRIX_POINTS = Gauge("tsp_matrix_points", "Points of the most recently built distance matrix.", registry=REGISTRY)
+
+_LABELED = (HTTP_REQUESTS, HTTP_DURATION, STAGE_DURATION, STAGE_FAILURES, SOLVER_DURATION)
+
+
+#mide la duración (perf_counter, monótono) de una etapa; si termina con una excepción también se cuenta
+@contextmanager
+def stage_timer(stage: str) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        STAGE_FAILURES.labels(stage=stage).inc()
+        raise
+    finally:
+        STAGE_DURATION.labels(stage=stage).observe(time.perf_counter() - start)
+
+
+#decorador: mide cada llamada a la función como la etapa stage
+def timed(stage: str):
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage_timer(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+#borra las series con etiquetas (para las pruebas)
+def reset_metrics():
+    for metric in _LABELED:
+        metric.clear()
@@ -1,21 +1,41 @@
+import os
 import networkx as nx
 
-from shapely.geometry import Point, LineString
-from geopy.distance import geodesic
+from shapely.geometry import Point
 
+from app.services.coordinate_index import get_coordinate_index
+from app.services.edge_index import get_edge_index
+from app.services.metrics import timed
+from app.services.routing_graph import get_graph_version, graph_lock, mark_graph_modified, record_edge_split
+from app.services.workspaces import current_workspace, graph_for_update, set_workspace_selected_nodes
 
-from typing import List, Tuple, BinaryIO
 
-_selected_node_ids: List[int] = []
+from typing import List, Optional, Tuple, BinaryIO
 
+#distancia máxima (metros) para reutilizar un nodo existente en vez de insertar uno nuevo; 0 = coordenadas exactas
+POINT_MATCH_TOLERANCE_M = float(os.environ.get("POINT_MATCH_TOLERANCE_M", "0"))
+
+#nodos seleccionados en el workspace de la petición
 def get_selected_nodes() -> List[int]:
-    return _selected_node_ids
+    return current_workspace().selected_node_ids
 
 #Esta función lee un archivo con los puntos a visitar.
 def load_points_from_uploaded_file(file: BinaryIO, G: nx.Graph) -> List[int]:
-    content = file.read().decode("utf-8")
-    lines = content.strip().splitlines()
-    
+    points = parse_points(file.read())
+
+    #el grafo base se comparte entre workspaces, antes de insertar puntos se hace una copia propia
+    G = graph_for_update(G)
+    node_ids = process_points_into_graph(G, points)
+
+    set_workspace_selected_nodes(node_ids)
+
+    return node_ids
+
+
+#puntos (lat, lon) de un archivo de texto con una pareja "lat lon" por línea; las demás líneas se ignoran
+def parse_points(content: bytes) -> List[Tuple[float, float]]:
+    lines = content.decode("utf-8").strip().splitlines()
+
     points = []
     for line in lines:
         parts = line.strip().split()
@@ -24,32 +44,51 @@ def load_points_from_uploaded_file(file: BinaryIO, G: nx.Graph) -> List[int]:
         lat = float(parts[0])
         lon = float(parts[1])
         points.append((lat, lon))
+    return points
 
-    node_ids = process_points_into_graph(G, points)
-
-    global _selected_node_ids
-    _selected_node_ids = node_ids
-
-    return node_ids
 
+#agrega un punto a los nodos seleccionados del workspace (insertándolo en el grafo si hace falta),
+#retorna el id del nodo
+def add_selected_point(G: nx.Graph, lat: float, lon: float) -> int:
+    G = graph_for_update(G)
+    node_id = process_points_into_graph(G, [(lat, lon)])[0]
+    set_workspace_selected_nodes(get_selected_nodes() + [node_id])
+    return node_id
 
 
+#quita el punto de la posición index de los nodos seleccionados del workspace
+def remove_selected_point(index: int) -> int:
+    node_ids = list(get_selected_nodes())
+    if not 0 <= index < len(node_ids):
+        raise IndexError(f"Stop {index} is not in the selected points.")
+    node_id = node_ids.pop(index)
+    set_workspace_selected_nodes(node_ids)
+    return node_id
 
 
 #procesa cada nuevo nodo para validar si se debe insertar en el grafo
-def process_points_into_graph(G: nx.Graph, points: List[Tuple[float, float]]
+#con tolerance_m > 0 reutiliza el nodo más cercano a menos de esa distancia
+@timed("snap_points")
+def process_points_into_graph(G: nx.Graph, points: List[Tuple[float, float]],
+    tolerance_m: Optional[float] = None
 ) -> List[int]:
-    
+
+    if tolerance_m is None:
+        tolerance_m = POINT_MATCH_TOLERANCE_M
+
+    with graph_lock:
+        return _process_points(G, points, tolerance_m)
+
+
+def _process_points(G: nx.Graph, points: List[Tuple[float, float]], tolerance_m: float) -> List[int]:
+    #índice de coordenadas -> nodo, evita recorrer todos los nodos por cada punto
+    coordinate_index = get_coordinate_index(G)
+
     result_node_ids = []
     #recorre nodos nuevos (leídos en txt)
     for lat, lon in points:
         # Busca si el nodo ya existe según sus coordenadas
-        existing = None
-        #recorre los nodos que ya existen en el grafo
-        for nid, data in G.nodes(data=True):
-            if data.get("latitude") == lat and data.get("longitude") == lon:
-                existing = nid
-                break
+        existing = coordinate_index.find(lat, lon, tolerance_m)
 
         if existing is not None:
             #no se inserta en el grafo pero si se agrega a la lista de nodos a recorrer
@@ -57,7 +96,7 @@ def process_points_into_graph(G: nx.Graph, points: List[Tuple[float, float]]
         else:
             # si el nodo no existe actualmente en el grafo, lo debe insertar
             # se genera automáticamente un nuevo ID secuencial
-            new_id = max(G.nodes) + 1 if G.number_of_nodes() > 0 else 0
+            new_id = coordinate_index.allocate_id()
             inserted_id = insert_node_into_graph(G, new_id, lat, lon)
             #agrega el nuevo nodo a la lista de nodos a recorrer
             result_node_ids.append(inserted_id)
@@ -71,39 +110,15 @@ def process_points_into_graph(G: nx.Graph, points: List[Tuple[float, float]]
 #inserta nuevos nodos en el grafo, para eso busca la arista más cercana y la divide en 2
 def insert_node_into_graph(G: nx.Graph, new_id: int, lat: float, lon: float) -> int:
   
-    # 🔁 shapely espera coordenadas como (x, y) = (lon, lat)
-    new_point = Point(lon, lat)
-    closest_edge = None
-    min_distance = float("inf")
-    best_line = None  # guardará la geometría de la arista más cercana
-
-    # Buscar la arista más cercana (por distancia perpendicular)
-    for u, v in G.edges():
-        u_data = G.nodes[u]
-        v_data = G.nodes[v]
-
-        # 🔁 LineString con (lon, lat)
-        line = LineString([
-            (u_data["longitude"], u_data["latitude"]),
-            (v_data["longitude"], v_data["latitude"])
-        ])
-        distance = new_point.distance(line)
-
-        if distance < min_distance:
-            min_distance = distance
-            closest_edge = (u, v)
-            best_line = line
-
-    if closest_edge is None or best_line is None:
-        raise ValueError("No edge found to insert point")
-
-    u, v = closest_edge
-    coord_u = (G.nodes[u]["latitude"], G.nodes[u]["longitude"])
-    coord_v = (G.nodes[v]["latitude"], G.nodes[v]["longitude"])
+    edge_index = get_edge_index(G)
+    coordinate_index = get_coordinate_index(G)
+    # Buscar la arista más cercana y proyectar el punto sobre ella
+    u, v, new_coord, fraction, weights = locate_on_nearest_edge(G, lat, lon)
 
-    # 🔁 proyectar el punto sobre la línea más cercana
-    projected = best_line.interpolate(best_line.project(new_point))
-    new_coord = (projected.y, projected.x)  # convertir de (x, y) a (lat, lon)
+    # peso de la arista que se elimina (con aristas paralelas remove_edge quita la última agregada)
+    weight = weights[-1]
+    # si era la única arista de menor peso entre u y v, los caminos ya calculados por ahí pasan ahora por el nodo nuevo
+    was_shortest = weight == min(weights) and weights.count(weight) == 1
 
     # se elimina la arista original (ya que se debe dividir en 2)
     G.remove_edge(u, v)
@@ -111,10 +126,41 @@ def insert_node_into_graph(G: nx.Graph, new_id: int, lat: float, lon: float) ->
     # se inserta el nuevo nodo
     G.add_node(new_id, latitude=new_coord[0], longitude=new_coord[1])
 
-    # Conectar los extremos de la anterior arista con el nuevo nodo 
-    dist_u = geodesic(coord_u, new_coord).meters
-    dist_v = geodesic(new_coord, coord_v).meters
+    # Conectar los extremos de la anterior arista con el nuevo nodo, repartiendo el peso según dónde quedó el punto
+    # (el peso puede ser el largo de la vía según osmnx, más largo que la recta entre los extremos)
+    dist_u = weight * fraction
+    dist_v = weight - dist_u
     G.add_edge(u, new_id, weight=dist_u)
     G.add_edge(new_id, v, weight=dist_v)
+    mark_graph_modified(G)
+    record_edge_split(G, u, v, new_id, was_shortest, dist_u, dist_v)
+    edge_index.split_edge(u, v, new_id, get_graph_version(G))
+    coordinate_index.add(new_id, new_coord[0], new_coord[1], get_graph_version(G))
 
     return new_id
+
+
+#proyecta el punto sobre la arista más cercana (distancia perpendicular, con el índice espacial de aristas)
+#retorna (u, v, (lat, lon) proyectado, fracción de la arista desde u, pesos de las aristas paralelas u-v)
+def locate_on_nearest_edge(G: nx.Graph, lat: float, lon: float
+) -> Tuple[int, int, Tuple[float, float], float, List[float]]:
+
+    # 🔁 shapely espera coordenadas como (x, y) = (lon, lat)
+    new_point = Point(lon, lat)
+    closest = get_edge_index(G).nearest_edge(G, new_point)
+
+    if closest is None:
+        raise ValueError("No edge found to insert point")
+
+    closest_edge, best_line = closest
+    u, v = closest_edge
+
+    # 🔁 proyectar el punto sobre la línea más cercana
+    projected = best_line.interpolate(best_line.project(new_point))
+    new_coord = (projected.y, projected.x)  # convertir de (x, y) a (lat, lon)
+
+    weights = [data["weight"] for data in G[u][v].values()] if G.is_multigraph() else [G[u][v]["weight"]]
+    # fracción de la arista (desde u) donde queda el punto; en un tramo tan corto la proporción en grados
+    # es la misma que en metros
+    fraction = best_line.project(projected, normalized=True) if best_line.length > 0 else 0.0
+    return u, v, new_coord, fraction, weights
@@ -0,0 +1,175 @@
+import hashlib
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, List, Optional, Sequence, Tuple
+
+import networkx as nx
+import numpy as np
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+from app.models.distance_matrix_result import DistanceMatrixResult
+from app.models.tsp_result import TSPResult
+from app.services.metrics import REGISTRY
+from app.services.routing_graph import get_graph_version
+
+#cantidad máxima de matrices y de resultados de TSP guardados, y memoria estimada máxima de cada caché
+MATRIX_CACHE_SIZE = int(os.environ.get("MATRIX_CACHE_SIZE", "32"))
+RESULT_CACHE_SIZE = int(os.environ.get("RESULT_CACHE_SIZE", "256"))
+CACHE_MEMORY_MB = float(os.environ.get("CACHE_MEMORY_MB", "256"))
+
+
+#caché LRU con límite de cantidad y de memoria estimada (size_of), cuenta aciertos y fallos
+class LRUCache:
+
+    def __init__(self, max_entries: int, max_bytes: int, size_of: Callable[[Any], int]):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._size_of = size_of
+        self._entries: "OrderedDict[Hashable, Tuple[Any, int]]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key: Hashable, value: Any):
+        size = self._size_of(value)
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            #un valor que no cabe solo no se guarda
+            if size > self.max_bytes or self.max_entries <= 0:
+                return
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+
+    #elimina las entradas cuya clave cumple la condición
+    def discard(self, predicate: Callable[[Hashable], bool]):
+        with self._lock:
+            for key in [key for key in self._entries if predicate(key)]:
+                self._bytes -= self._entries.pop(key)[1]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "estimatedBytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+#bytes aproximados: listas de floats de Python (~32 bytes por celda) más los árboles de caminos
+def _matrix_size(matrix: DistanceMatrixResult) -> int:
+    n = len(matrix.distances)
+    nbytes = getattr(matrix.paths, "nbytes", 0)
+    return n * n * 32 + nbytes
+
+
+def _result_size(result: TSPResult) -> int:
+    return len(result.path) * 36 + 200
+
+
+_matrix_cache = LRUCache(MATRIX_CACHE_SIZE, int(CACHE_MEMORY_MB * 1024 * 1024), _matrix_size)
+_result_cache = LRUCache(RESULT_CACHE_SIZE, int(CACHE_MEMORY_MB * 1024 * 1024), _result_size)
+
+
+#identidad del grafo para las claves: la clave del archivo (o de la copia del workspace); si el grafo
+#no tiene una (armado a mano) se le asigna una
+def _graph_identity(G: nx.Graph) -> str:
+    return G.graph.setdefault("graph_key", uuid.uuid4().hex)
+
+
+#clave (grafo, versión, puntos en orden); None si no hay un grafo (no se usa el caché)
+def _matrix_key(G: nx.Graph, node_ids: Sequence[int]) -> Optional[tuple]:
+    if not isinstance(G, nx.Graph):
+        return None
+    return _graph_identity(G), get_graph_version(G), tuple(node_ids)
+
+
+#matriz ya calculada para esos puntos en la versión actual del grafo, o None
+def get_cached_matrix(G: nx.Graph, node_ids: Sequence[int]) -> Optional[DistanceMatrixResult]:
+    key = _matrix_key(G, node_ids)
+    return _matrix_cache.get(key) if key is not None else None
+
+
+#guarda la matriz; las de versiones anteriores del mismo grafo ya no sirven y se eliminan
+def store_matrix(G: nx.Graph, node_ids: Sequence[int], matrix: DistanceMatrixResult):
+    key = _matrix_key(G, node_ids)
+    if key is None:
+        return
+    identity, version, _ = key
+    _matrix_cache.discard(lambda other: other[0] == identity and other[1] < version)
+    _matrix_cache.put(key, matrix)
+
+
+#huella de la matriz de distancias (se calcula al construirla, ver distance_matrix)
+def matrix_fingerprint(distances: List[List[float]]) -> str:
+    array = np.asarray(distances, dtype=np.float64)
+    return hashlib.sha1(str(array.shape).encode() + array.tobytes()).hexdigest()
+
+
+#resultado ya calculado con ese algoritmo e inicio para una matriz con esa huella; las matrices sin
+#huella (no construidas por distance_matrix) no usan el caché
+def get_cached_result(matrix: Any, algorithm: str, start_index: int = 0) -> Optional[TSPResult]:
+    fingerprint = getattr(matrix, "fingerprint", None)
+    if fingerprint is None:
+        return None
+    return _result_cache.get((fingerprint, algorithm, start_index))
+
+
+def store_result(matrix: Any, algorithm: str, result: TSPResult, start_index: int = 0):
+    fingerprint = getattr(matrix, "fingerprint", None)
+    if fingerprint is not None:
+        _result_cache.put((fingerprint, algorithm, start_index), result)
+
+
+def cache_stats() -> dict:
+    return {"matrices": _matrix_cache.stats(), "results": _result_cache.stats()}
+
+
+def clear_caches():
+    _matrix_cache.clear()
+    _result_cache.clear()
+
+
+#aciertos, fallos, entradas y memoria de cada caché para GET /metrics (se leen de cache_stats al exportar)
+class _CacheCollector:
+
+    def collect(self):
+        families = [
+            (CounterMetricFamily("tsp_cache_hits", "Cache hits.", labels=["cache"]), "hits"),
+            (CounterMetricFamily("tsp_cache_misses", "Cache misses.", labels=["cache"]), "misses"),
+            (GaugeMetricFamily("tsp_cache_entries", "Entries in the cache.", labels=["cache"]), "entries"),
+            (GaugeMetricFamily("tsp_cache_bytes", "Estimated memory of the cache.", labels=["cache"]),
+                "estimatedBytes"),
+        ]
+        for name, stats in cache_stats().items():
+            for family, key in families:
+                family.add_metric([name], stats[key])
+        for family, _ in families:
+            yield family
+
+
+REGISTRY.register(_CacheCollector())
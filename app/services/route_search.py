@@ -0,0 +1,167 @@
+import heapq
+import math
+from typing import List, Tuple
+
+import networkx as nx
+import numpy as np
+import shapely
+from shapely import STRtree
+
+from app.models.routing_graph import RoutingGraph
+from app.services.routing_graph import get_graph_version, get_routing_graph, graph_lock, node_indices
+
+#radio (metros) para la cota de A*: el menor radio de curvatura de WGS84 (a(1 - e²) = 6 335 439 m) con un
+#margen del 0.1 %. La distancia en esa esfera nunca supera la distancia geodésica ni el largo de la vía,
+#así la cota es admisible (y consistente) con cualquiera de los métodos de peso de edge_weights
+_HEURISTIC_RADIUS_M = 6_335_439.0 * 0.999
+
+ROUTE_ALGORITHMS = ("astar", "bidirectional")
+
+#resultado de una búsqueda: (distancia, camino con ids reales, nodos visitados)
+RouteResult = Tuple[float, List[int], int]
+
+
+#búsquedas punto a punto sobre la copia CSR; las listas de Python evitan el costo de leer arreglos
+#de numpy elemento por elemento dentro del ciclo de la búsqueda
+class RouteSearch:
+
+    def __init__(self, G: nx.Graph, routing: RoutingGraph):
+        self.routing = routing
+        self.directed = G.is_directed()
+        self._offsets = routing.offsets.tolist()
+        self._neighbors = routing.neighbors.tolist()
+        self._weights = routing.weights.tolist()
+        #los nodos sin coordenadas tienen cota 0 (ver astar); sus valores en _lat y _lon no se usan
+        self._located = (~np.isnan(routing.latitudes) & ~np.isnan(routing.longitudes)).tolist()
+        self._lat = np.nan_to_num(np.radians(routing.latitudes)).tolist()
+        self._lon = np.nan_to_num(np.radians(routing.longitudes)).tolist()
+        self._cos_lat = [math.cos(lat) for lat in self._lat]
+        self._reverse = None if not self.directed else _reverse_adjacency(routing)
+        self._node_tree = STRtree(shapely.points(routing.longitudes, routing.latitudes))
+        self.version = routing.version
+
+    #id del nodo más cercano a las coordenadas
+    def nearest_node(self, lat: float, lon: float) -> int:
+        index = self._node_tree.query_nearest(shapely.Point(lon, lat))
+        return int(self.routing.node_ids[int(index[0])])
+
+    #A* con la distancia en círculo máximo como cota
+    #los nodos sin coordenadas (y todos si el destino no las tiene) tienen cota 0: sigue siendo admisible
+    #pero ya no consistente, así que un nodo se vuelve a expandir si aparece un camino más corto hasta él
+    def astar(self, source_id: int, target_id: int) -> RouteResult:
+        source, target = node_indices(self.routing, [source_id, target_id]).tolist()
+        offsets, neighbors, weights = self._offsets, self._neighbors, self._weights
+        lat_t, lon_t, cos_t = self._lat[target], self._lon[target], self._cos_lat[target]
+        lat, lon, cos_lat, located = self._lat, self._lon, self._cos_lat, self._located
+        target_located = located[target]
+
+        def heuristic(u: int) -> float:
+            if not (target_located and located[u]):
+                return 0.0
+            h = math.sin((lat[u] - lat_t) / 2) ** 2 + cos_lat[u] * cos_t * math.sin((lon[u] - lon_t) / 2) ** 2
+            return 2 * _HEURISTIC_RADIUS_M * math.asin(min(1.0, math.sqrt(h)))
+
+        best = {source: 0.0}
+        pred = {source: -1}
+        closed = set()
+        heap = [(heuristic(source), 0.0, source)]
+        while heap:
+            _, d, u = heapq.heappop(heap)
+            #entrada vieja: ya se llegó a u por un camino más corto
+            if d > best[u]:
+                continue
+            closed.add(u)
+            if u == target:
+                return d, self._path(pred, target), len(closed)
+            for k in range(offsets[u], offsets[u + 1]):
+                v = neighbors[k]
+                nd = d + weights[k]
+                if nd < best.get(v, math.inf):
+                    best[v] = nd
+                    pred[v] = u
+                    heapq.heappush(heap, (nd + heuristic(v), nd, v))
+        return math.inf, [], len(closed)
+
+    #Dijkstra desde los dos extremos a la vez; termina cuando la suma de los dos frentes supera el mejor camino
+    def bidirectional(self, source_id: int, target_id: int) -> RouteResult:
+        source, target = node_indices(self.routing, [source_id, target_id]).tolist()
+        if source == target:
+            return 0.0, [source_id], 1
+
+        forward = (self._offsets, self._neighbors, self._weights)
+        backward = self._reverse if self._reverse is not None else forward
+        dist = [{source: 0.0}, {target: 0.0}]
+        pred = [{source: -1}, {target: -1}]
+        closed = [set(), set()]
+        heaps = [[(0.0, source)], [(0.0, target)]]
+        best, meeting = math.inf, -1
+
+        while heaps[0] and heaps[1]:
+            if heaps[0][0][0] + heaps[1][0][0] >= best:
+                break
+            #avanza el frente con menos nodos pendientes
+            side = 0 if len(heaps[0]) <= len(heaps[1]) else 1
+            d, u = heapq.heappop(heaps[side])
+            if u in closed[side]:
+                continue
+            closed[side].add(u)
+            offsets, neighbors, weights = forward if side == 0 else backward
+            other = dist[1 - side]
+            for k in range(offsets[u], offsets[u + 1]):
+                v = neighbors[k]
+                nd = d + weights[k]
+                if nd < dist[side].get(v, math.inf):
+                    dist[side][v] = nd
+                    pred[side][v] = u
+                    heapq.heappush(heaps[side], (nd, v))
+                if v in other and nd + other[v] < best:
+                    best, meeting = nd + other[v], v
+
+        visited = len(closed[0] | closed[1])
+        if meeting < 0:
+            return math.inf, [], visited
+        path = self._path(pred[0], meeting)
+        node = pred[1][meeting]
+        while node != -1:
+            path.append(int(self.routing.node_ids[node]))
+            node = pred[1][node]
+        return best, path, visited
+
+    def _path(self, pred: dict, target: int) -> List[int]:
+        path = []
+        node = target
+        while node != -1:
+            path.append(node)
+            node = pred[node]
+        path.reverse()
+        return self.routing.node_ids[path].tolist()
+
+
+#adyacencia con las aristas invertidas (solo para grafos dirigidos)
+def _reverse_adjacency(routing: RoutingGraph):
+    n = len(routing.node_ids)
+    sources = np.repeat(np.arange(n), np.diff(routing.offsets))
+    order = np.argsort(routing.neighbors, kind="stable")
+    offsets = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(routing.neighbors, minlength=n), out=offsets[1:])
+    return offsets.tolist(), sources[order].tolist(), routing.weights[order].tolist()
+
+
+#búsquedas del grafo, se arman una vez por versión y se guardan en G.graph
+def get_route_search(G: nx.Graph) -> RouteSearch:
+    with graph_lock:
+        search = G.graph.get("_route_search")
+        if search is None or search.version != get_graph_version(G):
+            search = RouteSearch(G, get_routing_graph(G))
+            G.graph["_route_search"] = search
+        return search
+
+
+#ruta más corta entre dos nodos (ids reales) con el algoritmo dado
+def find_route(G: nx.Graph, source_id: int, target_id: int, algorithm: str = "astar") -> RouteResult:
+    if algorithm not in ROUTE_ALGORITHMS:
+        raise ValueError(f"Unknown algorithm: {algorithm}. Use one of {', '.join(ROUTE_ALGORITHMS)}.")
+    search = get_route_search(G)
+    if algorithm == "bidirectional":
+        return search.bidirectional(source_id, target_id)
+    return search.astar(source_id, target_id)
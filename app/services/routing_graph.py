@@ -0,0 +1,201 @@
+import threading
+import networkx as nx
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+from typing import List, Optional, Sequence, Tuple
+
+from app.models.routing_graph import RoutingGraph
+
+#valor que usa scipy en el arreglo de predecesores cuando no hay predecesor
+NO_PREDECESSOR = -9999
+
+#protege los cambios al grafo (insertar puntos) frente a quien arma copias a partir de él,
+#ya que las peticiones y los trabajos en segundo plano corren en hilos distintos
+graph_lock = threading.RLock()
+
+
+def get_graph_version(G: nx.Graph) -> int:
+    return G.graph.get("version", 0)
+
+
+#se llama cada vez que cambia la topología del grafo (p. ej. al insertar un nodo)
+#así las copias derivadas (CSR) se reconstruyen la próxima vez que se pidan
+def mark_graph_modified(G: nx.Graph):
+    G.graph["version"] = get_graph_version(G) + 1
+
+
+#registra que la arista (u, v) se dividió en (u, new_id) y (new_id, v) en la versión actual del grafo
+#was_shortest indica si era la arista de menor peso entre u y v (sin otra paralela con el mismo peso):
+#en ese caso un camino calculado antes que pase de u a v ahora pasa por new_id
+#weight_u y weight_v son los pesos de las dos aristas nuevas
+#se guarda como tupla para que las copias del grafo no compartan el registro
+def record_edge_split(G: nx.Graph, u: int, v: int, new_id: int, was_shortest: bool,
+    weight_u: float, weight_v: float):
+    entry = (get_graph_version(G), u, v, new_id, was_shortest, weight_u, weight_v)
+    G.graph["_edge_splits"] = get_edge_splits(G) + (entry,)
+
+
+#[(versión, u, v, nodo insertado, era la arista más corta, peso u-nodo, peso nodo-v), ...]
+def get_edge_splits(G: nx.Graph) -> tuple:
+    return G.graph.get("_edge_splits", ())
+
+
+#divisiones posteriores a la versión since, o None si el grafo tuvo otros cambios desde entonces
+#(en ese caso lo calculado sobre la versión since ya no sirve)
+def splits_since(G: nx.Graph, since: int) -> Optional[tuple]:
+    splits = tuple(entry for entry in get_edge_splits(G) if entry[0] > since)
+    versions = {entry[0] for entry in splits}
+    if any(version not in versions for version in range(since + 1, get_graph_version(G) + 1)):
+        return None
+    return splits
+
+
+#arma la copia CSR a partir del grafo networkx
+#entre aristas paralelas se deja la de menor peso y se descartan los lazos (u == u)
+def build_routing_graph(G: nx.Graph) -> RoutingGraph:
+    node_ids = np.fromiter(G.nodes, dtype=np.int64, count=G.number_of_nodes())
+    node_ids.sort()
+
+    latitudes = np.array([G.nodes[n].get("latitude", np.nan) for n in node_ids.tolist()], dtype=np.float64)
+    longitudes = np.array([G.nodes[n].get("longitude", np.nan) for n in node_ids.tolist()], dtype=np.float64)
+
+    edges = G.edges(data="weight", default=1)
+    m = G.number_of_edges()
+    src = np.empty(m, dtype=np.int64)
+    dst = np.empty(m, dtype=np.int64)
+    wts = np.empty(m, dtype=np.float64)
+    for k, (u, v, w) in enumerate(edges):
+        src[k] = u
+        dst[k] = v
+        wts[k] = w
+
+    src = np.searchsorted(node_ids, src)
+    dst = np.searchsorted(node_ids, dst)
+
+    if not G.is_directed():
+        src, dst = np.concatenate([src, dst]), np.concatenate([dst, src])
+        wts = np.concatenate([wts, wts])
+
+    keep = src != dst
+    src, dst, wts = src[keep], dst[keep], wts[keep]
+
+    #ordena por (origen, destino, peso) y deja el primero de cada pareja, que es el de menor peso
+    order = np.lexsort((wts, dst, src))
+    src, dst, wts = src[order], dst[order], wts[order]
+    first = np.ones(len(src), dtype=bool)
+    first[1:] = (src[1:] != src[:-1]) | (dst[1:] != dst[:-1])
+    src, dst, wts = src[first], dst[first], wts[first]
+
+    offsets = np.zeros(len(node_ids) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(src, minlength=len(node_ids)), out=offsets[1:])
+
+    return RoutingGraph(
+        node_ids=node_ids,
+        offsets=offsets,
+        neighbors=dst.astype(np.int32),
+        weights=wts,
+        latitudes=latitudes,
+        longitudes=longitudes,
+        version=get_graph_version(G),
+    )
+
+
+#retorna la copia CSR del grafo, se construye una vez por versión del grafo y queda guardada en G.graph
+def get_routing_graph(G: nx.Graph) -> RoutingGraph:
+    with graph_lock:
+        routing = G.graph.get("_routing_graph")
+        if routing is None or routing.version != get_graph_version(G):
+            routing = build_routing_graph(G)
+            G.graph["_routing_graph"] = routing
+        return routing
+
+
+#copia CSR con nodos adicionales (ids mayores a los del grafo, con sus coordenadas) y aristas
+#(a, b, peso) entre ellos y los nodos existentes; las aristas de la copia original se conservan
+#permite ubicar puntos sobre el grafo sin modificar el grafo networkx
+def extend_routing_graph(routing: RoutingGraph, node_ids: Sequence[int], latitudes: Sequence[float],
+    longitudes: Sequence[float], edges: Sequence[Tuple[int, int, float]], directed: bool
+) -> RoutingGraph:
+    new_ids = np.asarray(node_ids, dtype=np.int64)
+    if len(new_ids) and len(routing.node_ids) and new_ids.min() <= routing.node_ids[-1]:
+        raise ValueError("New nodes must have ids greater than the graph nodes.")
+    order = np.argsort(new_ids, kind="stable")
+    extended = RoutingGraph(
+        node_ids=np.concatenate([routing.node_ids, new_ids[order]]),
+        offsets=routing.offsets,
+        neighbors=routing.neighbors,
+        weights=routing.weights,
+        latitudes=np.concatenate([routing.latitudes, np.asarray(latitudes, dtype=np.float64)[order]]),
+        longitudes=np.concatenate([routing.longitudes, np.asarray(longitudes, dtype=np.float64)[order]]),
+        version=routing.version,
+    )
+
+    src = np.repeat(np.arange(len(routing.node_ids), dtype=np.int64), np.diff(routing.offsets))
+    dst = routing.neighbors.astype(np.int64)
+    wts = routing.weights
+    if edges:
+        a = node_indices(extended, [edge[0] for edge in edges])
+        b = node_indices(extended, [edge[1] for edge in edges])
+        w = np.array([edge[2] for edge in edges], dtype=np.float64)
+        if not directed:
+            a, b, w = np.concatenate([a, b]), np.concatenate([b, a]), np.concatenate([w, w])
+        src, dst, wts = np.concatenate([src, a]), np.concatenate([dst, b]), np.concatenate([wts, w])
+
+    #las aristas nuevas van al final de la fila de su origen
+    order = np.argsort(src, kind="stable")
+    offsets = np.zeros(len(extended.node_ids) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(src, minlength=len(extended.node_ids)), out=offsets[1:])
+    return RoutingGraph(
+        node_ids=extended.node_ids,
+        offsets=offsets,
+        neighbors=dst[order].astype(np.int32),
+        weights=wts[order],
+        latitudes=extended.latitudes,
+        longitudes=extended.longitudes,
+        version=routing.version,
+    )
+
+
+#pasa de ids reales del grafo a índices densos
+def node_indices(routing: RoutingGraph, node_ids: Sequence[int]) -> np.ndarray:
+    ids = np.asarray(node_ids, dtype=np.int64)
+    idx = np.searchsorted(routing.node_ids, ids)
+    idx = np.minimum(idx, len(routing.node_ids) - 1)
+    missing = routing.node_ids[idx] != ids if len(routing.node_ids) else np.ones(len(ids), dtype=bool)
+    if missing.any():
+        raise ValueError(f"Node {int(ids[missing][0])} is not in the graph.")
+    return idx
+
+
+def as_csgraph(routing: RoutingGraph) -> csr_matrix:
+    n = len(routing.node_ids)
+    return csr_matrix((routing.weights, routing.neighbors, routing.offsets), shape=(n, n))
+
+
+#Dijkstra desde varios orígenes (índices densos), retorna matrices (orígenes x V) de distancias y predecesores
+#con limit la búsqueda no pasa de esa distancia: los nodos más lejanos quedan en infinito y sin predecesor
+def shortest_path_trees(routing: RoutingGraph, sources: Sequence[int], csgraph: csr_matrix | None = None,
+    limit: float = np.inf) -> Tuple[np.ndarray, np.ndarray]:
+    if csgraph is None:
+        csgraph = as_csgraph(routing)
+    return dijkstra(csgraph, directed=True, indices=np.asarray(sources), return_predecessors=True, limit=limit)
+
+
+#arma el camino (ids reales) hasta target siguiendo el arreglo de predecesores de un origen
+def path_from_predecessors(routing: RoutingGraph, predecessors: np.ndarray, source: int, target: int) -> List[int]:
+    if source != target and predecessors[target] == NO_PREDECESSOR:
+        return []
+    path = [target]
+    while path[-1] != source:
+        path.append(int(predecessors[path[-1]]))
+    path.reverse()
+    return routing.node_ids[path].tolist()
+
+
+#camino más corto entre dos nodos (ids reales), retorna (distancia, camino)
+def shortest_path(G: nx.Graph, source_id: int, target_id: int) -> Tuple[float, List[int]]:
+    routing = get_routing_graph(G)
+    source, target = node_indices(routing, [source_id, target_id]).tolist()
+    dist, pred = shortest_path_trees(routing, [source])
+    return float(dist[0, target]), path_from_predecessors(routing, pred[0], source, target)
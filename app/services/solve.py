@@ -0,0 +1,94 @@
+import networkx as nx
+from typing import Dict, List, Optional, Tuple
+
+from app.models.distance_matrix_result import DistanceMatrixResult
+from app.models.routing_graph import RoutingGraph
+from app.models.snapped_stop import SnappedStop
+from app.services.coordinate_index import get_coordinate_index
+from app.services.distance_matrix import matrix_from_routing
+from app.services.metrics import stage_timer
+from app.services.process_nodes import POINT_MATCH_TOLERANCE_M, locate_on_nearest_edge
+from app.services.routing_graph import extend_routing_graph, get_routing_graph, graph_lock, node_indices
+
+
+#ubica los puntos sobre el grafo sin modificarlo: un punto que coincide con un nodo (a menos de tolerance_m)
+#usa ese nodo; los demás quedan como nodos virtuales sobre la arista más cercana, con el peso repartido
+#igual que al insertarlos (process_nodes.insert_node_into_graph)
+#retorna los puntos y las aristas de los nodos virtuales [(a, b, peso), ...]
+def snap_stops(G: nx.Graph, points: List[Tuple[float, float]], tolerance_m: Optional[float] = None
+) -> Tuple[List[SnappedStop], List[Tuple[int, int, float]]]:
+
+    if tolerance_m is None:
+        tolerance_m = POINT_MATCH_TOLERANCE_M
+
+    with graph_lock:
+        routing = get_routing_graph(G)
+        coordinate_index = get_coordinate_index(G)
+        next_id = int(routing.node_ids[-1]) + 1 if len(routing.node_ids) else 0
+
+        stops = []
+        #arista (u, v, peso) -> {fracción: nodo virtual}; puntos en la misma posición comparten el nodo
+        on_edge: Dict[Tuple[int, int, float], Dict[float, int]] = {}
+        for lat, lon in points:
+            existing = coordinate_index.find(lat, lon, tolerance_m)
+            if existing is not None:
+                data = G.nodes[existing]
+                stops.append(SnappedStop(existing, data["latitude"], data["longitude"], False))
+                continue
+
+            u, v, (snapped_lat, snapped_lon), fraction, weights = locate_on_nearest_edge(G, lat, lon)
+            #en un extremo de la arista el punto es ese nodo
+            if fraction <= 0.0 or fraction >= 1.0:
+                node = u if fraction <= 0.0 else v
+                data = G.nodes[node]
+                stops.append(SnappedStop(node, data["latitude"], data["longitude"], False))
+                continue
+
+            #con aristas paralelas se divide la última agregada, igual que al insertar
+            positions = on_edge.setdefault((u, v, weights[-1]), {})
+            if fraction not in positions:
+                positions[fraction] = next_id
+                next_id += 1
+            stops.append(SnappedStop(positions[fraction], snapped_lat, snapped_lon, True))
+
+    #los puntos de una misma arista quedan encadenados en orden: u - p1 - p2 - ... - v
+    edges = []
+    for (u, v, weight), positions in on_edge.items():
+        fractions = sorted(positions)
+        chain = [u] + [positions[f] for f in fractions] + [v]
+        offsets = [0.0] + [weight * f for f in fractions] + [weight]
+        edges.extend((a, b, end - start) for a, b, start, end in zip(chain, chain[1:], offsets, offsets[1:]))
+    return stops, edges
+
+
+#matriz de distancias entre los puntos (que no tienen que estar en el grafo) sobre una copia CSR ampliada
+#con los nodos virtuales; el grafo networkx, los índices y el workspace no cambian
+#retorna los puntos ubicados y la matriz (sus caminos usan los ids de SnappedStop.node_id)
+def build_stops_matrix(G: nx.Graph, points: List[Tuple[float, float]], tolerance_m: Optional[float] = None
+) -> Tuple[List[SnappedStop], DistanceMatrixResult]:
+
+    #la copia CSR tiene que ser la misma versión sobre la que se ubicaron los puntos (ids virtuales libres)
+    with stage_timer("snap_points"), graph_lock:
+        stops, edges = snap_stops(G, points, tolerance_m)
+        virtual = {stop.node_id: stop for stop in stops if stop.virtual}
+        routing = extend_routing_graph(
+            get_routing_graph(G),
+            list(virtual),
+            [stop.latitude for stop in virtual.values()],
+            [stop.longitude for stop in virtual.values()],
+            edges,
+            directed=G.is_directed(),
+        )
+
+    with stage_timer("build_matrix"):
+        matrix = matrix_from_routing(routing, [stop.node_id for stop in stops], symmetric=not G.is_directed())
+    return stops, matrix
+
+
+#coordenadas [lat, lon] de cada nodo del camino (también de los nodos virtuales)
+def path_coordinates(routing: RoutingGraph, path: List[int]) -> List[List[float]]:
+    if not path:
+        return []
+    idx = node_indices(routing, path)
+    return [[lat, lon] for lat, lon in zip(routing.latitudes[idx].tolist(), routing.longitudes[idx].tolist())]
+
@@ -1,7 +1,17 @@
-from typing import List
+from typing import List, Optional, Tuple
+from collections import deque
 from itertools import permutations
+import math
+import multiprocessing
+import os
+import random
+import threading
 import time
+from multiprocessing import shared_memory
+from multiprocessing.connection import wait
+import numpy as np
 from app.models.tsp_result import TSPResult
+from app.services.jobs import JobCancelledError, cancel_requested, raise_if_cancelled
 
 def solve_tsp_brute_force(distance_matrix: List[List[float]], start_index: int = 0) -> TSPResult:
     n = len(distance_matrix)
@@ -11,10 +21,13 @@ def solve_tsp_brute_force(distance_matrix: List[List[float]], start_index: int =
     best_path = []
     min_cost = float('inf')
 
-    start_time = time.time()
+    start_time = time.perf_counter()
 
     #para generar todas las posibles combinaciones en las que se puede visitar los nodos
-    for perm in permutations(nodes):
+    for count, perm in enumerate(permutations(nodes)):
+        #si corre como trabajo en segundo plano y se pidió cancelarlo se detiene aquí
+        if count & 0xFFFF == 0:
+            raise_if_cancelled()
         path = [start_index] + list(perm) + [start_index]
         cost = 0.0
 
@@ -28,91 +41,170 @@ def solve_tsp_brute_force(distance_matrix: List[List[float]], start_index: int =
             min_cost = cost
             best_path = path
 
-    end_time = time.time()
+    end_time = time.perf_counter()
     #tiempo total que demoró el algoritmo
     execution_time = end_time - start_time
 
-    return TSPResult(path=best_path, total_cost=min_cost, execution_time=execution_time, algorithmName = "Fuerza bruta")
+    return TSPResult(path=best_path, total_cost=min_cost, execution_time=execution_time, algorithmName = "Fuerza bruta", provenOptimal=True)
   
 
 
 #ejecuta TSP usando programación dinámica -> Mediante held-karp (usa bitmasking )
-def solve_tsp_dynamic_programming(distance_matrix: List[List[float]], start_index: int = 0) -> TSPResult:
+#las tablas dp y parent son arreglos de NumPy de 2^(n-1) x (n-1): el nodo inicial no entra en las máscaras
+#(todas lo contienen) y cada capa (máscaras con la misma cantidad de nodos) se calcula con mínimos vectorizados
+#dtype puede ser np.float32 para usar la mitad de memoria en los costos
+def solve_tsp_dynamic_programming(distance_matrix: List[List[float]], start_index: int = 0,
+    dtype=np.float64) -> TSPResult:
+
     n = len(distance_matrix)
-    ALL_VISITED = (1 << n) - 1
-    dp = [[float('inf')] * n for _ in range(1 << n)]
-    parent = [[-1] * n for _ in range(1 << n)]
-    dp[1 << start_index][start_index] = 0
-    start_time = time.time()
-
-    for mask in range(1 << n):
-        for last in range(n):
-            if not (mask & (1 << last)):
-                continue
-            prev_mask = mask ^ (1 << last)
-            if prev_mask == 0 and last != start_index:
-                continue
-            if prev_mask == 0 and last == start_index:
-                continue
-            for k in range(n):
-                if not (prev_mask & (1 << k)):
-                    continue
-                cost = dp[prev_mask][k] + distance_matrix[k][last]
-                if cost < dp[mask][last]:
-                    dp[mask][last] = cost
-                    parent[mask][last] = k
+    start_time = time.perf_counter()
 
-    min_cost = float('inf')
-    last_index = -1
+    if n <= 1:
+        path = [start_index, start_index]
+        execution_time = time.perf_counter() - start_time
+        return TSPResult(path=path, total_cost=_tour_cost(distance_matrix, path), execution_time=execution_time, algorithmName="Programacion Dinamica (Held-Karp)", provenOptimal=True)
 
-    for i in range(n):
-        if i == start_index:
-            continue
-        cost = dp[ALL_VISITED][i] + distance_matrix[i][start_index]
+    dist, others, cost = _held_karp_inputs(distance_matrix, start_index, dtype)
+    m = n - 1
+
+    dp, parent = _held_karp_tables(m, dtype)
+    _held_karp_start(dp, dist, start_index, others)
+
+    for masks in _held_karp_layers(m):
+        raise_if_cancelled()
+        _held_karp_block(dp, parent, masks, cost)
+
+    path = _held_karp_path(dp, parent, dist, start_index, others)
+    end_time = time.perf_counter()
+    execution_time = end_time - start_time
+    return TSPResult(path=path, total_cost=_tour_cost(distance_matrix, path), execution_time=execution_time, algorithmName="Programacion Dinamica (Held-Karp)", provenOptimal=True)
+
+
+#costo usado en lugar de inf para los caminos que no existen
+_UNREACHABLE_COST = 1e18
+#cantidad máxima de celdas (máscaras x nodos) que se calculan de una vez en una capa
+_HELD_KARP_BLOCK_CELLS = 1 << 22
+#en paralelo el bloque se divide entre los procesos, sin bajar de este mínimo
+_HELD_KARP_MIN_BLOCK_CELLS = 1 << 16
+
+
+def _held_karp_block_cells(workers: int) -> int:
+    return max(_HELD_KARP_BLOCK_CELLS // max(workers, 1), _HELD_KARP_MIN_BLOCK_CELLS)
+
+
+#(matriz como arreglo, nodos distintos al inicial, costos entre ellos en dtype)
+#el bit j de una máscara representa others[j]
+def _held_karp_inputs(distance_matrix: List[List[float]], start_index: int, dtype
+) -> Tuple[np.ndarray, List[int], np.ndarray]:
+    n = len(distance_matrix)
+    others = [i for i in range(n) if i != start_index]
+    dist = np.asarray(distance_matrix, dtype=np.float64)
+    #los caminos inexistentes (inf) se cambian por un costo muy alto pero finito,
+    #así el argmin siempre elige un nodo que sí está en la máscara
+    dist = np.where(np.isinf(dist), _UNREACHABLE_COST, dist)
+    return dist, others, dist[np.ix_(others, others)].astype(dtype)
+
+
+#caminos de un solo nodo: del inicio directo a others[j]
+def _held_karp_start(dp: np.ndarray, dist: np.ndarray, start_index: int, others: List[int]):
+    for j in range(len(others)):
+        dp[1 << j, j] = dist[start_index, others[j]]
 
-        if cost < min_cost:
-            min_cost = cost
-            last_index = i
+
+#recorrido óptimo a partir de las tablas completas: mejor cierre hacia el inicio y reconstrucción
+#desde el último nodo hacia atrás
+def _held_karp_path(dp: np.ndarray, parent: np.ndarray, dist: np.ndarray, start_index: int,
+    others: List[int]) -> List[int]:
+    m = len(others)
+    ALL_VISITED = (1 << m) - 1
+    closing = dp[ALL_VISITED] + dist[others, start_index].astype(dp.dtype)
+    curr = int(closing.argmin())
 
     path = [start_index]
     mask = ALL_VISITED
-    curr = last_index
-    
-    for _ in range(n - 1):
-        path.append(curr)
-        temp = parent[mask][curr]
+    for _ in range(m):
+        path.append(others[curr])
+        temp = int(parent[mask, curr])
         mask ^= (1 << curr)
         curr = temp
 
     path.append(start_index)
     path.reverse()
-    end_time = time.time()
-    execution_time = end_time - start_time
-    return TSPResult(path=path, total_cost=min_cost, execution_time=execution_time, algorithmName="Programacion Dinamica (Held-Karp)")
+    return path
+
+
+def _held_karp_tables(m: int, dtype) -> Tuple[np.ndarray, np.ndarray]:
+    dp = np.full((1 << m, m), np.inf, dtype=dtype)
+    #el padre es un índice de nodo (< 128), alcanza con int8
+    parent = np.full((1 << m, m), -1, dtype=np.int8)
+    return dp, parent
+
+
+#retorna las máscaras agrupadas por cantidad de nodos (2, 3, ..., m), en orden creciente
+def _held_karp_layers(m: int) -> List[np.ndarray]:
+    order, bounds = _held_karp_order(m)
+    return [order[bounds[size]:bounds[size + 1]] for size in range(2, m + 1)]
+
+
+#todas las máscaras ordenadas por cantidad de nodos (y de menor a mayor dentro de cada cantidad) y dónde
+#empieza cada cantidad: las máscaras con k nodos son order[bounds[k]:bounds[k + 1]]
+def _held_karp_order(m: int) -> Tuple[np.ndarray, List[int]]:
+    masks = np.arange(1 << m, dtype=np.int64)
+    popcount = np.zeros(1 << m, dtype=np.int8)
+    for bit in range(m):
+        popcount += ((masks >> bit) & 1).astype(np.int8)
+    order = np.argsort(popcount, kind="stable")
+    bounds = np.concatenate([[0], np.cumsum(np.bincount(popcount, minlength=m + 1))])
+    return order, bounds.tolist()
+
+
+#calcula dp[mask][j] = min_k dp[mask sin j][k] + cost[k][j] para un grupo de máscaras del mismo tamaño
+#block_cells limita las celdas (máscaras x nodos) de los arreglos temporales de cada paso
+def _held_karp_block(dp: np.ndarray, parent: np.ndarray, masks: np.ndarray, cost: np.ndarray,
+    block_cells: int = _HELD_KARP_BLOCK_CELLS):
+    m = cost.shape[0]
+    step = max(1, block_cells // m)
+    for start in range(0, len(masks), step):
+        chunk = masks[start:start + step]
+        for j in range(m):
+            bit = 1 << j
+            selected = chunk[(chunk & bit) != 0]
+            if len(selected) == 0:
+                continue
+            #las columnas k que no están en la máscara previa valen inf en dp, así que nunca ganan
+            candidates = dp[selected ^ bit] + cost[:, j]
+            best = candidates.argmin(axis=1)
+            parent[selected, j] = best
+            dp[selected, j] = candidates[np.arange(len(selected)), best]
+
+
+#suma de las distancias de un recorrido
+def _tour_cost(distance_matrix: List[List[float]], path: List[int]) -> float:
+    return float(sum(distance_matrix[a][b] for a, b in zip(path, path[1:])))
 
 
 #ejecuta TSP usando algoritmo Greedy (vecino más cercano)
 def solve_tsp_greedy(distance_matrix: List[List[float]], start_index: int = 0) -> TSPResult:
     n = len(distance_matrix)
-    visited = [False] * n
+    visited = np.zeros(n, dtype=bool)
     path = [start_index]
     visited[start_index] = True
     total_cost = 0.0
     
-    start_time = time.time()
-    
+    start_time = time.perf_counter()
+
+    dist = np.asarray(distance_matrix, dtype=np.float64)
     current_node = start_index
     
     # Visitar n-1 nodos restantes eligiendo siempre el más cercano no visitado
     for _ in range(n - 1):
-        min_distance = float('inf')
-        next_node = -1
-        
-        # Buscar el nodo más cercano no visitado
-        for j in range(n):
-            if not visited[j] and distance_matrix[current_node][j] < min_distance:
-                min_distance = distance_matrix[current_node][j]
-                next_node = j
+        # Buscar el nodo más cercano no visitado (los visitados se descartan con inf)
+        row = np.where(visited, np.inf, dist[current_node])
+        next_node = int(row.argmin())
+        if visited[next_node]:
+            # no hay camino a ningún pendiente, se toma el primero que falte
+            next_node = int(np.flatnonzero(~visited)[0])
+        min_distance = distance_matrix[current_node][next_node]
         
         # Moverse al siguiente nodo
         path.append(next_node)
@@ -124,7 +216,792 @@ def solve_tsp_greedy(distance_matrix: List[List[float]], start_index: int = 0) -
     path.append(start_index)
     total_cost += distance_matrix[current_node][start_index]
     
-    end_time = time.time()
+    end_time = time.perf_counter()
     execution_time = end_time - start_time
     
-    return TSPResult(path=path, total_cost=total_cost, execution_time=execution_time, algorithmName="Greedy (Vecino mas cercano)")
\ No newline at end of file
+    return TSPResult(path=path, total_cost=total_cost, execution_time=execution_time, algorithmName="Greedy (Vecino mas cercano)")
+
+
+#ejecuta TSP con búsqueda local: parte de un recorrido (greedy si no se da otro) y lo mejora con
+#movimientos 2-opt y Or-opt hasta que ninguno reduzca el costo
+#solo se prueban los k vecinos más cercanos de cada nodo y se usan "don't-look bits": un nodo que no
+#logró mejorar no se vuelve a revisar hasta que cambie una de sus aristas
+def solve_tsp_local_search(distance_matrix: List[List[float]], start_index: int = 0,
+    initial_path: Optional[List[int]] = None, neighbors: int = 10) -> TSPResult:
+
+    start_time = time.perf_counter()
+
+    if initial_path is None:
+        initial_path = solve_tsp_greedy(distance_matrix, start_index).path
+    path = _local_search(distance_matrix, initial_path, neighbors)
+    path = rotate_to_start(path, start_index)
+
+    end_time = time.perf_counter()
+    execution_time = end_time - start_time
+    return TSPResult(path=path, total_cost=_tour_cost(distance_matrix, path), execution_time=execution_time, algorithmName="Busqueda local (2-opt + Or-opt)")
+
+
+#mejora mínima para aceptar un movimiento (evita ciclos por errores de redondeo)
+_LOCAL_SEARCH_EPS = 1e-7
+
+
+#lista de los k nodos más cercanos a cada nodo, ordenados por distancia
+def _nearest_neighbors(distance_matrix, k: int) -> List[List[int]]:
+    dist = np.array(distance_matrix, dtype=np.float64)
+    np.fill_diagonal(dist, np.inf)
+    k = max(1, min(k, len(dist) - 1))
+    nearest = np.argpartition(dist, k - 1, axis=1)[:, :k]
+    order = np.take_along_axis(dist, nearest, axis=1).argsort(axis=1, kind="stable")
+    return np.take_along_axis(nearest, order, axis=1).tolist()
+
+
+#recorrido cerrado [a, ..., a] rotado para que empiece y termine en start_index
+def rotate_to_start(path: List[int], start_index: int) -> List[int]:
+    cycle = path[:-1]
+    k = cycle.index(start_index)
+    return cycle[k:] + cycle[:k] + [start_index]
+
+
+#búsqueda local 2-opt + Or-opt sobre un recorrido cerrado, retorna el recorrido mejorado (cerrado)
+#el 2-opt invierte tramos, así que solo se usa cuando la matriz es simétrica
+#queue: nodos a revisar (por defecto todos); near y symmetric se pueden pasar ya calculados para no
+#recalcularlos en cada llamada (búsqueda local iterada)
+def _local_search(distance_matrix: List[List[float]], path: List[int], neighbors: int = 10,
+    queue: Optional[List[int]] = None, near: Optional[List[List[int]]] = None,
+    symmetric: Optional[bool] = None) -> List[int]:
+    d = distance_matrix
+    tour = list(path[:-1])
+    n = len(tour)
+    if n <= 3:
+        return list(path)
+
+    pos = [0] * n
+    for k, city in enumerate(tour):
+        pos[city] = k
+
+    if near is None or symmetric is None:
+        dist = np.asarray(d, dtype=np.float64)
+        near = _nearest_neighbors(dist, neighbors)
+        symmetric = bool(np.array_equal(dist, dist.T))
+
+    #invierte el tramo tour[i..j] (hacia adelante, puede dar la vuelta); con matriz simétrica
+    #invertir el complemento da el mismo ciclo, así que se invierte el más corto de los dos
+    def reverse(i: int, j: int):
+        length = (j - i) % n + 1
+        if 2 * length > n:
+            i, j = (j + 1) % n, (i - 1) % n
+            length = n - length
+        if i <= j:
+            tour[i:j + 1] = tour[i:j + 1][::-1]
+            for k in range(i, j + 1):
+                pos[tour[k]] = k
+        else:
+            for _ in range(length // 2):
+                tour[i], tour[j] = tour[j], tour[i]
+                pos[tour[i]] = i
+                pos[tour[j]] = j
+                i = (i + 1) % n
+                j = (j - 1) % n
+
+    #2-opt: cambia las aristas (a, b) y (c, e) por (a, c) y (b, e), con b vecino de a en el recorrido
+    def two_opt(a: int) -> Optional[List[int]]:
+        for step in (1, -1):
+            b = tour[(pos[a] + step) % n]
+            d_ab = d[a][b]
+            for c in near[a]:
+                d_ac = d[a][c]
+                #si (a, c) ya es más larga que (a, b) ningún vecino más lejano puede mejorar
+                if d_ac >= d_ab:
+                    break
+                e = tour[(pos[c] + step) % n]
+                if c == b or e == a:
+                    continue
+                if d_ac + d[b][e] - d_ab - d[c][e] < -_LOCAL_SEARCH_EPS:
+                    if step == 1:
+                        reverse(pos[b], pos[c])
+                    else:
+                        reverse(pos[c], pos[b])
+                    return [a, b, c, e]
+        return None
+
+    #Or-opt: mueve el tramo de 1 a 3 nodos que empieza en a entre dos nodos consecutivos (x, y)
+    #cercanos a sus extremos, en el mismo sentido o invertido (solo con matriz simétrica)
+    def or_opt(a: int) -> Optional[List[int]]:
+        nonlocal tour
+        for length in (1, 2, 3):
+            if n < length + 3:
+                break
+            i = pos[a]
+            segment = [tour[(i + k) % n] for k in range(length)]
+            first, last = segment[0], segment[-1]
+            prev, nxt = tour[(i - 1) % n], tour[(i + length) % n]
+            removal_gain = d[prev][first] + d[last][nxt] - d[prev][nxt]
+            if removal_gain <= _LOCAL_SEARCH_EPS:
+                continue
+
+            best_gain, best_move = _LOCAL_SEARCH_EPS, None
+            for c in near[first] + near[last]:
+                if c in segment:
+                    continue
+                for x, y in ((c, tour[(pos[c] + 1) % n]), (tour[(pos[c] - 1) % n], c)):
+                    if x in segment or y in segment:
+                        continue
+                    gain = removal_gain - (d[x][first] + d[last][y] - d[x][y])
+                    if gain > best_gain:
+                        best_gain, best_move = gain, (x, y, False)
+                    if symmetric:
+                        gain = removal_gain - (d[x][last] + d[first][y] - d[x][y])
+                        if gain > best_gain:
+                            best_gain, best_move = gain, (x, y, True)
+
+            if best_move is None:
+                continue
+
+            x, y, reverse_segment = best_move
+            if i + length > n:
+                #el tramo da la vuelta al final de la lista: se rota para que quede contiguo
+                tour = tour[i:] + tour[:i]
+                for k, city in enumerate(tour):
+                    pos[city] = k
+                i = 0
+            del tour[i:i + length]
+            at = pos[x] + 1 if pos[x] < i else pos[x] + 1 - length
+            tour[at:at] = segment[::-1] if reverse_segment else segment
+            for k in range(min(i, at), max(i, at) + length):
+                pos[tour[k]] = k
+            return [prev, nxt, first, last, x, y]
+        return None
+
+    active = deque(tour if queue is None else dict.fromkeys(queue))
+    queued = [False] * n
+    for city in active:
+        queued[city] = True
+    while active:
+        a = active.popleft()
+        queued[a] = False
+        touched = (two_opt(a) if symmetric else None) or or_opt(a)
+        if touched:
+            for city in touched:
+                if not queued[city]:
+                    queued[city] = True
+                    active.append(city)
+
+    return tour + [tour[0]]
+
+
+#ejecuta TSP exacto usando ramificación y poda (búsqueda en profundidad)
+#parte del recorrido greedy (mejorado con búsqueda local) como cota superior y poda las ramas cuyo costo parcial más una cota inferior
+#de lo que falta ya no puede mejorar la mejor solución encontrada
+def solve_tsp_branch_and_bound(distance_matrix: List[List[float]], start_index: int = 0) -> TSPResult:
+    start_time = time.perf_counter()
+
+    #cota superior inicial: recorrido greedy mejorado con búsqueda local
+    greedy = solve_tsp_greedy(distance_matrix, start_index)
+    initial_path = rotate_to_start(_local_search(distance_matrix, greedy.path), start_index)
+
+    best_path, best_cost, _ = _branch_and_bound(distance_matrix, start_index, initial_path, _tour_cost(distance_matrix, initial_path))
+
+    end_time = time.perf_counter()
+    execution_time = end_time - start_time
+    return TSPResult(path=best_path, total_cost=best_cost, execution_time=execution_time, algorithmName="Ramificacion y poda", provenOptimal=True)
+
+
+#máximo de estados (visitados, nodo actual) que se guardan para la poda por dominancia
+_BRANCH_AND_BOUND_MEMO_LIMIT = 1_000_000
+
+
+#se lanza dentro de la búsqueda en profundidad cuando se acaba el tiempo
+class _DeadlineReached(Exception):
+    pass
+
+
+#búsqueda en profundidad con costo parcial incremental, retorna (mejor camino, mejor costo, terminó)
+#con deadline (time.perf_counter) se detiene al llegar a ese momento y retorna el mejor recorrido
+#encontrado hasta ahí con terminó = False (no está probado que sea el óptimo)
+#memo_limit limita los estados guardados para la poda por dominancia y las cotas de árbol mínimo
+#con shared (_SharedIncumbent, portafolio) poda también con el mejor costo de los otros procesos, publica los
+#recorridos que mejora y se detiene cuando se lo piden; terminó = True prueba que no hay un recorrido mejor
+#que el mejor de todos los procesos
+def _branch_and_bound(distance_matrix: List[List[float]], start_index: int,
+    best_path: List[int], best_cost: float, deadline: Optional[float] = None,
+    memo_limit: int = _BRANCH_AND_BOUND_MEMO_LIMIT, shared: Optional["_SharedIncumbent"] = None
+) -> Tuple[List[int], float, bool]:
+
+    n = len(distance_matrix)
+    if n <= 2:
+        return best_path, best_cost, True
+
+    d = distance_matrix
+    symmetric = all(d[i][j] == d[j][i] for i in range(n) for j in range(i + 1, n))
+
+    #las dos aristas más baratas que salen de cada nodo (cota inferior de lo que falta por recorrer)
+    min_out = []
+    min_in = []
+    two_cheapest = []
+    for i in range(n):
+        out = sorted(d[i][j] for j in range(n) if j != i)
+        min_out.append(out[0])
+        min_in.append(min(d[j][i] for j in range(n) if j != i))
+        two_cheapest.append((out[0] + out[1]) / 2)
+
+    #vecinos de cada nodo del más cercano al más lejano, se prueban primero las ramas más baratas
+    order = [sorted((j for j in range(n) if j != i), key=lambda j, i=i: d[i][j]) for i in range(n)]
+
+    #para no revisar cada recorrido en los dos sentidos (matriz simétrica) el nodo first_node
+    #siempre se visita antes que second_node
+    others = [i for i in range(n) if i != start_index]
+    first_node, second_node = others[0], others[1]
+
+    unvisited_all = 0
+    for i in others:
+        unvisited_all |= 1 << i
+
+    #cota inferior de lo que falta: desde current por todos los nodos de unvisited y de vuelta al inicio
+    # - simétrica: cada nodo pendiente usa dos aristas y current/inicio una, cada arista se cuenta dos veces
+    # - asimétrica: cada nodo pendiente y current salen una vez, cada pendiente y el inicio entran una vez
+    def remaining_bound(current: int, sums: Tuple[float, float, float]) -> float:
+        if symmetric:
+            return sums[0] + (min_out[current] + min_out[start_index]) / 2
+        return max(sums[1] + min_out[current], sums[2] + min_in[start_index])
+
+    #árbol de expansión mínima (sobre min(d[i][j], d[j][i])) de los nodos de una máscara más la arista
+    #más barata de esos nodos de vuelta al inicio: el tramo que falta (nxt -> pendientes -> inicio) es un
+    #camino por todos los pendientes, que nunca cuesta menos que su árbol mínimo (cota tipo 1-tree)
+    undirected = d if symmetric else [[min(d[i][j], d[j][i]) for j in range(n)] for i in range(n)]
+    mst_cache = {}
+
+    def tail_bound(mask: int) -> float:
+        bound = mst_cache.get(mask)
+        if bound is not None:
+            return bound
+        nodes = [i for i in others if mask & (1 << i)]
+        bound = min(d[i][start_index] for i in nodes)
+        #algoritmo de Prim
+        added = nodes.pop()
+        closest = [undirected[added][i] for i in nodes]
+        while nodes:
+            k = min(range(len(nodes)), key=closest.__getitem__)
+            bound += closest[k]
+            added = nodes[k]
+            nodes[k] = nodes[-1]
+            closest[k] = closest[-1]
+            nodes.pop()
+            closest.pop()
+            row = undirected[added]
+            for t in range(len(nodes)):
+                if row[nodes[t]] < closest[t]:
+                    closest[t] = row[nodes[t]]
+        if len(mst_cache) < memo_limit:
+            mst_cache[mask] = bound
+        return bound
+
+    #[mejor costo propio, su recorrido, cota para podar (el menor entre el propio y el compartido)]
+    best = [best_cost, list(best_path), best_cost]
+    path = [start_index]
+    memo = {}
+    #llamadas hechas; el reloj, el estado compartido y la cancelación del trabajo se revisan en la primera
+    #y después cada 1024
+    calls = [0]
+
+    def dfs(current: int, unvisited: int, cost: float, sums: Tuple[float, float, float]):
+        calls[0] += 1
+        if calls[0] & 1023 == 1:
+            raise_if_cancelled()
+            if deadline is not None and time.perf_counter() >= deadline:
+                raise _DeadlineReached()
+            if shared is not None:
+                if shared.stopped():
+                    raise _DeadlineReached()
+                best[2] = min(best[2], shared.best_cost())
+
+        if unvisited == 0:
+            total = cost + d[current][start_index]
+            if total < best[2]:
+                best[0] = best[2] = total
+                best[1] = path + [start_index]
+                if shared is not None:
+                    shared.offer(total, best[1])
+            return
+
+        #poda por dominancia: ya se llegó al mismo estado con un costo menor o igual
+        key = unvisited * n + current
+        seen = memo.get(key)
+        if seen is not None and seen <= cost:
+            return
+        if seen is not None or len(memo) < memo_limit:
+            memo[key] = cost
+
+        for nxt in order[current]:
+            bit = 1 << nxt
+            if not unvisited & bit:
+                continue
+            if symmetric and nxt == second_node and unvisited & (1 << first_node):
+                continue
+
+            child_cost = cost + d[current][nxt]
+            child_sums = (sums[0] - two_cheapest[nxt], sums[1] - min_out[nxt], sums[2] - min_in[nxt])
+            rest = unvisited ^ bit
+            if rest == 0:
+                if child_cost + d[nxt][start_index] >= best[2]:
+                    continue
+            else:
+                if child_cost + remaining_bound(nxt, child_sums) >= best[2]:
+                    continue
+                #cota más fuerte (y más cara): arista más barata de nxt hacia un pendiente + árbol mínimo
+                #de los pendientes + regreso más barato al inicio
+                first_hop = next(d[nxt][x] for x in order[nxt] if rest & (1 << x))
+                if child_cost + first_hop + tail_bound(rest) >= best[2]:
+                    continue
+
+            path.append(nxt)
+            dfs(nxt, rest, child_cost, child_sums)
+            path.pop()
+
+    sums = (
+        sum(two_cheapest[i] for i in others),
+        sum(min_out[i] for i in others),
+        sum(min_in[i] for i in others),
+    )
+    try:
+        dfs(start_index, unvisited_all, 0.0, sums)
+    except _DeadlineReached:
+        return best[1], best[0], False
+
+    return best[1], best[0], True
+
+
+#presupuestos por defecto del modo automático: tiempo (segundos) y memoria (MB) por ejecución
+AUTO_TIME_BUDGET_S = float(os.environ.get("AUTO_TIME_BUDGET_S", "5"))
+AUTO_MEMORY_BUDGET_MB = float(os.environ.get("AUTO_MEMORY_BUDGET_MB", "512"))
+
+#segundos por paso de cada algoritmo exacto (medidos y redondeados hacia arriba, el doble de lo medido):
+#fuerza bruta suma n distancias por permutación, Held-Karp hace m² operaciones vectorizadas por máscara
+_BRUTE_FORCE_SECONDS_PER_STEP = 1.5e-7
+_HELD_KARP_SECONDS_PER_STEP = 6e-9
+#bytes aproximados de cada estado guardado por ramificación y poda (entrada de diccionario)
+_BRANCH_AND_BOUND_STATE_BYTES = 150
+#hasta esta cantidad de puntos, si no cabe un algoritmo exacto, se intenta ramificación y poda
+#después de la búsqueda local iterada (que se queda con esta fracción del tiempo)
+_AUTO_BRANCH_AND_BOUND_MAX_N = 40
+_AUTO_LOCAL_SEARCH_SHARE = 0.25
+
+
+#(segundos, bytes) estimados para resolver n puntos con un algoritmo exacto (brute-force o dynamic)
+#incluye la matriz de distancias como arreglo de NumPy; con workers > 1 es Held-Karp en paralelo
+#(solve_tsp_dynamic_programming_parallel): el tiempo se reparte y cada proceso tiene sus temporales
+def estimate_tsp_cost(algorithm: str, n: int, workers: int = 1) -> Tuple[float, int]:
+    matrix_bytes = 8 * n * n
+    #con tantos puntos el costo no cabe en un float, ningún presupuesto alcanza
+    if n > 64:
+        return math.inf, matrix_bytes
+    if algorithm == "brute-force":
+        steps = math.factorial(max(n - 1, 0)) * n
+        return steps * _BRUTE_FORCE_SECONDS_PER_STEP, matrix_bytes + 64 * n
+    if algorithm == "dynamic":
+        m = max(n - 1, 1)
+        masks = 1 << m
+        #dp (float64) y parent (int8) de masks x m, las capas (máscaras, orden y cantidad de bits) y
+        #los dos temporales de cada bloque de _held_karp_block; en paralelo el orden también se copia
+        #a la memoria compartida y cada proceso tiene sus temporales
+        workers = max(workers, 1)
+        tables = masks * m * 9 + masks * 17 + (masks * 8 if workers > 1 else 0)
+        block = 2 * 8 * min(_held_karp_block_cells(workers), masks * m) * workers
+        return masks * m * m * _HELD_KARP_SECONDS_PER_STEP / workers, matrix_bytes + tables + block
+    raise ValueError(f"No cost estimate for {algorithm}.")
+
+
+#modo automático: con presupuesto de tiempo y memoria (por defecto AUTO_TIME_BUDGET_S y AUTO_MEMORY_BUDGET_MB)
+#usa el algoritmo exacto más rápido que quepa en los dos según estimate_tsp_cost; si ninguno cabe parte del
+#greedy + búsqueda local y lo sigue mejorando (búsqueda local iterada) hasta el límite de tiempo, y con pocos
+#puntos intenta probar el óptimo con ramificación y poda hasta ese mismo límite
+#retorna el mejor recorrido encontrado; provenOptimal indica si es el óptimo
+def solve_tsp_auto(distance_matrix: List[List[float]], start_index: int = 0,
+    time_budget_s: Optional[float] = None, memory_budget_mb: Optional[float] = None) -> TSPResult:
+
+    start_time = time.perf_counter()
+    time_budget_s = AUTO_TIME_BUDGET_S if time_budget_s is None else time_budget_s
+    memory_budget_mb = AUTO_MEMORY_BUDGET_MB if memory_budget_mb is None else memory_budget_mb
+    deadline = start_time + time_budget_s
+    memory_budget = memory_budget_mb * 1024 * 1024
+    n = len(distance_matrix)
+
+    exact = []
+    for algorithm, solver in (("brute-force", solve_tsp_brute_force), ("dynamic", solve_tsp_dynamic_programming)):
+        seconds, nbytes = estimate_tsp_cost(algorithm, n)
+        if n <= 3 or (seconds <= time_budget_s and nbytes <= memory_budget):
+            exact.append((seconds, algorithm, solver))
+    if exact:
+        _, _, solver = min(exact, key=lambda option: option[0])
+        result = solver(distance_matrix, start_index)
+        return TSPResult(path=result.path, total_cost=result.total_cost, execution_time=time.perf_counter() - start_time,
+            algorithmName=f"Automatico: {result.algorithmName}", provenOptimal=True)
+
+    dist = np.asarray(distance_matrix, dtype=np.float64)
+    near = _nearest_neighbors(dist, 10)
+    symmetric = bool(np.array_equal(dist, dist.T))
+    path = _local_search(distance_matrix, solve_tsp_greedy(distance_matrix, start_index).path,
+        near=near, symmetric=symmetric)
+
+    method, proven = "Busqueda local iterada", False
+    memo_limit = min(_BRANCH_AND_BOUND_MEMO_LIMIT, int(memory_budget // (2 * _BRANCH_AND_BOUND_STATE_BYTES)))
+    if n <= _AUTO_BRANCH_AND_BOUND_MAX_N:
+        local_deadline = start_time + time_budget_s * _AUTO_LOCAL_SEARCH_SHARE
+        path = rotate_to_start(_iterated_local_search(distance_matrix, path, local_deadline, near, symmetric), start_index)
+        path, _, proven = _branch_and_bound(distance_matrix, start_index, path, _tour_cost(distance_matrix, path),
+            deadline=deadline, memo_limit=memo_limit)
+        if proven:
+            method = "Ramificacion y poda"
+    else:
+        path = _iterated_local_search(distance_matrix, path, deadline, near, symmetric)
+
+    path = rotate_to_start(path, start_index)
+    return TSPResult(path=path, total_cost=_tour_cost(distance_matrix, path), execution_time=time.perf_counter() - start_time,
+        algorithmName=f"Automatico: {method}", provenOptimal=proven)
+
+
+#búsqueda local iterada: perturba el mejor recorrido con un double-bridge (corta el recorrido en cuatro
+#tramos A B C D y los une como A C B D, un cambio que 2-opt y Or-opt no deshacen con un solo movimiento),
+#lo vuelve a optimizar revisando solo los nodos de las aristas cambiadas y se queda con el resultado si
+#es mejor; se repite hasta deadline (time.perf_counter)
+#con shared (portafolio) publica cada mejora y se detiene cuando se lo piden
+def _iterated_local_search(distance_matrix: List[List[float]], path: List[int], deadline: float,
+    near: List[List[int]], symmetric: bool, seed: int = 0, shared: Optional["_SharedIncumbent"] = None
+) -> List[int]:
+
+    best = list(path)
+    best_cost = _tour_cost(distance_matrix, best)
+    n = len(best) - 1
+    if n < 8:
+        return best
+
+    rng = random.Random(seed)
+    while time.perf_counter() < deadline and not (shared is not None and shared.stopped()):
+        raise_if_cancelled()
+        tour = best[:-1]
+        i, j, k = sorted(rng.sample(range(1, n), 3))
+        candidate = tour[:i] + tour[j:k] + tour[i:j] + tour[k:]
+        touched = [tour[i - 1], tour[i], tour[j - 1], tour[j], tour[k - 1], tour[k]]
+        candidate = _local_search(distance_matrix, candidate + [candidate[0]], queue=touched, near=near, symmetric=symmetric)
+        cost = _tour_cost(distance_matrix, candidate)
+        if cost < best_cost - _LOCAL_SEARCH_EPS:
+            best, best_cost = candidate, cost
+            if shared is not None:
+                shared.offer(best_cost, best)
+    return best
+
+
+#procesos del modo portafolio (por defecto uno por núcleo)
+PORTFOLIO_WORKERS = int(os.environ.get("PORTFOLIO_WORKERS", "0")) or (os.cpu_count() or 1)
+#segundos que se espera a que los procesos (portafolio, Held-Karp en paralelo) terminen por su cuenta
+#antes de terminarlos a la fuerza
+_WORKER_GRACE_S = 1.0
+#los procesos (portafolio, Held-Karp en paralelo) se crean con spawn: el servidor tiene hilos (peticiones,
+#trabajos) y con fork el proceso hijo puede heredar un lock tomado por otro hilo y quedarse bloqueado
+_START_METHOD = "spawn"
+#segundos máximos entre revisiones de la cancelación del trabajo mientras se espera a los procesos
+_CANCEL_POLL_S = 0.25
+
+_PORTFOLIO_NAMES = {
+    "dynamic": "Programacion Dinamica (Held-Karp)",
+    "branch-and-bound": "Ramificacion y poda",
+    "iterated-local-search": "Busqueda local iterada",
+}
+
+
+#mejor recorrido compartido entre los procesos del portafolio (memoria compartida de multiprocessing):
+#costo, recorrido cerrado (sin rotar al inicio), proceso que lo encontró, si está probado que es el óptimo
+#y la señal para detenerse; el costo y el recorrido se actualizan juntos con el lock del costo
+class _SharedIncumbent:
+
+    def __init__(self, context, n: int):
+        self._cost = context.Value("d", math.inf)
+        self._path = context.Array("i", n + 1, lock=False)
+        self._owner = context.Value("i", -1, lock=False)
+        self._proven = context.Value("b", 0, lock=False)
+        self._stop = context.Value("b", 0, lock=False)
+        #proceso que usa esta copia (se asigna dentro de cada proceso)
+        self.owner = -1
+
+    #publica el recorrido si es mejor que el compartido, retorna el mejor costo compartido
+    def offer(self, cost: float, path: List[int]) -> float:
+        with self._cost.get_lock():
+            if cost < self._cost.value:
+                self._cost.value = cost
+                self._path[:] = path
+                self._owner.value = self.owner
+            return self._cost.value
+
+    def best_cost(self) -> float:
+        return self._cost.value
+
+    def mark_proven(self):
+        self._proven.value = 1
+
+    def proven(self) -> bool:
+        return bool(self._proven.value)
+
+    def stop(self):
+        self._stop.value = 1
+
+    def stopped(self) -> bool:
+        return bool(self._stop.value)
+
+    #(costo, recorrido, proceso, probado); si un proceso se terminó a la fuerza con el lock tomado se lee sin él
+    def snapshot(self) -> Tuple[float, List[int], int, bool]:
+        lock = self._cost.get_lock()
+        locked = lock.acquire(timeout=_WORKER_GRACE_S)
+        try:
+            return self._cost.get_obj().value, list(self._path), self._owner.value, self.proven()
+        finally:
+            if locked:
+                lock.release()
+
+
+#portafolio: varios algoritmos a la vez en procesos distintos sobre la misma matriz, compartiendo el mejor
+#recorrido encontrado. Held-Karp (si cabe en los presupuestos, como en solve_tsp_auto), ramificación y poda
+#(hasta 40 puntos, poda con el mejor costo de todos) y en los demás procesos búsqueda local iterada desde un
+#greedy que empieza en un punto al azar distinto en cada uno. Cuando uno prueba el óptimo o se acaba el
+#tiempo se detienen todos (los que no responden se terminan) y se retorna el mejor recorrido compartido
+def solve_tsp_portfolio(distance_matrix: List[List[float]], start_index: int = 0,
+    time_budget_s: Optional[float] = None, memory_budget_mb: Optional[float] = None,
+    workers: Optional[int] = None) -> TSPResult:
+
+    start_time = time.perf_counter()
+    time_budget_s = AUTO_TIME_BUDGET_S if time_budget_s is None else time_budget_s
+    memory_budget = (AUTO_MEMORY_BUDGET_MB if memory_budget_mb is None else memory_budget_mb) * 1024 * 1024
+    workers = PORTFOLIO_WORKERS if workers is None else workers
+    n = len(distance_matrix)
+
+    if n <= 3 or workers <= 1:
+        result = solve_tsp_auto(distance_matrix, start_index, time_budget_s, memory_budget / (1024 * 1024))
+        return TSPResult(path=result.path, total_cost=result.total_cost, execution_time=time.perf_counter() - start_time,
+            algorithmName=result.algorithmName.replace("Automatico", "Portafolio"), provenOptimal=result.provenOptimal)
+
+    strategies = []
+    seconds, dynamic_bytes = estimate_tsp_cost("dynamic", n)
+    if seconds <= time_budget_s and dynamic_bytes <= memory_budget:
+        strategies.append("dynamic")
+        memory_budget -= dynamic_bytes
+    if n <= _AUTO_BRANCH_AND_BOUND_MAX_N:
+        strategies.append("branch-and-bound")
+    strategies = strategies[:workers]
+    strategies += ["iterated-local-search"] * (workers - len(strategies))
+    memo_limit = min(_BRANCH_AND_BOUND_MEMO_LIMIT, int(memory_budget // (2 * _BRANCH_AND_BOUND_STATE_BYTES)))
+
+    context = multiprocessing.get_context(_START_METHOD)
+    shared = _SharedIncumbent(context, n)
+    processes = [
+        context.Process(target=_portfolio_worker, daemon=True,
+            args=(strategy, index, distance_matrix, start_index, time_budget_s, memo_limit, shared))
+        for index, strategy in enumerate(strategies)
+    ]
+    for process in processes:
+        process.start()
+
+    try:
+        pending = [process.sentinel for process in processes]
+        deadline = start_time + time_budget_s
+        while pending and not shared.proven():
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            finished = wait(pending, timeout=min(remaining, _CANCEL_POLL_S))
+            pending = [sentinel for sentinel in pending if sentinel not in finished]
+            #al cancelar el trabajo se detienen los procesos (finally) antes de salir
+            raise_if_cancelled()
+    finally:
+        shared.stop()
+        for process in processes:
+            process.join(timeout=_WORKER_GRACE_S)
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+                process.join()
+
+    cost, path, owner, proven = shared.snapshot()
+    if owner < 0:
+        raise RuntimeError("No portfolio worker produced a tour.")
+    path = rotate_to_start(path, start_index)
+    return TSPResult(path=path, total_cost=_tour_cost(distance_matrix, path), execution_time=time.perf_counter() - start_time,
+        algorithmName=f"Portafolio: {_PORTFOLIO_NAMES[strategies[owner]]}", provenOptimal=proven)
+
+
+#un proceso del portafolio; el resultado queda en shared
+def _portfolio_worker(strategy: str, index: int, distance_matrix: List[List[float]], start_index: int,
+    time_budget_s: float, memo_limit: int, shared: _SharedIncumbent):
+
+    deadline = time.perf_counter() + time_budget_s
+    shared.owner = index
+
+    if strategy == "dynamic":
+        result = solve_tsp_dynamic_programming(distance_matrix, start_index)
+        shared.offer(result.total_cost, result.path)
+        shared.mark_proven()
+        return
+
+    dist = np.asarray(distance_matrix, dtype=np.float64)
+    near = _nearest_neighbors(dist, 10)
+    symmetric = bool(np.array_equal(dist, dist.T))
+
+    #cada proceso de búsqueda local iterada arranca el greedy desde un punto distinto (el primero, desde el inicio)
+    rng = random.Random(index)
+    first = start_index if strategy == "branch-and-bound" or index == 0 else rng.randrange(len(distance_matrix))
+    path = _local_search(distance_matrix, solve_tsp_greedy(distance_matrix, first).path, near=near, symmetric=symmetric)
+    path = rotate_to_start(path, start_index)
+    shared.offer(_tour_cost(distance_matrix, path), path)
+
+    if strategy == "branch-and-bound":
+        _, _, complete = _branch_and_bound(distance_matrix, start_index, path, _tour_cost(distance_matrix, path),
+            deadline=deadline, memo_limit=memo_limit, shared=shared)
+        if complete:
+            shared.mark_proven()
+    else:
+        _iterated_local_search(distance_matrix, path, deadline, near, symmetric, seed=index, shared=shared)
+
+
+#procesos de Held-Karp en paralelo (por defecto uno por núcleo)
+HELD_KARP_WORKERS = int(os.environ.get("HELD_KARP_WORKERS", "0")) or (os.cpu_count() or 1)
+#con menos nodos que esto el trabajo por capa es tan poco que no vale la pena crear procesos
+_HELD_KARP_PARALLEL_MIN_N = 14
+
+
+#Held-Karp no cabe en la memoria permitida (presupuesto o memoria compartida libre del sistema)
+class HeldKarpTooLargeError(ValueError):
+    pass
+
+
+#bytes libres en la memoria compartida del sistema (/dev/shm), None si no se puede saber
+def _shared_memory_free_bytes() -> Optional[int]:
+    try:
+        stats = os.statvfs("/dev/shm")
+    except (AttributeError, OSError):
+        return None
+    return stats.f_bavail * stats.f_frsize
+
+
+#Held-Karp en varios procesos: cada capa (máscaras con la misma cantidad de nodos) depende solo de la
+#anterior, así que se reparte entre los procesos y todos esperan en una barrera antes de pasar a la
+#siguiente; dp, parent y el orden de las máscaras están en memoria compartida y no se copian
+#antes de empezar estima la memoria (estimate_tsp_cost) y si no cabe en memory_budget_mb (por defecto
+#AUTO_MEMORY_BUDGET_MB) o en la memoria compartida libre lanza HeldKarpTooLargeError
+#con pocos nodos o un solo proceso usa solve_tsp_dynamic_programming
+def solve_tsp_dynamic_programming_parallel(distance_matrix: List[List[float]], start_index: int = 0,
+    workers: Optional[int] = None, memory_budget_mb: Optional[float] = None, dtype=np.float64) -> TSPResult:
+
+    start_time = time.perf_counter()
+    n = len(distance_matrix)
+    workers = HELD_KARP_WORKERS if workers is None else workers
+    memory_budget_mb = AUTO_MEMORY_BUDGET_MB if memory_budget_mb is None else memory_budget_mb
+
+    _, needed = estimate_tsp_cost("dynamic", n, workers)
+    if needed > memory_budget_mb * 1024 * 1024:
+        raise HeldKarpTooLargeError(
+            f"Held-Karp for {n} points needs about {needed / 2**20:.0f} MB, over the {memory_budget_mb:g} MB budget.")
+
+    if n < _HELD_KARP_PARALLEL_MIN_N or workers <= 1:
+        return solve_tsp_dynamic_programming(distance_matrix, start_index, dtype)
+
+    m = n - 1
+    itemsize = np.dtype(dtype).itemsize
+    sizes = ((1 << m) * m * itemsize, (1 << m) * m, (1 << m) * 8)
+    free = _shared_memory_free_bytes()
+    if free is not None and sum(sizes) > free:
+        raise HeldKarpTooLargeError(
+            f"Held-Karp for {n} points needs {sum(sizes) / 2**20:.0f} MB of shared memory, "
+            f"only {free / 2**20:.0f} MB are free.")
+
+    dist, others, cost = _held_karp_inputs(distance_matrix, start_index, dtype)
+    order, bounds = _held_karp_order(m)
+    context = multiprocessing.get_context(_START_METHOD)
+
+    blocks = []
+    tables = []
+    try:
+        blocks = [shared_memory.SharedMemory(create=True, size=size) for size in sizes]
+        tables = _held_karp_shared_tables(blocks, m, dtype)
+        dp, parent, shared_order = tables
+        dp.fill(np.inf)
+        parent.fill(-1)
+        shared_order[:] = order
+        del order
+        _held_karp_start(dp, dist, start_index, others)
+
+        barrier = context.Barrier(workers)
+        processes = [
+            context.Process(target=_held_karp_worker, daemon=True, args=(
+                index, workers, m, dtype, [block.name for block in blocks], bounds, cost,
+                _held_karp_block_cells(workers), barrier))
+            for index in range(workers)
+        ]
+        for process in processes:
+            process.start()
+        try:
+            #si un proceso falla (o se termina por falta de memoria) la barrera se rompe para que los demás no
+            #se queden esperando
+            pending = [process.sentinel for process in processes]
+            while pending:
+                finished = wait(pending, timeout=_CANCEL_POLL_S)
+                pending = [sentinel for sentinel in pending if sentinel not in finished]
+                if any(process.exitcode not in (None, 0) for process in processes):
+                    barrier.abort()
+                    break
+                #al cancelar el trabajo la barrera rota hace que los procesos terminen después de su capa
+                if cancel_requested():
+                    barrier.abort()
+                    raise JobCancelledError("Job cancelled.")
+        finally:
+            for process in processes:
+                process.join(timeout=_WORKER_GRACE_S)
+                if process.is_alive():
+                    process.terminate()
+                    process.join()
+        if any(process.exitcode != 0 for process in processes):
+            raise RuntimeError("A Held-Karp worker process failed.")
+
+        path = _held_karp_path(dp, parent, dist, start_index, others)
+    finally:
+        #las vistas de NumPy tienen que soltarse antes de cerrar la memoria compartida
+        dp = parent = shared_order = None
+        tables.clear()
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+    execution_time = time.perf_counter() - start_time
+    return TSPResult(path=path, total_cost=_tour_cost(distance_matrix, path), execution_time=execution_time,
+        algorithmName="Programacion Dinamica paralela (Held-Karp)", provenOptimal=True)
+
+
+#dp, parent y orden de las máscaras sobre los bloques de memoria compartida
+def _held_karp_shared_tables(blocks: list, m: int, dtype) -> List[np.ndarray]:
+    return [
+        np.ndarray((1 << m, m), dtype=dtype, buffer=blocks[0].buf),
+        np.ndarray((1 << m, m), dtype=np.int8, buffer=blocks[1].buf),
+        np.ndarray(1 << m, dtype=np.int64, buffer=blocks[2].buf),
+    ]
+
+
+#un proceso de Held-Karp en paralelo: en cada capa calcula su tramo de máscaras y espera a los demás
+def _held_karp_worker(index: int, workers: int, m: int, dtype, names: List[str], bounds: List[int],
+    cost: np.ndarray, block_cells: int, barrier):
+
+    blocks = [shared_memory.SharedMemory(name=name) for name in names]
+    tables = _held_karp_shared_tables(blocks, m, dtype)
+    try:
+        dp, parent, order = tables
+        for size in range(2, m + 1):
+            layer = order[bounds[size]:bounds[size + 1]]
+            share = -(-len(layer) // workers)
+            _held_karp_block(dp, parent, layer[index * share:(index + 1) * share], cost, block_cells)
+            barrier.wait()
+    except threading.BrokenBarrierError:
+        #otro proceso falló, el error se reporta desde el proceso principal
+        pass
+    except BaseException:
+        barrier.abort()
+        raise
+    finally:
+        dp = parent = order = layer = None
+        tables.clear()
+        for block in blocks:
+            block.close()
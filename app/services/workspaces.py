@@ -0,0 +1,226 @@
+import os
+import threading
+import time
+import uuid
+import weakref
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import List, Optional
+
+import networkx as nx
+from prometheus_client.core import GaugeMetricFamily
+
+from app.models.distance_matrix_result import DistanceMatrixResult
+from app.models.workspace import Workspace
+from app.services.metrics import REGISTRY
+
+DEFAULT_WORKSPACE_ID = "default"
+
+#límites del almacén: cantidad de workspaces, segundos sin uso antes de eliminarlos y memoria total estimada
+WORKSPACE_LIMIT = int(os.environ.get("WORKSPACE_LIMIT", "100"))
+WORKSPACE_TTL_S = float(os.environ.get("WORKSPACE_TTL_S", "3600"))
+WORKSPACE_MEMORY_MB = float(os.environ.get("WORKSPACE_MEMORY_MB", "2048"))
+
+#bytes aproximados que ocupa networkx por nodo y por arista (diccionarios de atributos incluidos)
+_GRAPH_BYTES_PER_NODE = 400
+_GRAPH_BYTES_PER_EDGE = 700
+
+#workspace de la petición actual (lo fija el middleware a partir del encabezado X-Workspace-Id)
+_current_workspace_id: ContextVar[str] = ContextVar("workspace_id", default=DEFAULT_WORKSPACE_ID)
+
+_workspaces: "OrderedDict[str, Workspace]" = OrderedDict()
+_lock = threading.RLock()
+#grafos base por clave de contenido; se liberan solos cuando ningún workspace los usa
+_base_graphs: "weakref.WeakValueDictionary[str, nx.Graph]" = weakref.WeakValueDictionary()
+
+
+def set_current_workspace_id(workspace_id: Optional[str]):
+    return _current_workspace_id.set(workspace_id or DEFAULT_WORKSPACE_ID)
+
+
+def reset_current_workspace_id(token):
+    _current_workspace_id.reset(token)
+
+
+def get_current_workspace_id() -> str:
+    return _current_workspace_id.get()
+
+
+#retorna el workspace de la petición actual y lo marca como usado
+#solo el workspace "default" se crea al pedirlo; los demás existen únicamente si los creó POST /workspaces
+#(si no, cualquier valor del encabezado crearía uno y podría desalojar los de otros clientes)
+def current_workspace() -> Workspace:
+    workspace_id = get_current_workspace_id()
+    with _lock:
+        workspace = _workspaces.get(workspace_id)
+        if workspace is None:
+            if workspace_id != DEFAULT_WORKSPACE_ID:
+                raise KeyError(f"Workspace {workspace_id} not found.")
+            workspace = Workspace(id=workspace_id)
+            _workspaces[workspace_id] = workspace
+        workspace.last_access = time.monotonic()
+        _workspaces.move_to_end(workspace_id)
+        _evict(keep=workspace_id)
+        return workspace
+
+
+#el id es aleatorio (uuid4) y no se publica en ningún listado: quien lo conoce es quien creó el workspace
+def create_workspace() -> Workspace:
+    workspace = Workspace(id=uuid.uuid4().hex)
+    with _lock:
+        _workspaces[workspace.id] = workspace
+        _evict(keep=workspace.id)
+    return workspace
+
+
+def delete_workspace(workspace_id: str) -> bool:
+    with _lock:
+        return _workspaces.pop(workspace_id, None) is not None
+
+
+def workspace_exists(workspace_id: str) -> bool:
+    with _lock:
+        return workspace_id == DEFAULT_WORKSPACE_ID or workspace_id in _workspaces
+
+
+#resumen del workspace de la petición (grafo, puntos, matriz y memoria estimada)
+def current_workspace_summary() -> dict:
+    workspace = current_workspace()
+    with _lock:
+        return _workspace_summary(workspace)
+
+
+#grafo base compartido ya cargado con ese contenido (o None)
+def find_base_graph(key: str) -> Optional[nx.Graph]:
+    return _base_graphs.get(key)
+
+
+def register_base_graph(key: str, G: nx.Graph):
+    _base_graphs[key] = G
+
+
+#asigna un grafo (compartido, solo lectura) al workspace actual; los nodos seleccionados y la
+#matriz anteriores ya no aplican al nuevo grafo
+def set_workspace_graph(G: nx.Graph):
+    workspace = current_workspace()
+    with _lock:
+        workspace.graph = G
+        workspace.owns_graph = False
+        workspace.selected_node_ids = []
+        workspace.distance_matrix = None
+        _update_estimate(workspace)
+
+
+#grafo del workspace actual listo para modificarse: si todavía es el grafo base compartido se copia
+def graph_for_update(G: nx.Graph) -> nx.Graph:
+    workspace = current_workspace()
+    with _lock:
+        if workspace.graph is not G or workspace.owns_graph:
+            return G
+        workspace.graph = copy_graph(G)
+        workspace.owns_graph = True
+        _update_estimate(workspace)
+        return workspace.graph
+
+
+def set_workspace_selected_nodes(node_ids: List[int]):
+    workspace = current_workspace()
+    with _lock:
+        workspace.selected_node_ids = node_ids
+        _update_estimate(workspace)
+
+
+def set_workspace_distance_matrix(matrix: Optional[DistanceMatrixResult]):
+    workspace = current_workspace()
+    with _lock:
+        workspace.distance_matrix = matrix
+        _update_estimate(workspace)
+        _evict(keep=workspace.id)
+
+
+#copia del grafo con sus índices; la copia CSR es inmutable y se puede compartir,
+#los índices de aristas y coordenadas se copian porque se actualizan al insertar puntos
+#la copia recibe una clave propia: a partir de aquí su contenido ya no es el del archivo original
+def copy_graph(G: nx.Graph) -> nx.Graph:
+    H = G.copy()
+    H.graph["graph_key"] = f"{G.graph.get('graph_key', '')}+{uuid.uuid4().hex}"
+    for key in ("_edge_index", "_coordinate_index"):
+        if key in G.graph:
+            H.graph[key] = G.graph[key].copy()
+    return H
+
+
+def _workspace_summary(workspace: Workspace) -> dict:
+    G = workspace.graph
+    return {
+        "workspaceId": workspace.id,
+        "nodes": G.number_of_nodes() if G is not None else 0,
+        "edges": G.number_of_edges() if G is not None else 0,
+        "ownsGraph": workspace.owns_graph,
+        "numPoints": len(workspace.selected_node_ids),
+        "hasMatrix": workspace.distance_matrix is not None,
+        "estimatedBytes": workspace.estimated_bytes,
+    }
+
+
+def _graph_bytes(G: nx.Graph) -> int:
+    return G.number_of_nodes() * _GRAPH_BYTES_PER_NODE + G.number_of_edges() * _GRAPH_BYTES_PER_EDGE
+
+
+#memoria propia del workspace: el grafo solo cuenta si es una copia privada
+def _update_estimate(workspace: Workspace):
+    total = len(workspace.selected_node_ids) * 8
+    if workspace.graph is not None and workspace.owns_graph:
+        total += _graph_bytes(workspace.graph)
+    matrix = workspace.distance_matrix
+    if matrix is not None:
+        n = len(matrix.distances)
+        total += n * n * 64
+        nbytes = getattr(matrix.paths, "nbytes", None)
+        total += nbytes if nbytes is not None else sum(len(path) for row in matrix.paths for path in row) * 8
+    workspace.estimated_bytes = total
+
+
+#elimina workspaces vencidos (TTL) y luego los menos usados hasta cumplir cantidad y memoria
+#se llama con _lock tomado; nunca elimina el workspace keep
+def _evict(keep: str):
+    now = time.monotonic()
+    for workspace_id, workspace in list(_workspaces.items()):
+        if workspace_id != keep and now - workspace.last_access > WORKSPACE_TTL_S:
+            del _workspaces[workspace_id]
+
+    def over_limits() -> bool:
+        if len(_workspaces) > WORKSPACE_LIMIT:
+            return True
+        return _total_bytes() > WORKSPACE_MEMORY_MB * 1024 * 1024
+
+    #el OrderedDict está en orden de uso, el primero es el menos usado
+    for workspace_id in list(_workspaces.keys()):
+        if not over_limits():
+            break
+        if workspace_id != keep:
+            del _workspaces[workspace_id]
+
+
+#memoria total: lo propio de cada workspace más cada grafo base en uso (contado una sola vez)
+def _total_bytes() -> int:
+    shared = {}
+    total = 0
+    for workspace in _workspaces.values():
+        total += workspace.estimated_bytes
+        if workspace.graph is not None and not workspace.owns_graph:
+            shared[id(workspace.graph)] = workspace.graph
+    return total + sum(_graph_bytes(G) for G in shared.values())
+
+
+#cantidad de workspaces y su memoria estimada para GET /metrics (se leen del almacén al exportar)
+class _WorkspaceCollector:
+
+    def collect(self):
+        with _lock:
+            count, total = len(_workspaces), _total_bytes()
+        yield GaugeMetricFamily("tsp_workspaces", "Workspaces in memory.", value=count)
+        yield GaugeMetricFamily("tsp_workspace_bytes", "Estimated memory of all workspaces.", value=total)
+
+
+REGISTRY.register(_WorkspaceCollector())
@@ -0,0 +1,77 @@
+#compara dos archivos de resultados de benchmarks.run (p. ej. de dos commits) y muestra las mediciones que
+#se volvieron más lentas, usaron más memoria o encontraron recorridos peores
+#
+#   python -m benchmarks.compare antes.json despues.json --threshold 1.25
+#
+#termina con código 1 si hay alguna regresión
+import argparse
+import json
+import sys
+from typing import Dict, List, Optional
+
+#las mediciones más cortas que esto varían demasiado entre ejecuciones y no se comparan por tiempo
+_MIN_SECONDS = 0.001
+
+
+def _key(entry: dict) -> tuple:
+    return entry["graph"], entry["stage"], entry.get("algorithm"), entry.get("size")
+
+
+def _label(key: tuple) -> str:
+    return " ".join(str(part) for part in key if part is not None)
+
+
+#[{"measurement", "metric", "before", "after", "ratio"}, ...] de las mediciones (presentes en los dos
+#archivos) que empeoraron más de threshold veces; en la calidad (gap) cualquier aumento cuenta
+def find_regressions(before: dict, after: dict, threshold: float = 1.25) -> List[dict]:
+    previous: Dict[tuple, dict] = {_key(entry): entry for entry in before["results"]}
+    regressions = []
+    for entry in after["results"]:
+        old = previous.get(_key(entry))
+        if old is None:
+            continue
+        label = _label(_key(entry))
+
+        if max(old["seconds"], entry["seconds"]) >= _MIN_SECONDS:
+            ratio = entry["seconds"] / old["seconds"] if old["seconds"] > 0 else float("inf")
+            if ratio > threshold:
+                regressions.append({"measurement": label, "metric": "seconds",
+                    "before": old["seconds"], "after": entry["seconds"], "ratio": ratio})
+
+        if old.get("peakBytes") and entry.get("peakBytes"):
+            ratio = entry["peakBytes"] / old["peakBytes"]
+            if ratio > threshold:
+                regressions.append({"measurement": label, "metric": "peakBytes",
+                    "before": old["peakBytes"], "after": entry["peakBytes"], "ratio": ratio})
+
+        if old.get("gap") is not None and entry.get("gap") is not None and entry["gap"] > old["gap"] + 1e-9:
+            regressions.append({"measurement": label, "metric": "gap",
+                "before": old["gap"], "after": entry["gap"], "ratio": None})
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files.")
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--threshold", type=float, default=1.25,
+        help="slowdown (or memory growth) factor reported as a regression")
+    args = parser.parse_args(argv)
+
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+
+    regressions = find_regressions(before, after, args.threshold)
+    for regression in regressions:
+        ratio = f"x{regression['ratio']:.2f}" if regression["ratio"] is not None else ""
+        print(f"{regression['measurement']:<45} {regression['metric']:<10} "
+              f"{regression['before']:.6g} -> {regression['after']:.6g} {ratio}")
+    if not regressions:
+        print("No regressions.")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
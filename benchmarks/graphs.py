@@ -0,0 +1,84 @@
+import io
+import os
+import random
+from typing import List, Tuple
+
+import networkx as nx
+import numpy as np
+from scipy.spatial import Delaunay
+
+from app.services.coordinate_index import get_coordinate_index
+from app.services.edge_index import get_edge_index
+from app.services.edge_weights import assign_edge_weights
+from app.services.graph_loader import parse_graph_file
+from app.services.routing_graph import get_routing_graph
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), os.pardir, "data")
+CHAPINERO_PATH = os.path.join(DATA_DIR, "chapinero.osm")
+
+#esquina suroeste de los grafos sintéticos (Bogotá) y separación entre nodos de la malla (~110 m)
+_ORIGIN = (4.60, -74.10)
+_GRID_STEP = 0.001
+
+
+def chapinero_bytes() -> bytes:
+    with open(CHAPINERO_PATH, "rb") as f:
+        return f.read()
+
+
+#carga el archivo con el mismo camino que POST /upload-graph (sin guardarlo en un workspace)
+def load_chapinero(content: bytes) -> nx.Graph:
+    return parse_graph_file(io.BytesIO(content))
+
+
+#malla de side x side nodos donde falta ~10 % de las aristas (calles que no continúan)
+def grid_graph(side: int, seed: int = 0) -> nx.Graph:
+    rng = random.Random(seed)
+    G = nx.MultiGraph()
+    for i in range(side):
+        for j in range(side):
+            G.add_node(i * side + j, latitude=_ORIGIN[0] + i * _GRID_STEP, longitude=_ORIGIN[1] + j * _GRID_STEP)
+    for i in range(side):
+        for j in range(side):
+            nid = i * side + j
+            if j + 1 < side and rng.random() < 0.9:
+                G.add_edge(nid, nid + 1)
+            if i + 1 < side and rng.random() < 0.9:
+                G.add_edge(nid, nid + side)
+    return _prepare(G)
+
+
+#nodos al azar unidos por la triangulación de Delaunay (grafo plano y conexo, parecido a una red vial)
+def random_graph(n: int, seed: int = 0) -> nx.Graph:
+    rng = np.random.default_rng(seed)
+    #área con la misma densidad de nodos que la malla
+    span = np.sqrt(n) * _GRID_STEP
+    coords = np.column_stack([_ORIGIN[0] + rng.random(n) * span, _ORIGIN[1] + rng.random(n) * span])
+
+    G = nx.MultiGraph()
+    G.add_nodes_from((i, {"latitude": lat, "longitude": lon}) for i, (lat, lon) in enumerate(coords.tolist()))
+    edges = set()
+    for a, b, c in Delaunay(coords).simplices.tolist():
+        for u, v in ((a, b), (b, c), (a, c)):
+            edges.add((min(u, v), max(u, v)))
+    G.add_edges_from(sorted(edges))
+    return _prepare(G)
+
+
+#pesos e índices como los deja graph_loader al cargar un archivo
+def _prepare(G: nx.Graph) -> nx.Graph:
+    assign_edge_weights(G, "ellipsoidal")
+    get_routing_graph(G)
+    get_edge_index(G)
+    get_coordinate_index(G)
+    return G
+
+
+#n puntos al azar (lat, lon) dentro del área que cubre el grafo
+def random_points(G: nx.Graph, n: int, seed: int = 0) -> List[Tuple[float, float]]:
+    rng = random.Random(seed)
+    latitudes = [lat for _, lat in G.nodes(data="latitude")]
+    longitudes = [lon for _, lon in G.nodes(data="longitude")]
+    lat_range = (min(latitudes), max(latitudes))
+    lon_range = (min(longitudes), max(longitudes))
+    return [(rng.uniform(*lat_range), rng.uniform(*lon_range)) for _ in range(n)]
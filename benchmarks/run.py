@@ -0,0 +1,283 @@
+#mide carga del grafo, ubicación de puntos, matriz de distancias y cada algoritmo de TSP sobre chapinero.osm
+#y grafos sintéticos con cantidades de puntos crecientes; guarda los resultados en JSON para comparar
+#entre commits (ver benchmarks/compare.py)
+#
+#   python -m benchmarks.run --output bench.json
+#   python -m benchmarks.run --quick --output bench.json
+import argparse
+import gc
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import networkx as nx
+import numpy as np
+
+import app.services.graph_cache as graph_cache
+from app.services.contraction_hierarchy import build_contraction_hierarchy
+from app.services.distance_matrix import build_distance_matrix_with_paths
+from app.services.process_nodes import process_points_into_graph
+from app.services.routing_graph import get_routing_graph
+from app.services.tsp_solver import solve_tsp_branch_and_bound, solve_tsp_brute_force
+from app.services.tsp_solver import solve_tsp_dynamic_programming, solve_tsp_greedy, solve_tsp_local_search
+from app.services.workspaces import copy_graph
+from benchmarks.graphs import chapinero_bytes, grid_graph, load_chapinero, random_graph, random_points
+
+#formato del archivo de resultados, se incrementa si cambian los campos
+RESULTS_FORMAT = 1
+
+#algoritmos (mismos nombres que en la API) y cantidad máxima de puntos con la que se ejecutan
+SOLVERS: Dict[str, Tuple[Callable, Optional[int]]] = {
+    "brute-force": (solve_tsp_brute_force, 9),
+    "dynamic": (solve_tsp_dynamic_programming, 15),
+    "branch-and-bound": (solve_tsp_branch_and_bound, 13),
+    "greedy": (solve_tsp_greedy, None),
+    "local-search": (solve_tsp_local_search, None),
+}
+#el óptimo para medir la calidad sale de programación dinámica (hasta su límite de puntos)
+_OPTIMAL_SOLVER = "dynamic"
+
+DEFAULT_GRAPHS = ["chapinero", "grid:60", "random:4000"]
+DEFAULT_SIZES = [5, 8, 10, 12, 25, 50, 100, 200]
+QUICK_GRAPHS = ["chapinero"]
+QUICK_SIZES = [5, 8, 25]
+
+
+#ejecuta fn repeat veces y retorna (menor tiempo en segundos, pico de memoria en bytes, último resultado)
+#setup (sin medir) prepara el argumento de cada ejecución. El pico de memoria se mide antes, en una
+#ejecución aparte con tracemalloc para que no afecte los tiempos (también sirve de calentamiento)
+#el resultado anterior se suelta antes de cada ejecución: un grafo cargado que sigue vivo se reutilizaría
+#(ver workspaces.find_base_graph) en lugar de cargarlo de nuevo
+def measure(fn: Callable[[Any], Any], repeat: int, setup: Callable[[], Any] = lambda: None,
+    memory: bool = True) -> Tuple[float, Optional[int], Any]:
+    peak = None
+    if memory:
+        argument = setup()
+        gc.collect()
+        tracemalloc.start()
+        try:
+            fn(argument)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        del argument
+
+    best = math.inf
+    result = None
+    for _ in range(max(1, repeat)):
+        result = None
+        argument = setup()
+        gc.collect()
+        start = time.perf_counter()
+        result = fn(argument)
+        best = min(best, time.perf_counter() - start)
+    return best, peak, result
+
+
+class BenchmarkRun:
+
+    def __init__(self, repeat: int, memory: bool, hierarchy: bool, log: Callable[[str], None] = print):
+        self.repeat = repeat
+        self.memory = memory
+        self.hierarchy = hierarchy
+        self.log = log
+        self.results: List[dict] = []
+
+    def record(self, graph: str, stage: str, seconds: float, peak: Optional[int], size: Optional[int] = None,
+        algorithm: Optional[str] = None, **extra):
+        entry = {"graph": graph, "stage": stage, "algorithm": algorithm, "size": size,
+            "seconds": seconds, "peakBytes": peak, **extra}
+        self.results.append(entry)
+        label = " ".join(str(part) for part in (graph, stage, algorithm, size) if part is not None)
+        memory = f" {peak / 1024 / 1024:8.2f} MB" if peak is not None else ""
+        self.log(f"{label:<45} {seconds * 1000:10.2f} ms{memory}")
+
+    #grafo de la especificación "chapinero", "grid:<lado>" o "random:<nodos>", midiendo su carga
+    def load_graph(self, spec: str) -> nx.Graph:
+        name, _, value = spec.partition(":")
+        if name == "chapinero":
+            content = chapinero_bytes()
+            with tempfile.TemporaryDirectory(prefix="bench-graph-cache-") as cache_dir:
+                previous = graph_cache.GRAPH_CACHE_DIR
+                try:
+                    #sin caché: cada ejecución usa una carpeta vacía
+                    runs = iter(range(self.repeat + 1))
+                    seconds, peak, _ = measure(
+                        lambda folder: load_chapinero(content) and None, self.repeat,
+                        setup=lambda: _use_cache_dir(os.path.join(cache_dir, f"cold-{next(runs)}")),
+                        memory=self.memory,
+                    )
+                    self.record(spec, "load", seconds, peak)
+                    #con el archivo ya procesado en el caché de disco (p. ej. después de reiniciar el servidor)
+                    _use_cache_dir(os.path.join(cache_dir, "warm"))
+                    load_chapinero(content)
+                    gc.collect()
+                    seconds, peak, G = measure(lambda _: load_chapinero(content), self.repeat, memory=self.memory)
+                    self.record(spec, "load-cached", seconds, peak)
+                finally:
+                    graph_cache.GRAPH_CACHE_DIR = previous
+            return G
+
+        if name == "grid":
+            build = lambda _: grid_graph(int(value))
+        elif name == "random":
+            build = lambda _: random_graph(int(value))
+        else:
+            raise ValueError(f"Unknown graph: {spec}. Use chapinero, grid:<side> or random:<nodes>.")
+        seconds, peak, G = measure(build, self.repeat, memory=self.memory)
+        self.record(spec, "load", seconds, peak, nodes=G.number_of_nodes(), edges=G.number_of_edges())
+        return G
+
+    def run_graph(self, spec: str, sizes: List[int]):
+        base = self.load_graph(spec)
+        if self.hierarchy:
+            routing = get_routing_graph(base)
+            seconds, peak, hierarchy = measure(lambda _: build_contraction_hierarchy(routing), 1,
+                memory=self.memory)
+            self.record(spec, "hierarchy-build", seconds, peak)
+            base.graph["_contraction_hierarchy"] = hierarchy
+
+        for size in sizes:
+            points = random_points(base, size, seed=size)
+            #cada ejecución ubica los puntos en una copia nueva del grafo (insertar nodos lo modifica)
+            seconds, peak, (G, node_ids) = measure(
+                lambda H: (H, process_points_into_graph(H, points)), self.repeat,
+                setup=lambda: copy_graph(base), memory=self.memory,
+            )
+            self.record(spec, "snap", seconds, peak, size)
+
+            hierarchy = G.graph.pop("_contraction_hierarchy", None)
+            seconds, peak, matrix = measure(
+                lambda _: build_distance_matrix_with_paths(G, node_ids), self.repeat, memory=self.memory
+            )
+            self.record(spec, "matrix", seconds, peak, size)
+            if hierarchy is not None:
+                G.graph["_contraction_hierarchy"] = hierarchy
+                seconds, peak, _ = measure(
+                    lambda _: build_distance_matrix_with_paths(G, node_ids), self.repeat, memory=self.memory
+                )
+                self.record(spec, "matrix-hierarchy", seconds, peak, size)
+
+            self.run_solvers(spec, size, matrix.distances)
+
+    #ejecuta cada algoritmo hasta su límite de puntos y compara el costo con el óptimo (o con el mejor
+    #encontrado si hay demasiados puntos para programación dinámica)
+    def run_solvers(self, spec: str, size: int, distances: List[List[float]]):
+        costs = {}
+        entries = {}
+        for algorithm, (solver, limit) in SOLVERS.items():
+            if limit is not None and size > limit:
+                continue
+            seconds, peak, result = measure(lambda _: solver(distances, 0), self.repeat, memory=self.memory)
+            costs[algorithm] = result.total_cost
+            self.record(spec, "solve", seconds, peak, size, algorithm, cost=result.total_cost)
+            entries[algorithm] = self.results[-1]
+
+        if not costs:
+            return
+        optimal = _OPTIMAL_SOLVER in costs
+        reference = costs[_OPTIMAL_SOLVER] if optimal else min(costs.values())
+        for entry in entries.values():
+            entry["referenceCost"] = reference
+            entry["reference"] = "optimal" if optimal else "best-found"
+            entry["gap"] = entry["cost"] / reference - 1 if reference > 0 else 0.0
+
+
+def _use_cache_dir(path: str):
+    graph_cache.GRAPH_CACHE_DIR = path
+    #sin referencias al grafo anterior también deja de estar compartido entre workspaces
+    gc.collect()
+
+
+#pendiente de log(tiempo) frente a log(tamaño) por cada (grafo, etapa, algoritmo): 1 = lineal, 2 = cuadrático
+def scaling(results: List[dict]) -> List[dict]:
+    series: Dict[tuple, List[Tuple[int, float]]] = {}
+    for entry in results:
+        if entry["size"] is not None and entry["seconds"] > 0:
+            key = (entry["graph"], entry["stage"], entry["algorithm"])
+            series.setdefault(key, []).append((entry["size"], entry["seconds"]))
+
+    curves = []
+    for (graph, stage, algorithm), points in series.items():
+        sizes = [size for size, _ in points]
+        exponent = None
+        if len(set(sizes)) >= 2:
+            exponent = float(np.polyfit(np.log(sizes), np.log([s for _, s in points]), 1)[0])
+        curves.append({"graph": graph, "stage": stage, "algorithm": algorithm,
+            "sizes": sizes, "seconds": [s for _, s in points], "exponent": exponent})
+    return curves
+
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+            cwd=os.path.dirname(__file__), timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "networkx": nx.__version__,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def run_benchmarks(graphs: List[str], sizes: List[int], repeat: int = 3, memory: bool = True,
+    hierarchy: bool = False, log: Callable[[str], None] = print) -> dict:
+    run = BenchmarkRun(repeat, memory, hierarchy, log)
+    for spec in graphs:
+        run.run_graph(spec, sizes)
+    return {
+        "format": RESULTS_FORMAT,
+        "environment": environment(),
+        "settings": {"graphs": graphs, "sizes": sizes, "repeat": repeat, "hierarchy": hierarchy},
+        "results": run.results,
+        "scaling": scaling(run.results),
+    }
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(part) for part in value.split(",") if part]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks of graph loading, matrix building and TSP solvers.")
+    parser.add_argument("--output", help="JSON file for the results (default: only print them)")
+    parser.add_argument("--graphs", help="comma-separated graphs: chapinero, grid:<side>, random:<nodes>")
+    parser.add_argument("--sizes", type=_int_list, help="comma-separated numbers of points")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement, the fastest is kept")
+    parser.add_argument("--quick", action="store_true", help="small run (chapinero, few points, one repeat)")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc run")
+    parser.add_argument("--hierarchy", action="store_true", help="also build matrices with a contraction hierarchy")
+    args = parser.parse_args(argv)
+
+    graphs = args.graphs.split(",") if args.graphs else (QUICK_GRAPHS if args.quick else DEFAULT_GRAPHS)
+    sizes = args.sizes or (QUICK_SIZES if args.quick else DEFAULT_SIZES)
+    repeat = 1 if args.quick else args.repeat
+
+    report = run_benchmarks(graphs, sizes, repeat, not args.no_memory, args.hierarchy)
+    print()
+    for curve in report["scaling"]:
+        if curve["exponent"] is not None:
+            label = " ".join(part for part in (curve["graph"], curve["stage"], curve["algorithm"]) if part)
+            print(f"{label:<45} ~ n^{curve['exponent']:.2f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=1)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
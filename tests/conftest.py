@@ -1,6 +1,13 @@
+import random
+
+import networkx as nx
+import numpy as np
 import pytest
 from fastapi.testclient import TestClient
 from app.main import app
+import app.services.workspaces as workspaces
+from app.models.workspace import Workspace
+from app.services.edge_weights import ellipsoidal_m
 
 @pytest.fixture
 def client():
@@ -8,3 +15,74 @@ def client():
     Cliente de pruebas reutilizable en todos los test.
     """
     return TestClient(app)
+
+
+#registra un workspace con un id fijo y lo fija como el de la petición actual, retorna el token para
+#reset_current_workspace_id (por la API el id lo asigna POST /workspaces)
+def en_workspace(workspace_id):
+    with workspaces._lock:
+        workspaces._workspaces.setdefault(workspace_id, Workspace(id=workspace_id))
+    return workspaces.set_current_workspace_id(workspace_id)
+
+
+#peso de las aristas de la malla: uniforme entre 50 y 150 (peso(rng, u, v) recibe los atributos de los extremos)
+def peso_uniforme(rng, u, v):
+    return rng.uniform(50, 150)
+
+
+def peso_unitario(rng, u, v):
+    return 1.0
+
+
+#distancia en línea recta entre los extremos por un factor entre 1 y 1.5: el largo de una vía nunca es menor
+#que la recta entre sus extremos (sirve como cota para A*)
+def peso_recta(rng, u, v):
+    recta = ellipsoidal_m(np.array([u["latitude"]]), np.array([u["longitude"]]),
+        np.array([v["latitude"]]), np.array([v["longitude"]]))
+    return float(recta[0]) * rng.uniform(1.0, 1.5)
+
+
+#malla de filas x columnas nodos (id i * columnas + j) separados ~110 m desde (4.60, -74.07)
+#dirigida: las calles verticales de las columnas impares van en sentido contrario y además se agrega el sentido
+#inverso de cada par de ids consecutivos
+def grafo_malla(filas=8, columnas=None, peso=peso_uniforme, dirigido=False, semilla=3):
+    columnas = filas if columnas is None else columnas
+    rng = random.Random(semilla)
+    G = nx.MultiDiGraph() if dirigido else nx.MultiGraph()
+    for i in range(filas):
+        for j in range(columnas):
+            G.add_node(i * columnas + j, latitude=4.60 + i * 0.001, longitude=-74.07 + j * 0.001)
+
+    def conectar(u, v):
+        G.add_edge(u, v, weight=peso(rng, G.nodes[u], G.nodes[v]))
+
+    for i in range(filas):
+        for j in range(columnas):
+            nid = i * columnas + j
+            if j + 1 < columnas:
+                conectar(nid, nid + 1)
+            if i + 1 < filas:
+                conectar(nid + columnas, nid) if dirigido and j % 2 else conectar(nid, nid + columnas)
+    if dirigido:
+        for nid in range(filas * columnas - 1):
+            conectar(nid + 1, nid)
+    return G
+
+
+#grafo con coordenadas y pesos al azar (entre 1 y 100), conexo por un camino 0 -> 1 -> ... más aristas al azar
+def grafo_aleatorio(n_nodos=40, n_aristas=90, semilla=7):
+    rng = random.Random(semilla)
+    G = nx.MultiGraph()
+    for i in range(n_nodos):
+        G.add_node(i, latitude=rng.random(), longitude=rng.random())
+    for i in range(n_nodos - 1):
+        G.add_edge(i, i + 1, weight=rng.uniform(1, 100))
+    for _ in range(n_aristas):
+        u, v = rng.randrange(n_nodos), rng.randrange(n_nodos)
+        G.add_edge(u, v, weight=rng.uniform(1, 100))
+    return G
+
+
+#costo de un camino tomando la arista paralela más corta en cada tramo
+def costo_camino(G, camino):
+    return sum(min(d["weight"] for d in G[a][b].values()) for a, b in zip(camino, camino[1:]))
@@ -0,0 +1,42 @@
+import json
+
+from benchmarks.compare import find_regressions
+from benchmarks.run import main, run_benchmarks
+
+
+def test_benchmarks_miden_todas_las_etapas():
+    reporte = run_benchmarks(["grid:8", "random:60"], [5, 7], repeat=1, hierarchy=True, log=lambda _: None)
+
+    etapas = {(r["graph"], r["stage"], r["algorithm"], r["size"]) for r in reporte["results"]}
+    for grafo in ("grid:8", "random:60"):
+        assert (grafo, "load", None, None) in etapas
+        assert (grafo, "matrix-hierarchy", None, 7) in etapas
+        for algoritmo in ("brute-force", "dynamic", "branch-and-bound", "greedy", "local-search"):
+            assert (grafo, "solve", algoritmo, 7) in etapas
+
+    for resultado in reporte["results"]:
+        assert resultado["seconds"] >= 0 and resultado["peakBytes"] is not None
+        if resultado["stage"] == "solve":
+            # con pocos puntos la referencia es el óptimo: ningún algoritmo lo mejora
+            assert resultado["reference"] == "optimal"
+            assert resultado["gap"] >= -1e-9
+    assert any(curva["exponent"] is not None for curva in reporte["scaling"])
+
+
+def test_comparar_resultados(tmp_path):
+    salida = tmp_path / "bench.json"
+    assert main(["--graphs", "grid:6", "--sizes", "5", "--repeat", "1", "--no-memory", "--output", str(salida)]) == 0
+    antes = json.loads(salida.read_text())
+    assert antes["environment"]["python"]
+
+    despues = json.loads(salida.read_text())
+    matriz = next(r for r in despues["results"] if r["stage"] == "matrix")
+    matriz["seconds"] = max(matriz["seconds"], 0.001) * 3
+    greedy = next(r for r in despues["results"] if r["algorithm"] == "greedy")
+    greedy["gap"] += 0.1
+
+    regresiones = find_regressions(antes, despues)
+    assert {(r["measurement"], r["metric"]) for r in regresiones} == {
+        ("grid:6 matrix 5", "seconds"), ("grid:6 solve greedy 5", "gap"),
+    }
+    assert find_regressions(antes, antes) == []
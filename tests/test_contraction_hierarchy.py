@@ -0,0 +1,77 @@
+import random
+
+import numpy as np
+import pytest
+
+import app.services.graph_cache as graph_cache
+from app.services.contraction_hierarchy import build_contraction_hierarchy, prepare_contraction_hierarchy
+from app.services.distance_matrix import add_stop_to_matrix, build_distance_matrix_with_paths
+from app.services.process_nodes import process_points_into_graph
+from app.services.routing_graph import get_routing_graph
+from tests.conftest import costo_camino, grafo_aleatorio, grafo_malla
+
+
+def _comparar_con_dijkstra(G, nodos):
+    con_jerarquia = build_distance_matrix_with_paths(G, nodos)
+    jerarquia = G.graph.pop("_contraction_hierarchy")
+    sin_jerarquia = build_distance_matrix_with_paths(G, nodos)
+    G.graph["_contraction_hierarchy"] = jerarquia
+
+    assert con_jerarquia.paths.legs is not None
+    assert np.allclose(con_jerarquia.distances, sin_jerarquia.distances)
+    for i, a in enumerate(nodos):
+        for j, b in enumerate(nodos):
+            camino = con_jerarquia.paths[i][j]
+            if sin_jerarquia.distances[i][j] == float("inf"):
+                assert camino == []
+                continue
+            assert camino[0] == a and camino[-1] == b
+            # cada salto es una arista del grafo actual
+            assert costo_camino(G, camino) == pytest.approx(sin_jerarquia.distances[i][j])
+    return con_jerarquia
+
+
+@pytest.mark.parametrize("semilla", [1, 2, 3])
+def test_matriz_con_jerarquia_igual_a_dijkstra(semilla):
+    G = grafo_aleatorio(n_nodos=60, n_aristas=120, semilla=semilla)
+    # un componente aparte (sin camino desde el resto)
+    G.add_edge(60, 61, weight=3.0)
+    G.graph["_contraction_hierarchy"] = build_contraction_hierarchy(get_routing_graph(G))
+
+    nodos = random.Random(semilla).sample(range(60), 10) + [60]
+    _comparar_con_dijkstra(G, nodos)
+
+
+def test_jerarquia_con_puntos_insertados_despues():
+    G = grafo_malla()
+    G.graph["_contraction_hierarchy"] = build_contraction_hierarchy(get_routing_graph(G))
+
+    # varios puntos sobre la misma arista (0 - 1), uno de ellos dividiendo una arista ya dividida
+    puntos = [(4.6000, -74.0697), (4.6000, -74.0692), (4.6000, -74.0695), (4.6035, -74.0665), (4.6060, -74.0648)]
+    nodos = process_points_into_graph(G, puntos) + [0, 27]
+    matriz = _comparar_con_dijkstra(G, nodos)
+
+    # la matriz armada con la jerarquía también acepta puntos nuevos sin reconstruirla
+    nuevo = process_points_into_graph(G, [(4.6004, -74.0681)])[0]
+    matriz = add_stop_to_matrix(G, matriz, nuevo)
+    completa = build_distance_matrix_with_paths(G, nodos + [nuevo])
+    assert np.allclose(matriz.distances, completa.distances)
+    for i in range(len(nodos) + 1):
+        for j in range(len(nodos) + 1):
+            assert costo_camino(G, matriz.paths[i][j]) == pytest.approx(completa.distances[i][j])
+
+
+def test_jerarquia_se_guarda_en_el_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(graph_cache, "GRAPH_CACHE_DIR", str(tmp_path))
+    G = grafo_malla()
+    graph_cache.save_graph("clave", G, get_routing_graph(G))
+
+    armada = prepare_contraction_hierarchy(G, "clave")
+    leida = graph_cache.load_hierarchy("clave")
+
+    assert leida is not None
+    for campo in ("node_ids", "rank", "up_offsets", "up_neighbors", "up_weights", "up_middle"):
+        assert np.array_equal(getattr(leida, campo), getattr(armada, campo))
+    # la segunda vez se lee del caché en lugar de armarla
+    otro = grafo_malla()
+    assert np.array_equal(prepare_contraction_hierarchy(otro, "clave").rank, armada.rank)
@@ -0,0 +1,131 @@
+import random
+
+import networkx as nx
+import pytest
+
+from app.services.distance_matrix import build_distance_matrix_with_paths
+from tests.conftest import costo_camino, grafo_aleatorio, grafo_malla
+
+
+@pytest.mark.parametrize("semilla", [1, 2, 3])
+def test_matriz_igual_a_networkx(semilla):
+    G = grafo_aleatorio(semilla=semilla)
+    nodos = random.Random(semilla).sample(list(G.nodes), 8)
+
+    matriz = build_distance_matrix_with_paths(G, nodos)
+
+    for i, a in enumerate(nodos):
+        for j, b in enumerate(nodos):
+            esperado = nx.shortest_path_length(G, a, b, weight="weight")
+            assert matriz.distances[i][j] == pytest.approx(esperado)
+            camino = matriz.paths[i][j]
+            assert camino[0] == a and camino[-1] == b
+            assert costo_camino(G, camino) == pytest.approx(esperado)
+
+
+def test_matriz_nodo_repetido_y_sin_camino():
+    G = nx.Graph()
+    G.add_edge(1, 2, weight=5.0)
+    G.add_node(3)
+
+    matriz = build_distance_matrix_with_paths(G, [1, 1, 3])
+
+    assert matriz.distances[0][1] == 0.0
+    assert matriz.paths[0][1] == [1]
+    assert matriz.distances[0][2] == float("inf")
+    assert matriz.paths[2][0] == []
+
+
+def test_matriz_en_paralelo_igual_a_secuencial():
+    G = grafo_aleatorio(semilla=11)
+    nodos = random.Random(11).sample(list(G.nodes), 9)
+
+    secuencial = build_distance_matrix_with_paths(G, nodos, workers=1)
+    paralela = build_distance_matrix_with_paths(G, nodos, workers=2, chunk_size=2)
+
+    assert paralela.distances == secuencial.distances
+    assert paralela.paths == secuencial.paths
+
+
+def test_caminos_sin_guardar_predecesores(monkeypatch):
+    import app.services.distance_matrix as distance_matrix
+
+    G = grafo_aleatorio(semilla=5)
+    nodos = random.Random(5).sample(list(G.nodes), 7)
+    con_arboles = build_distance_matrix_with_paths(G, nodos)
+
+    # sin memoria para los árboles los caminos se recalculan al pedirlos
+    monkeypatch.setattr(distance_matrix, "MATRIX_PATHS_BUDGET_MB", 0)
+    sin_arboles = build_distance_matrix_with_paths(G, nodos)
+
+    assert sin_arboles.paths.nbytes == 0
+    assert sin_arboles.distances == con_arboles.distances
+    assert sin_arboles.paths == con_arboles.paths
+
+
+def test_agregar_y_quitar_puntos_igual_a_reconstruir():
+    from app.services.distance_matrix import add_stop_to_matrix, remove_stop_from_matrix
+    from app.services.process_nodes import process_points_into_graph
+
+    G = grafo_malla()
+    nodos = [0, 9, 27, 45, 63]
+    matriz = build_distance_matrix_with_paths(G, nodos)
+
+    # puntos sobre aristas: se insertan nodos nuevos y los caminos ya guardados deben pasar por ellos
+    for lat, lon in [(4.6035, -74.0665), (4.6004, -74.0695), (4.6060, -74.0648)]:
+        nuevo = process_points_into_graph(G, [(lat, lon)])[0]
+        matriz = add_stop_to_matrix(G, matriz, nuevo)
+        nodos = nodos + [nuevo]
+
+    matriz = remove_stop_from_matrix(matriz, 1)
+    nodos = nodos[:1] + nodos[2:]
+
+    completa = build_distance_matrix_with_paths(G, nodos)
+    for i in range(len(nodos)):
+        for j in range(len(nodos)):
+            assert matriz.distances[i][j] == pytest.approx(completa.distances[i][j])
+            camino = matriz.paths[i][j]
+            assert camino[0] == nodos[i] and camino[-1] == nodos[j]
+            # cada salto es una arista del grafo actual y el costo es el de la matriz
+            assert costo_camino(G, camino) == pytest.approx(completa.distances[i][j])
+
+
+def test_agregar_punto_con_grafo_cambiado():
+    from app.services.distance_matrix import add_stop_to_matrix
+    from app.services.routing_graph import mark_graph_modified
+
+    G = grafo_malla()
+    matriz = build_distance_matrix_with_paths(G, [0, 9])
+    mark_graph_modified(G)
+
+    with pytest.raises(ValueError):
+        add_stop_to_matrix(G, matriz, 27)
+
+
+@pytest.mark.parametrize("dirigido", [False, True])
+def test_busqueda_cortada_a_la_zona_de_los_puntos(dirigido):
+    from app.services.distance_matrix import add_stop_to_matrix
+    from app.services.routing_graph import NO_PREDECESSOR
+
+    # cadena larga con los puntos al comienzo: las filas no deben recorrer el resto del grafo
+    G = nx.MultiDiGraph() if dirigido else nx.MultiGraph()
+    for i in range(99):
+        G.add_edge(i, i + 1, weight=1.0)
+        if dirigido:
+            G.add_edge(i + 1, i, weight=2.0)
+    nodos = [3, 0, 5, 1]
+
+    matriz = build_distance_matrix_with_paths(G, nodos)
+
+    for i, a in enumerate(nodos):
+        for j, b in enumerate(nodos):
+            assert matriz.distances[i][j] == pytest.approx(nx.shortest_path_length(G, a, b, weight="weight"))
+            assert matriz.paths[i][j] == nx.shortest_path(G, a, b, weight="weight")
+    _, predecesores = matriz.paths.trees[0]
+    assert predecesores[99] == NO_PREDECESSOR
+
+    # un punto agregado después, fuera de la zona de los árboles, se arma con su propio árbol
+    matriz = add_stop_to_matrix(G, matriz, 99)
+    for i, a in enumerate(nodos):
+        assert matriz.paths[i][4] == nx.shortest_path(G, a, 99, weight="weight")
+        assert matriz.paths[4][i] == nx.shortest_path(G, 99, a, weight="weight")
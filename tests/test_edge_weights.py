@@ -0,0 +1,45 @@
+import networkx as nx
+import numpy as np
+import pytest
+from geopy.distance import geodesic
+
+from app.services.edge_weights import assign_edge_weights, ellipsoidal_m, haversine_m
+
+
+def _pares_aleatorios(escala, n=300, semilla=3):
+    rng = np.random.default_rng(semilla)
+    lat1 = rng.uniform(-80, 80, n)
+    lon1 = rng.uniform(-180, 180, n)
+    lat2 = lat1 + rng.uniform(-escala, escala, n)
+    lon2 = lon1 + rng.uniform(-escala, escala, n)
+    esperado = np.array([geodesic((a, b), (c, d)).meters for a, b, c, d in zip(lat1, lon1, lat2, lon2)])
+    return lat1, lon1, lat2, lon2, esperado
+
+
+@pytest.mark.parametrize("escala", [0.0001, 0.01, 1.0])
+def test_cotas_de_error_frente_a_geodesic(escala):
+    lat1, lon1, lat2, lon2, esperado = _pares_aleatorios(escala)
+
+    assert np.max(np.abs(ellipsoidal_m(lat1, lon1, lat2, lon2) / esperado - 1)) < 2e-6
+    assert np.max(np.abs(haversine_m(lat1, lon1, lat2, lon2) / esperado - 1)) < 0.0056
+
+
+def test_puntos_iguales():
+    assert ellipsoidal_m(np.array([4.6]), np.array([-74.0]), np.array([4.6]), np.array([-74.0]))[0] == 0.0
+
+
+def test_usa_length_de_osmnx_si_existe():
+    G = nx.MultiGraph()
+    G.add_node(1, latitude=4.60, longitude=-74.07)
+    G.add_node(2, latitude=4.61, longitude=-74.07)
+    G.add_edge(1, 2, length=1500.0)
+    G.add_edge(1, 2)
+
+    assign_edge_weights(G, "osmnx")
+
+    pesos = [data["weight"] for _, _, data in G.edges(data=True)]
+    assert pesos[0] == 1500.0
+    assert pesos[1] == pytest.approx(geodesic((4.60, -74.07), (4.61, -74.07)).meters, rel=2e-6)
+
+    with pytest.raises(ValueError):
+        assign_edge_weights(G, "geodesic")
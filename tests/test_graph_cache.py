@@ -0,0 +1,50 @@
+import io
+import os
+
+import pytest
+
+import app.services.graph_cache as graph_cache
+import app.services.workspaces as workspaces
+from app.services.distance_matrix import build_distance_matrix_with_paths
+from app.services.graph_loader import parse_graph_file
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), os.pardir, "data")
+
+
+@pytest.fixture
+def contenido_osm():
+    with open(os.path.join(DATA_DIR, "chapinero.osm"), "rb") as f:
+        return f.read()
+
+
+def test_grafo_desde_cache_igual_al_original(tmp_path, monkeypatch, contenido_osm):
+    monkeypatch.setattr(graph_cache, "GRAPH_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(workspaces, "_base_graphs", workspaces.weakref.WeakValueDictionary())
+
+    original = parse_graph_file(io.BytesIO(contenido_osm))
+    assert len(os.listdir(tmp_path)) == 1
+
+    # sin el grafo en memoria (p. ej. después de reiniciar el servidor) se lee del caché
+    workspaces._base_graphs.clear()
+    cacheado = parse_graph_file(io.BytesIO(contenido_osm))
+
+    assert cacheado is not original
+    assert list(cacheado.nodes) == list(original.nodes)
+    # mismo orden de vecinos en cada nodo, del que dependen los desempates al ubicar puntos
+    assert all(list(cacheado.adj[u]) == list(original.adj[u]) for u in original)
+    assert list(cacheado.edges(keys=True, data="weight")) == list(original.edges(keys=True, data="weight"))
+    assert cacheado.nodes[next(iter(original.nodes))] == {
+        k: v for k, v in original.nodes[next(iter(original.nodes))].items() if k in ("latitude", "longitude", "x", "y")
+    }
+
+    nodos = list(original.nodes)[:6]
+    assert build_distance_matrix_with_paths(cacheado, nodos).distances == \
+        build_distance_matrix_with_paths(original, nodos).distances
+
+
+def test_cache_danado_se_ignora(tmp_path, monkeypatch):
+    monkeypatch.setattr(graph_cache, "GRAPH_CACHE_DIR", str(tmp_path))
+    (tmp_path / "clave").mkdir()
+    (tmp_path / "clave" / "meta.json").write_text("{")
+
+    assert graph_cache.load_graph("clave") is None
@@ -0,0 +1,92 @@
+import struct
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+import app.services.workspaces as workspaces
+from app.main import app
+from app.services.graph_data import get_graph_data
+from app.services.graph_loader import set_graph
+from app.services.routing_graph import mark_graph_modified
+from tests.conftest import en_workspace, grafo_malla, peso_unitario
+
+
+@pytest.fixture
+def grafo(monkeypatch):
+    monkeypatch.setattr(workspaces, "_workspaces", workspaces.OrderedDict())
+    token = en_workspace("mapa")
+    G = grafo_malla(20, peso=peso_unitario)
+    set_graph(G)
+    yield G
+    workspaces.reset_current_workspace_id(token)
+
+
+def test_sin_parametros_igual_al_formato_original(grafo):
+    data = get_graph_data()
+
+    assert data["nodes"] == [
+        {"id": nid, "lat": d["latitude"], "lon": d["longitude"]} for nid, d in grafo.nodes(data=True)
+    ]
+    assert data["edges"] == [{"from": u, "to": v} for u, v in grafo.edges()]
+
+
+def test_filtro_por_area(grafo):
+    # área que contiene solo el nodo 0 y corta las aristas 0-1 y 0-20
+    data = get_graph_data(bbox=(-74.0701, 4.5999, -74.0695, 4.6005))
+
+    assert sorted(n["id"] for n in data["nodes"]) == [0, 1, 20]
+    assert sorted((e["from"], e["to"]) for e in data["edges"]) == [(0, 1), (0, 20)]
+
+
+def test_zoom_agrupa_nodos(grafo):
+    data = get_graph_data(zoom=12)
+
+    assert 1 < len(data["nodes"]) < grafo.number_of_nodes()
+    assert sum(n["count"] for n in data["nodes"]) == grafo.number_of_nodes()
+    assert all(e["from"] != e["to"] for e in data["edges"])
+
+
+def test_formatos_columnar_y_binary(grafo):
+    columnar = get_graph_data(format="columnar")
+    lat = np.cumsum(columnar["nodes"]["lat"]) / columnar["coordinateScale"]
+    assert lat == pytest.approx([d["latitude"] for _, d in grafo.nodes(data=True)], abs=1e-7)
+    assert len(columnar["edges"]["from"]) == grafo.number_of_edges()
+
+    binario = get_graph_data(format="binary")
+    magic, version, flags, n, m = struct.unpack_from("<4sIIII", binario)
+    assert (magic, flags, n, m) == (b"TSPG", 0, grafo.number_of_nodes(), grafo.number_of_edges())
+    ids = np.frombuffer(binario, dtype="<i8", count=n, offset=20)
+    assert ids.tolist() == list(grafo.nodes)
+
+
+def test_etag_y_compresion(grafo):
+    client = TestClient(app)
+    encabezados = {"X-Workspace-Id": "mapa"}
+
+    response = client.get("/graph-data", headers={**encabezados, "Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    etag = response.headers["etag"]
+
+    response = client.get("/graph-data", headers={**encabezados, "Accept-Encoding": "gzip", "If-None-Match": etag})
+    assert response.status_code == 304
+
+    # sin comprimir es otra representación con otra etiqueta
+    response = client.get("/graph-data", headers={**encabezados, "Accept-Encoding": "identity", "If-None-Match": etag})
+    assert response.status_code == 200
+    assert "content-encoding" not in response.headers
+    assert response.headers["etag"] != etag
+    response = client.get("/graph-data", headers={**encabezados, "Accept-Encoding": "identity",
+        "If-None-Match": response.headers["etag"]})
+    assert response.status_code == 304
+
+    # al cambiar el grafo cambia la etiqueta
+    token = en_workspace("mapa")
+    mark_graph_modified(grafo)
+    workspaces.reset_current_workspace_id(token)
+    response = client.get("/graph-data", headers={**encabezados, "Accept-Encoding": "gzip", "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+
+    assert client.get("/graph-data", params={"bbox": "1,2,3"}, headers=encabezados).status_code == 400
@@ -0,0 +1,52 @@
+import bz2
+import gzip
+import io
+import os
+import tempfile
+
+import pytest
+
+import app.services.graph_cache as graph_cache
+import app.services.graph_loader as graph_loader
+import app.services.workspaces as workspaces
+from app.services.graph_loader import UploadTooLargeError, parse_graph_file
+
+OSM = b"""<?xml version="1.0" encoding="UTF-8"?>
+<osm version="0.6">
+<node id="1" lat="4.6600" lon="-74.0500" version="1"/>
+<node id="2" lat="4.6610" lon="-74.0500" version="1"/>
+<node id="3" lat="4.6610" lon="-74.0510" version="1"/>
+<node id="4" lat="4.6620" lon="-74.0500" version="1"/>
+<way id="10" version="1"><nd ref="1"/><nd ref="2"/><nd ref="4"/><tag k="highway" v="residential"/></way>
+<way id="11" version="1"><nd ref="2"/><nd ref="3"/><tag k="highway" v="residential"/></way>
+</osm>
+"""
+
+
+@pytest.fixture(autouse=True)
+def sin_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(graph_cache, "GRAPH_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(workspaces, "_base_graphs", workspaces.weakref.WeakValueDictionary())
+
+
+@pytest.mark.parametrize("comprimir", [lambda b: b, gzip.compress, bz2.compress])
+def test_formatos_comprimidos(comprimir):
+    G = parse_graph_file(io.BytesIO(comprimir(OSM)))
+
+    assert sorted(G.nodes) == [1, 2, 3, 4]
+    assert G.number_of_edges() == 3
+    assert all(data["weight"] > 0 for _, _, data in G.edges(data=True))
+
+
+def test_archivo_demasiado_grande(monkeypatch):
+    monkeypatch.setattr(graph_loader, "MAX_UPLOAD_MB", 100 / (1024 * 1024))
+
+    with pytest.raises(UploadTooLargeError):
+        parse_graph_file(io.BytesIO(OSM))
+
+
+def test_no_quedan_archivos_temporales(monkeypatch, tmp_path):
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+    parse_graph_file(io.BytesIO(gzip.compress(OSM)))
+
+    assert not [name for name in os.listdir(tmp_path) if name.startswith("osm-upload-")]
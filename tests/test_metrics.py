@@ -0,0 +1,58 @@
+import pytest
+from prometheus_client.parser import text_string_to_metric_families
+
+import app.main as main
+from app.services.metrics import REGISTRY, reset_metrics, stage_timer
+
+
+def test_etapa_con_error_se_cuenta():
+    reset_metrics()
+    with pytest.raises(RuntimeError):
+        with stage_timer("prueba"):
+            raise RuntimeError("falla")
+
+    assert REGISTRY.get_sample_value("tsp_stage_duration_seconds_count", {"stage": "prueba"}) == 1
+    assert REGISTRY.get_sample_value("tsp_stage_failures_total", {"stage": "prueba"}) == 1
+
+
+def test_endpoint_metrics(client, monkeypatch):
+    reset_metrics()
+
+    class Matriz:
+        distances = [[0.0, 1.0], [1.0, 0.0]]
+        paths = [[[10], [10, 20]], [[20, 10], [20]]]
+
+    monkeypatch.setattr(main, "get_distance_matrix", lambda: Matriz())
+    monkeypatch.setattr(main, "get_selected_nodes", lambda: [10, 20])
+
+    assert client.get("/tsp/greedy").status_code == 200
+    assert client.delete("/stops/7").status_code in (400, 404)
+
+    respuesta = client.get("/metrics")
+    assert respuesta.status_code == 200
+    assert respuesta.headers["content-type"].startswith("text/plain; version=")
+    texto = respuesta.text
+    assert 'tsp_http_requests_total{method="GET",route="/tsp/greedy",status="200"} 1.0' in texto
+    # la ruta se identifica por su plantilla, no por la URL
+    assert 'route="/stops/{index}"' in texto
+    assert 'tsp_solver_duration_seconds_count{algorithm="greedy"} 1.0' in texto
+    for etapa in ("solve", "reconstruct_path", "serialize"):
+        assert f'tsp_stage_duration_seconds_count{{stage="{etapa}"}} 1.0' in texto
+    assert "# TYPE tsp_cache_hits_total counter" in texto
+    assert 'tsp_cache_misses_total{cache="results"}' in texto
+    assert "tsp_workspaces " in texto
+
+
+def test_exportacion_valida_para_el_parser_de_prometheus(client):
+    reset_metrics()
+    assert client.get("/cache/stats").status_code == 200
+
+    familias = {familia.name: familia for familia in text_string_to_metric_families(client.get("/metrics").text)}
+
+    # cada familia declarada tiene sus muestras (si el nombre no coincide el parser las separa como "unknown")
+    assert all(familia.type != "unknown" for familia in familias.values())
+    assert familias["tsp_http_requests"].type == "counter"
+    assert "tsp_http_requests_total" in {muestra.name for muestra in familias["tsp_http_requests"].samples}
+    assert familias["tsp_cache_hits"].type == "counter"
+    assert familias["tsp_http_request_duration_seconds"].type == "histogram"
+    assert familias["tsp_workspaces"].type == "gauge"
@@ -0,0 +1,67 @@
+import random
+
+import pytest
+from shapely.geometry import LineString, Point
+
+from app.services.process_nodes import insert_node_into_graph, process_points_into_graph
+from tests.conftest import grafo_malla, peso_unitario
+
+
+def _arista_mas_cercana(G, lat, lon):
+    # recorrido completo de todas las aristas (comportamiento de referencia)
+    punto = Point(lon, lat)
+    mejor, minimo = None, float("inf")
+    for u, v in G.edges():
+        linea = LineString([
+            (G.nodes[u]["longitude"], G.nodes[u]["latitude"]),
+            (G.nodes[v]["longitude"], G.nodes[v]["latitude"]),
+        ])
+        d = punto.distance(linea)
+        if d < minimo:
+            mejor, minimo = (u, v), d
+    return mejor
+
+
+def test_insertar_con_indice_igual_a_recorrido_completo():
+    G = grafo_malla(6, peso=peso_unitario)
+    rng = random.Random(5)
+    for k in range(40):
+        lat = rng.uniform(4.60, 4.605)
+        lon = rng.uniform(-74.07, -74.065)
+        u, v = _arista_mas_cercana(G, lat, lon)
+
+        nuevo = 1000 + k
+        insert_node_into_graph(G, nuevo, lat, lon)
+
+        assert set(G[nuevo]) == {u, v}
+
+
+def test_procesar_puntos_reutiliza_nodos_y_asigna_ids_consecutivos():
+    G = grafo_malla(6, peso=peso_unitario)
+    existente = G.nodes[7]
+
+    ids = process_points_into_graph(G, [
+        (existente["latitude"], existente["longitude"]),  # coordenadas exactas de un nodo
+        (4.6015, -74.0695),
+        (4.6035, -74.0675),
+    ])
+
+    assert ids == [7, 36, 37]
+
+
+def test_procesar_puntos_con_tolerancia():
+    G = grafo_malla(6, peso=peso_unitario)
+    cerca = (G.nodes[7]["latitude"] + 0.00002, G.nodes[7]["longitude"])  # ~2 m al norte del nodo 7
+
+    assert process_points_into_graph(G, [cerca], tolerance_m=5.0) == [7]
+    assert process_points_into_graph(G, [cerca], tolerance_m=1.0) == [36]
+
+
+def test_insertar_reparte_el_peso_de_la_arista():
+    G = grafo_malla(6, peso=peso_unitario)
+    G[0][1][0]["weight"] = 300.0  # p. ej. largo de la vía según osmnx
+
+    insert_node_into_graph(G, 1000, 4.6000, -74.06975)
+
+    assert G[0][1000][0]["weight"] == pytest.approx(75.0)
+    assert G[1000][1][0]["weight"] == pytest.approx(225.0)
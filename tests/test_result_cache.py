@@ -0,0 +1,70 @@
+import networkx as nx
+import pytest
+
+import app.services.result_cache as result_cache
+from app.models.tsp_result import TSPResult
+from app.services.distance_matrix import build_distance_matrix_with_paths
+from app.services.process_nodes import process_points_into_graph
+from app.services.result_cache import LRUCache
+
+
+@pytest.fixture(autouse=True)
+def caches_vacios():
+    result_cache.clear_caches()
+    yield
+    result_cache.clear_caches()
+
+
+def _grafo():
+    G = nx.MultiGraph()
+    for nid in range(4):
+        G.add_node(nid, latitude=4.60 + nid * 0.001, longitude=-74.07)
+    for nid in range(3):
+        G.add_edge(nid, nid + 1, weight=100.0)
+    return G
+
+
+def test_lru_por_cantidad_y_memoria():
+    cache = LRUCache(max_entries=2, max_bytes=10, size_of=len)
+    cache.put("a", "xx")
+    cache.put("b", "xx")
+    assert cache.get("a") == "xx"
+    cache.put("c", "xx")  # se elimina "b", el menos usado
+
+    assert cache.get("b") is None
+    cache.put("d", "x" * 9)  # por memoria quedan solo las más recientes
+    assert cache.get("a") is None and cache.get("d") == "x" * 9
+    assert cache.stats()["hits"] == 2
+    assert cache.stats()["misses"] == 2
+
+
+def test_matriz_se_invalida_al_cambiar_el_grafo():
+    G = _grafo()
+    matriz = build_distance_matrix_with_paths(G, [0, 3])
+    result_cache.store_matrix(G, [0, 3], matriz)
+    assert result_cache.get_cached_matrix(G, [0, 3]) is matriz
+    assert result_cache.get_cached_matrix(G, [3, 0]) is None
+
+    process_points_into_graph(G, [(4.6015, -74.07)])
+
+    assert result_cache.get_cached_matrix(G, [0, 3]) is None
+    assert result_cache.cache_stats()["matrices"]["entries"] == 1
+
+
+def test_resultados_por_huella_y_algoritmo():
+    G = _grafo()
+    matriz = build_distance_matrix_with_paths(G, [0, 1, 3])
+    misma = build_distance_matrix_with_paths(G, [0, 1, 3])
+    resultado = TSPResult(path=[0, 1, 2, 0], total_cost=600.0, execution_time=0.1, algorithmName="Greedy")
+
+    result_cache.store_result(matriz, "greedy", resultado)
+
+    assert result_cache.get_cached_result(misma, "greedy") is resultado
+    assert result_cache.get_cached_result(misma, "dynamic") is None
+    assert result_cache.get_cached_result(misma, "greedy", start_index=1) is None
+
+    class SinHuella:
+        distances = matriz.distances
+
+    result_cache.store_result(SinHuella(), "greedy", resultado)
+    assert result_cache.get_cached_result(SinHuella(), "greedy") is None
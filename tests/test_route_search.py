@@ -0,0 +1,72 @@
+import random
+
+import networkx as nx
+import pytest
+
+from app.services.route_search import find_route, get_route_search
+from tests.conftest import grafo_malla, peso_recta
+
+
+@pytest.mark.parametrize("dirigido", [False, True])
+@pytest.mark.parametrize("algoritmo", ["astar", "bidirectional"])
+def test_igual_a_networkx(dirigido, algoritmo):
+    G = grafo_malla(15, peso=peso_recta, dirigido=dirigido, semilla=4)
+    rng = random.Random(9)
+    for _ in range(30):
+        s, t = rng.sample(list(G.nodes), 2)
+        distancia, camino, visitados = find_route(G, s, t, algoritmo)
+
+        assert distancia == pytest.approx(nx.shortest_path_length(G, s, t, weight="weight"))
+        assert camino[0] == s and camino[-1] == t
+        costo = sum(min(d["weight"] for d in G[a][b].values()) for a, b in zip(camino, camino[1:]))
+        assert costo == pytest.approx(distancia)
+
+
+def test_astar_visita_menos_nodos():
+    G = grafo_malla(30, peso=peso_recta, semilla=4)
+    _, _, visitados = find_route(G, 0, 31, "astar")
+    assert visitados < 60
+
+
+def test_sin_camino_y_nodo_mas_cercano():
+    G = grafo_malla(3, peso=peso_recta, semilla=4)
+    G.add_node(100, latitude=5.0, longitude=-75.0)
+
+    assert find_route(G, 0, 100) == (float("inf"), [], 9)
+    assert get_route_search(G).nearest_node(4.6011, -74.0689) == 4
+    with pytest.raises(ValueError):
+        find_route(G, 0, 1, "dijkstra")
+
+
+def test_ruta_endpoint(monkeypatch):
+    from fastapi.testclient import TestClient
+
+    import app.main as main
+
+    G = grafo_malla(4, peso=peso_recta, semilla=4)
+    monkeypatch.setattr(main, "get_graph", lambda: G)
+    client = TestClient(main.app)
+
+    response = client.get("/route", params={"from_lat": 4.6, "from_lon": -74.07, "to_lat": 4.603, "to_lon": -74.067})
+    assert response.status_code == 200
+    data = response.json()
+    assert (data["source"], data["target"]) == (0, 15)
+    assert data["distance"] == pytest.approx(nx.shortest_path_length(G, 0, 15, weight="weight"))
+
+    assert client.get("/route", params={"source": 0}).status_code == 400
+
+
+def test_astar_con_nodos_sin_coordenadas():
+    G = grafo_malla(15, peso=peso_recta, semilla=4)
+    rng = random.Random(12)
+    # nodos sin coordenadas (p. ej. creados a mano): su cota debe ser 0, no la distancia a (0, 0)
+    for nid in rng.sample(list(G.nodes), 60):
+        G.nodes[nid]["latitude"] = None
+        G.nodes[nid]["longitude"] = None
+
+    for _ in range(30):
+        s, t = rng.sample(list(G.nodes), 2)
+        distancia, camino, _ = find_route(G, s, t, "astar")
+
+        assert distancia == pytest.approx(nx.shortest_path_length(G, s, t, weight="weight"))
+        assert camino[0] == s and camino[-1] == t
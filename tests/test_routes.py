@@ -1,7 +1,15 @@
 import io
+import multiprocessing
 import os
+import threading
+import time
 import pytest
+import networkx as nx
 
+from app.models.distance_matrix_result import DistanceMatrixResult
+from app.services.jobs import raise_if_cancelled, submit_job
+from app.services.tsp_solver import solve_tsp_portfolio
+import app.services.graph_loader as graph_loader
 import app.main as main  # <-- Importa el módulo donde están los endpoints
 from app.main import app
 from fastapi.testclient import TestClient
@@ -21,7 +29,7 @@ def test_upload_graph_extensión_invalida(client):
         files={"file": ("points.txt", fake_file, "text/plain")}
     )
     assert response.status_code == 400
-    assert response.json()["detail"] == "Only .osm files are supported"
+    assert response.json()["detail"] == "Only .osm, .osm.gz, .osm.bz2, .osm.pbf files are supported"
 
 
 def test_upload_graph_ok(client, monkeypatch):
@@ -45,10 +53,35 @@ def test_upload_graph_ok(client, monkeypatch):
     assert response.json() == {"nodes": 123, "edges": 456}
 
 
+def test_upload_graph_comprimido_y_demasiado_grande(client, monkeypatch):
+    def demasiado_grande(f):
+        raise main.UploadTooLargeError("File exceeds the maximum size of 1 MB.")
+
+    monkeypatch.setattr(main, "load_graph_from_file", demasiado_grande)
+
+    response = client.post(
+        "/upload-graph",
+        files={"file": ("chapinero.osm.gz", io.BytesIO(b"\x1f\x8b"), "application/gzip")}
+    )
+    assert response.status_code == 413
+    assert "maximum size" in response.json()["detail"]
+
+
+def test_job_upload_graph_demasiado_grande_responde_413(client, monkeypatch):
+    monkeypatch.setattr(graph_loader, "MAX_UPLOAD_MB", 1 / 1024)
+
+    response = client.post(
+        "/jobs/upload-graph",
+        files={"file": ("grande.osm", io.BytesIO(b"x" * 2048), "application/xml")}
+    )
+    assert response.status_code == 413
+    assert "maximum size" in response.json()["detail"]
+
+
 # --- Pruebas para /graph-data ---
 def test_graph_data_success(client, monkeypatch):
     esperado = {"nodes": [1, 2, 3], "edges": []}
-    monkeypatch.setattr(main, "get_graph_data", lambda: esperado)
+    monkeypatch.setattr(main, "get_graph_data", lambda **opciones: esperado)
 
     response = client.get("/graph-data")
     assert response.status_code == 200
@@ -59,7 +92,7 @@ def test_graph_data_error(client, monkeypatch):
     monkeypatch.setattr(
         main,
         "get_graph_data",
-        lambda: (_ for _ in ()).throw(Exception("fail"))
+        lambda **opciones: (_ for _ in ()).throw(Exception("fail"))
     )
 
     response = client.get("/graph-data")
@@ -84,10 +117,13 @@ def setup_tsp(monkeypatch):
         path = [0, 1]
         total_cost = 1.23
         execution_time = 0.004
+        provenOptimal = True
 
     monkeypatch.setattr(main, "solve_tsp_brute_force", lambda d: Resultado())
     monkeypatch.setattr(main, "solve_tsp_greedy", lambda d: Resultado())
     monkeypatch.setattr(main, "solve_tsp_dynamic_programming", lambda d: Resultado())
+    monkeypatch.setattr(main, "solve_tsp_branch_and_bound", lambda d: Resultado())
+    monkeypatch.setattr(main, "solve_tsp_local_search", lambda d: Resultado())
     monkeypatch.setattr(main, "reconstruct_full_path", lambda path, paths: [])
 
 
@@ -111,6 +147,18 @@ def test_tsp_dynamic(client):
     assert r.status_code == 200
     assert r.json()["status"] == "success"
 
+
+def test_tsp_branch_and_bound(client):
+    r = client.get("/tsp/branch-and-bound")
+    assert r.status_code == 200
+    assert r.json()["result"]["path"] == [10, 20]
+
+
+def test_tsp_local_search(client):
+    r = client.get("/tsp/local-search")
+    assert r.status_code == 200
+    assert r.json()["result"]["path"] == [10, 20]
+
 @pytest.mark.parametrize("returned_nodes", [
     [],                # 0 nodos
     [42],              # 1 nodo
@@ -167,7 +215,7 @@ def test_build_matrix_varias_cantidades(client, monkeypatch, selected_nodes, exp
     ([3,5,7],      [2,0,1],     [7,3,5]),        
     ([100,200,300,400], [3,1,2,0], [400,200,300,100]),
 ])
-@pytest.mark.parametrize("endpoint", ["/tsp/brute-force", "/tsp/greedy", "/tsp/dynamic"])
+@pytest.mark.parametrize("endpoint", ["/tsp/brute-force", "/tsp/greedy", "/tsp/dynamic", "/tsp/branch-and-bound", "/tsp/local-search"])
 def test_tsp_varias_cantidades(client, monkeypatch, nodes, fake_path, expected_mapped, endpoint):
     class FakeMatrix:
         distances = []
@@ -180,15 +228,125 @@ def test_tsp_varias_cantidades(client, monkeypatch, nodes, fake_path, expected_m
         path = fake_path
         total_cost = 99.9
         execution_time = 0.123
+        provenOptimal = True
 
     if "brute-force" in endpoint:
         monkeypatch.setattr(main, "solve_tsp_brute_force", lambda d: Resultado())
     elif "greedy" in endpoint:
         monkeypatch.setattr(main, "solve_tsp_greedy", lambda d: Resultado())
+    elif "branch-and-bound" in endpoint:
+        monkeypatch.setattr(main, "solve_tsp_branch_and_bound", lambda d: Resultado())
+    elif "local-search" in endpoint:
+        monkeypatch.setattr(main, "solve_tsp_local_search", lambda d: Resultado())
     else:
         monkeypatch.setattr(main, "solve_tsp_dynamic_programming", lambda d: Resultado())
 
     r = client.get(endpoint)
     assert r.status_code == 200
     assert r.json()["status"] == "success"
-    assert r.json()["result"]["path"] == expected_mapped
\ No newline at end of file
+    assert r.json()["result"]["path"] == expected_mapped
+
+# --- Trabajos en segundo plano ---
+def test_job_tsp_termina_con_el_resultado(client):
+    r = client.post("/jobs/tsp/greedy")
+    assert r.status_code == 200
+    job_id = r.json()["jobId"]
+
+    r = client.get(f"/jobs/{job_id}", params={"wait": 5})
+    assert r.status_code == 200
+    body = r.json()
+    assert body["status"] == "succeeded"
+    assert body["result"]["result"]["path"] == [10, 20]
+
+
+def test_job_build_matrix(client, monkeypatch):
+    guardadas = []
+    G = nx.MultiGraph()
+    monkeypatch.setattr(main, "get_graph", lambda: G)
+    matriz = DistanceMatrixResult(distances=[[0, 1], [1, 0]], paths=[])
+    monkeypatch.setattr(main, "build_distance_matrix_with_paths", lambda G, ns: matriz)
+    monkeypatch.setattr(main, "set_distance_matrix", guardadas.append)
+
+    job_id = client.post("/jobs/build-matrix").json()["jobId"]
+    body = client.get(f"/jobs/{job_id}", params={"wait": 5}).json()
+
+    assert body["status"] == "succeeded"
+    assert body["result"] == {"status": "success", "numPoints": 2}
+    assert guardadas == [matriz]
+
+
+def test_job_build_matrix_descarta_la_matriz_si_cambian_los_puntos(client, monkeypatch):
+    guardadas = []
+    G = nx.MultiGraph()
+    seleccionados = [10, 20]
+    monkeypatch.setattr(main, "get_graph", lambda: G)
+    monkeypatch.setattr(main, "get_selected_nodes", lambda: seleccionados)
+    monkeypatch.setattr(main, "set_distance_matrix", guardadas.append)
+
+    #mientras se calcula la matriz llega un POST /stops que agrega un punto
+    def calcular(G, ns):
+        seleccionados.append(30)
+        return DistanceMatrixResult(distances=[[0, 1], [1, 0]], paths=[])
+
+    monkeypatch.setattr(main, "build_distance_matrix_with_paths", calcular)
+
+    job_id = client.post("/jobs/build-matrix").json()["jobId"]
+    body = client.get(f"/jobs/{job_id}", params={"wait": 5}).json()
+
+    assert body["status"] == "failed"
+    assert "Stale" in body["error"]
+    assert guardadas == []
+
+
+def test_job_algoritmo_desconocido(client):
+    r = client.post("/jobs/tsp/no-existe")
+    assert r.status_code == 404
+
+
+def test_job_inexistente(client):
+    assert client.get("/jobs/no-existe").status_code == 404
+    assert client.delete("/jobs/no-existe").status_code == 404
+
+
+def test_cancelar_trabajo_en_curso_lo_detiene(client):
+    empezo = threading.Event()
+
+    def calcular():
+        empezo.set()
+        while True:
+            raise_if_cancelled()
+            time.sleep(0.01)
+
+    job = submit_job("prueba", calcular)
+    assert empezo.wait(5)
+
+    # mientras no llega a un punto de cancelación sigue en curso
+    body = client.delete(f"/jobs/{job.id}").json()
+    assert body["status"] in ("running", "cancelled")
+
+    body = client.get(f"/jobs/{job.id}", params={"wait": 5}).json()
+    assert body["status"] == "cancelled"
+    assert "result" not in body
+
+
+def test_cancelar_portafolio_termina_sus_procesos(client):
+    matriz = [[abs(i - j) + (i * j) % 7 for j in range(60)] for i in range(60)]
+    job = submit_job("prueba", lambda: solve_tsp_portfolio(matriz, time_budget_s=60, workers=2))
+    time.sleep(0.5)
+    inicio = time.perf_counter()
+    client.delete(f"/jobs/{job.id}")
+
+    body = client.get(f"/jobs/{job.id}", params={"wait": 10}).json()
+    assert body["status"] == "cancelled"
+    assert time.perf_counter() - inicio < 5
+    assert multiprocessing.active_children() == []
+
+
+def test_tsp_dynamic_parallel_rechaza_lo_que_no_cabe(client):
+    r = client.get("/tsp/dynamic-parallel", params={"memory_budget_mb": 0.00001})
+    assert r.status_code == 413
+    assert "MB" in r.json()["detail"]
+
+    r = client.get("/tsp/dynamic-parallel", params={"workers": 2})
+    assert r.status_code == 200
+    assert r.json()["result"]["provenOptimal"]
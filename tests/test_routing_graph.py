@@ -0,0 +1,35 @@
+import networkx as nx
+
+from app.services.routing_graph import get_routing_graph, mark_graph_modified, shortest_path
+
+
+def _grafo():
+    G = nx.MultiGraph()
+    for nid, (lat, lon) in {10: (0.0, 0.0), 20: (0.0, 1.0), 30: (1.0, 1.0)}.items():
+        G.add_node(nid, latitude=lat, longitude=lon)
+    G.add_edge(10, 20, weight=7.0)
+    G.add_edge(10, 20, weight=3.0)  # arista paralela más corta
+    G.add_edge(20, 30, weight=4.0)
+    G.add_edge(30, 30, weight=0.0)  # lazo
+    return G
+
+
+def test_csr_deja_la_arista_paralela_mas_corta_y_sin_lazos():
+    routing = get_routing_graph(_grafo())
+
+    assert routing.node_ids.tolist() == [10, 20, 30]
+    assert routing.offsets.tolist() == [0, 1, 3, 4]
+    assert routing.neighbors.tolist() == [1, 0, 2, 1]
+    assert routing.weights.tolist() == [3.0, 3.0, 4.0, 4.0]
+
+
+def test_csr_se_reconstruye_cuando_cambia_el_grafo():
+    G = _grafo()
+    assert shortest_path(G, 10, 30) == (7.0, [10, 20, 30])
+
+    G.add_node(40, latitude=0.5, longitude=0.5)
+    G.add_edge(10, 40, weight=1.0)
+    G.add_edge(40, 30, weight=1.0)
+    mark_graph_modified(G)
+
+    assert shortest_path(G, 10, 30) == (2.0, [10, 40, 30])
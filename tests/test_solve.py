@@ -0,0 +1,98 @@
+import random
+
+import numpy as np
+import pytest
+
+import app.services.workspaces as workspaces
+from app.services.distance_matrix import build_distance_matrix_with_paths, get_distance_matrix
+from app.services.graph_loader import get_graph, set_graph
+from app.services.process_nodes import get_selected_nodes, process_points_into_graph
+from app.services.routing_graph import get_graph_version
+from app.services.solve import build_stops_matrix
+from app.services.tsp_solver import solve_tsp_dynamic_programming
+from app.services.workspaces import copy_graph
+from tests.conftest import grafo_malla, peso_recta
+
+
+@pytest.fixture(autouse=True)
+def almacen_vacio(monkeypatch):
+    monkeypatch.setattr(workspaces, "_workspaces", workspaces.OrderedDict())
+
+
+def _puntos(cantidad, semilla=5):
+    rng = random.Random(semilla)
+    return [(4.60 + rng.uniform(0, 0.007), -74.07 + rng.uniform(0, 0.007)) for _ in range(cantidad)]
+
+
+def test_matriz_igual_a_insertar_los_puntos():
+    G = grafo_malla(8, peso=peso_recta)
+    # dos puntos sobre la misma arista, uno repetido y uno sobre un nodo
+    puntos = _puntos(8) + [(4.60, -74.0697), (4.60, -74.0694), (4.60, -74.0697)]
+    puntos.append((G.nodes[9]["latitude"], G.nodes[9]["longitude"]))
+    version = get_graph_version(G)
+
+    paradas, matriz = build_stops_matrix(G, puntos)
+
+    # el grafo no cambia
+    assert get_graph_version(G) == version and G.number_of_nodes() == 64
+    assert not paradas[-1].virtual and paradas[-1].node_id == 9
+    assert paradas[8].node_id == paradas[10].node_id
+
+    H = copy_graph(G)
+    nodos = process_points_into_graph(H, puntos)
+    esperada = build_distance_matrix_with_paths(H, nodos)
+    assert np.allclose(matriz.distances, esperada.distances)
+    for a in range(len(puntos)):
+        for b in range(len(puntos)):
+            camino = matriz.paths[a][b]
+            assert camino[0] == paradas[a].node_id and camino[-1] == paradas[b].node_id
+
+
+def test_solve_json_sin_modificar_el_workspace(client):
+    G = grafo_malla(8, peso=peso_recta)
+    set_graph(G)
+    puntos = _puntos(6)
+
+    respuesta = client.post("/solve", json={
+        "stops": [[lat, lon] for lat, lon in puntos[:3]] + [{"lat": lat, "lon": lon} for lat, lon in puntos[3:]],
+        "algorithm": "dynamic",
+        "start": 2,
+    })
+
+    assert respuesta.status_code == 200
+    datos = respuesta.json()
+    orden = datos["result"]["order"]
+    assert orden[0] == orden[-1] == 2 and sorted(orden[:-1]) == list(range(6))
+    assert datos["fullPath"][0] == datos["stops"][2]["nodeId"]
+    assert len(datos["fullPathCoordinates"]) == len(datos["fullPath"])
+    assert datos["fullPathCoordinates"][0] == [datos["stops"][2]["latitude"], datos["stops"][2]["longitude"]]
+
+    # el mismo costo que el flujo por pasos (óptimo con programación dinámica)
+    H = copy_graph(G)
+    nodos = process_points_into_graph(H, puntos)
+    esperado = solve_tsp_dynamic_programming(build_distance_matrix_with_paths(H, nodos).distances)
+    assert datos["result"]["total_cost"] == pytest.approx(esperado.total_cost)
+
+    assert get_graph() is G and G.number_of_nodes() == 64
+    assert get_selected_nodes() == []
+    with pytest.raises(ValueError):
+        get_distance_matrix()
+
+
+def test_solve_con_archivo_y_errores(client):
+    set_graph(grafo_malla(8, peso=peso_recta))
+    texto = "\n".join(f"{lat} {lon}" for lat, lon in _puntos(5)).encode()
+
+    respuesta = client.post("/solve", files={"file": ("puntos.txt", texto)}, data={"algorithm": "greedy"})
+    assert respuesta.status_code == 200
+    assert respuesta.json()["numPoints"] == 5
+
+    respuesta = client.post("/solve", json={"stops": _puntos(5), "algorithm": "auto", "timeBudget": 2})
+    assert respuesta.status_code == 200
+    assert respuesta.json()["result"]["provenOptimal"]
+    assert client.post("/solve", json={"stops": _puntos(5), "algorithm": "auto", "timeBudget": 0}).status_code == 400
+
+    assert client.post("/solve", json={"stops": [[4.6, -74.07]]}).status_code == 400
+    assert client.post("/solve", json={"stops": _puntos(3), "algorithm": "otro"}).status_code == 400
+    assert client.post("/solve", json={"stops": _puntos(3), "start": 3}).status_code == 400
+    assert client.post("/solve", json={"stops": [["a", "b"], [1, 2]]}).status_code == 400
@@ -0,0 +1,213 @@
+import multiprocessing
+import random
+
+import numpy as np
+import pytest
+
+from app.services.tsp_solver import solve_tsp_branch_and_bound, solve_tsp_brute_force, solve_tsp_dynamic_programming
+from app.services.tsp_solver import solve_tsp_greedy, solve_tsp_local_search
+from app.services.tsp_solver import _branch_and_bound, estimate_tsp_cost, solve_tsp_auto, solve_tsp_portfolio
+from app.services.tsp_solver import HeldKarpTooLargeError, solve_tsp_dynamic_programming_parallel
+
+
+def _matriz_euclidiana(n, semilla):
+    rng = random.Random(semilla)
+    puntos = [(rng.random() * 1000, rng.random() * 1000) for _ in range(n)]
+    return [[((a[0] - b[0]) ** 2 + (a[1] - b[1]) ** 2) ** 0.5 for b in puntos] for a in puntos]
+
+
+def _es_recorrido_valido(path, n, inicio):
+    return path[0] == inicio and path[-1] == inicio and sorted(path[:-1]) == list(range(n))
+
+
+@pytest.mark.parametrize("n", [2, 3, 5, 8])
+@pytest.mark.parametrize("inicio", [0, 1])
+def test_held_karp_igual_a_fuerza_bruta(n, inicio):
+    matriz = _matriz_euclidiana(n, semilla=n)
+
+    esperado = solve_tsp_brute_force(matriz, inicio)
+    resultado = solve_tsp_dynamic_programming(matriz, inicio)
+
+    assert _es_recorrido_valido(resultado.path, n, inicio)
+    assert resultado.total_cost == pytest.approx(esperado.total_cost)
+
+
+def test_held_karp_float32():
+    matriz = _matriz_euclidiana(9, semilla=4)
+
+    esperado = solve_tsp_dynamic_programming(matriz)
+    resultado = solve_tsp_dynamic_programming(matriz, dtype=np.float32)
+
+    assert resultado.total_cost == pytest.approx(esperado.total_cost, rel=1e-6)
+
+
+def test_held_karp_con_caminos_inexistentes():
+    inf = float("inf")
+    matriz = [
+        [0, 1, inf, 1],
+        [1, 0, 1, inf],
+        [inf, 1, 0, 1],
+        [1, inf, 1, 0],
+    ]
+
+    resultado = solve_tsp_dynamic_programming(matriz)
+
+    assert _es_recorrido_valido(resultado.path, 4, 0)
+    assert resultado.total_cost == 4
+
+
+@pytest.mark.parametrize("n", [2, 3, 6, 9])
+@pytest.mark.parametrize("asimetrica", [False, True])
+def test_ramificacion_y_poda_igual_a_fuerza_bruta(n, asimetrica):
+    matriz = _matriz_euclidiana(n, semilla=n + 20)
+    if asimetrica:
+        rng = random.Random(n)
+        matriz = [[c * (1 + 0.5 * rng.random()) for c in fila] for fila in matriz]
+
+    esperado = solve_tsp_brute_force(matriz, 1 % n)
+    resultado = solve_tsp_branch_and_bound(matriz, 1 % n)
+
+    assert _es_recorrido_valido(resultado.path, n, 1 % n)
+    assert resultado.total_cost == pytest.approx(esperado.total_cost)
+
+
+def test_ramificacion_y_poda_igual_a_held_karp():
+    matriz = _matriz_euclidiana(14, semilla=3)
+
+    esperado = solve_tsp_dynamic_programming(matriz)
+    resultado = solve_tsp_branch_and_bound(matriz)
+
+    assert resultado.total_cost == pytest.approx(esperado.total_cost)
+
+
+@pytest.mark.parametrize("n", [2, 4, 7, 60, 300])
+def test_busqueda_local_mejora_el_greedy(n):
+    matriz = _matriz_euclidiana(n, semilla=n)
+
+    greedy = solve_tsp_greedy(matriz, 1 % n)
+    resultado = solve_tsp_local_search(matriz, 1 % n, neighbors=5)
+
+    assert _es_recorrido_valido(resultado.path, n, 1 % n)
+    assert resultado.total_cost <= greedy.total_cost + 1e-9
+
+
+def test_busqueda_local_llega_al_optimo_en_instancia_pequena():
+    matriz = _matriz_euclidiana(8, semilla=2)
+
+    esperado = solve_tsp_brute_force(matriz)
+    resultado = solve_tsp_local_search(matriz, initial_path=[0, 7, 6, 5, 4, 3, 2, 1, 0])
+
+    assert resultado.total_cost == pytest.approx(esperado.total_cost)
+
+
+def test_automatico_exacto_si_cabe_en_el_presupuesto():
+    matriz = _matriz_euclidiana(10, semilla=31)
+    optimo = solve_tsp_dynamic_programming(matriz).total_cost
+
+    resultado = solve_tsp_auto(matriz, 2, time_budget_s=5)
+    assert resultado.provenOptimal and "Held-Karp" in resultado.algorithmName
+    assert _es_recorrido_valido(resultado.path, 10, 2)
+    assert resultado.total_cost == pytest.approx(optimo)
+
+    # sin memoria para las tablas de Held-Karp ni tiempo para fuerza bruta: ramificación y poda lo prueba
+    assert estimate_tsp_cost("dynamic", 10)[1] > 0.01 * 1024 * 1024
+    resultado = solve_tsp_auto(matriz, time_budget_s=0.01, memory_budget_mb=0.01)
+    assert resultado.provenOptimal and resultado.algorithmName == "Automatico: Ramificacion y poda"
+    assert resultado.total_cost == pytest.approx(optimo)
+
+
+def test_automatico_respeta_el_limite_de_tiempo():
+    matriz = _matriz_euclidiana(120, semilla=32)
+    busqueda_local = solve_tsp_local_search(matriz, 5)
+
+    resultado = solve_tsp_auto(matriz, 5, time_budget_s=0.3)
+
+    assert not resultado.provenOptimal
+    assert _es_recorrido_valido(resultado.path, 120, 5)
+    assert resultado.execution_time < 1.0
+    assert resultado.total_cost <= busqueda_local.total_cost + 1e-9
+
+
+def test_ramificacion_y_poda_con_limite_vencido():
+    matriz = _matriz_euclidiana(14, semilla=33)
+    inicial = solve_tsp_greedy(matriz).path
+
+    camino, costo, termino = _branch_and_bound(matriz, 0, inicial, sum(
+        matriz[a][b] for a, b in zip(inicial, inicial[1:])), deadline=0.0)
+
+    assert not termino and camino == inicial
+
+
+def test_portafolio_prueba_el_optimo():
+    matriz = _matriz_euclidiana(12, semilla=34)
+    optimo = solve_tsp_dynamic_programming(matriz).total_cost
+
+    resultado = solve_tsp_portfolio(matriz, 3, time_budget_s=20, workers=2)
+
+    assert resultado.provenOptimal and resultado.algorithmName.startswith("Portafolio: ")
+    assert _es_recorrido_valido(resultado.path, 12, 3)
+    assert resultado.total_cost == pytest.approx(optimo)
+    assert multiprocessing.active_children() == []
+
+
+def test_portafolio_se_detiene_al_acabar_el_tiempo():
+    matriz = _matriz_euclidiana(80, semilla=35)
+
+    resultado = solve_tsp_portfolio(matriz, time_budget_s=0.5, workers=2)
+
+    assert not resultado.provenOptimal
+    assert _es_recorrido_valido(resultado.path, 80, 0)
+    assert resultado.execution_time < 0.5 + 3.0
+    assert resultado.total_cost <= solve_tsp_greedy(matriz).total_cost + 1e-9
+    assert multiprocessing.active_children() == []
+
+
+def test_ramificacion_y_poda_usa_la_cota_compartida():
+    matriz = _matriz_euclidiana(11, semilla=36)
+    optimo = solve_tsp_dynamic_programming(matriz).total_cost
+    inicial = solve_tsp_greedy(matriz).path
+
+    class Compartido:
+        detenido = False
+        ofertas = []
+
+        def best_cost(self):
+            return optimo
+
+        def offer(self, costo, camino):
+            self.ofertas.append(costo)
+            return min(costo, optimo)
+
+        def stopped(self):
+            return self.detenido
+
+    # con el óptimo como cota ningún recorrido propio lo mejora, pero la búsqueda termina (lo prueba)
+    compartido = Compartido()
+    _, _, termino = _branch_and_bound(matriz, 0, inicial, float("inf"), shared=compartido)
+    assert termino and all(costo >= optimo - 1e-9 for costo in compartido.ofertas)
+
+    compartido.detenido = True
+    assert not _branch_and_bound(matriz, 0, inicial, float("inf"), shared=compartido)[2]
+
+
+@pytest.mark.parametrize("inicio", [0, 4])
+def test_held_karp_paralelo_igual_al_secuencial(inicio):
+    matriz = _matriz_euclidiana(15, semilla=37)
+
+    esperado = solve_tsp_dynamic_programming(matriz, inicio)
+    resultado = solve_tsp_dynamic_programming_parallel(matriz, inicio, workers=3)
+
+    assert resultado.algorithmName == "Programacion Dinamica paralela (Held-Karp)" and resultado.provenOptimal
+    assert resultado.path == esperado.path
+    assert resultado.total_cost == pytest.approx(esperado.total_cost)
+    assert multiprocessing.active_children() == []
+
+
+def test_held_karp_paralelo_rechaza_lo_que_no_cabe():
+    segundos, memoria = estimate_tsp_cost("dynamic", 15, workers=4)
+    assert memoria > estimate_tsp_cost("dynamic", 15)[1] and segundos < estimate_tsp_cost("dynamic", 15)[0]
+
+    with pytest.raises(HeldKarpTooLargeError):
+        solve_tsp_dynamic_programming_parallel(_matriz_euclidiana(30, semilla=38), workers=2)
+    with pytest.raises(HeldKarpTooLargeError):
+        solve_tsp_dynamic_programming_parallel(_matriz_euclidiana(15, semilla=38), workers=2, memory_budget_mb=1)
@@ -0,0 +1,140 @@
+import io
+
+import networkx as nx
+import pytest
+from fastapi.testclient import TestClient
+
+import app.services.workspaces as workspaces
+from app.main import app
+from app.models.distance_matrix_result import DistanceMatrixResult
+from app.services.distance_matrix import get_distance_matrix, set_distance_matrix
+from app.services.edge_index import get_edge_index
+from app.services.coordinate_index import get_coordinate_index
+from app.services.graph_loader import get_graph, set_graph
+from app.services.process_nodes import get_selected_nodes, load_points_from_uploaded_file
+from tests.conftest import en_workspace
+
+
+@pytest.fixture(autouse=True)
+def almacen_vacio(monkeypatch):
+    monkeypatch.setattr(workspaces, "_workspaces", workspaces.OrderedDict())
+
+
+MATRIZ = DistanceMatrixResult(distances=[[0.0, 1.0], [1.0, 0.0]], paths=[[[5], [5, 6]], [[6, 5], [6]]])
+
+
+def _grafo_cuadrado():
+    G = nx.MultiGraph()
+    coords = {1: (0.0, 0.0), 2: (0.0, 0.001), 3: (0.001, 0.001), 4: (0.001, 0.0)}
+    for nid, (lat, lon) in coords.items():
+        G.add_node(nid, latitude=lat, longitude=lon, y=lat, x=lon)
+    for u, v in [(1, 2), (2, 3), (3, 4), (4, 1)]:
+        G.add_edge(u, v, weight=111.0)
+    get_edge_index(G)
+    get_coordinate_index(G)
+    return G
+
+
+def test_workspaces_aislados():
+    base = _grafo_cuadrado()
+
+    token = en_workspace("a")
+    set_graph(base)
+    nodos_a = load_points_from_uploaded_file(io.BytesIO(b"0.0 0.0005\n0.0005 0.001\n"), get_graph())
+    set_distance_matrix(MATRIZ)
+    workspaces.reset_current_workspace_id(token)
+
+    token = en_workspace("b")
+    set_graph(base)
+    assert get_selected_nodes() == []
+    with pytest.raises(ValueError):
+        get_distance_matrix()
+    # el grafo base no se modifica, el workspace "a" trabaja sobre una copia
+    assert get_graph() is base
+    assert base.number_of_nodes() == 4
+    workspaces.reset_current_workspace_id(token)
+
+    token = en_workspace("a")
+    assert get_selected_nodes() == nodos_a == [5, 6]
+    assert get_graph().number_of_nodes() == 6
+    assert get_distance_matrix() is MATRIZ
+    workspaces.reset_current_workspace_id(token)
+
+
+def test_cargar_grafo_borra_puntos_y_matriz():
+    token = en_workspace("a")
+    set_graph(_grafo_cuadrado())
+    load_points_from_uploaded_file(io.BytesIO(b"0.0 0.0005\n"), get_graph())
+    set_distance_matrix(MATRIZ)
+
+    set_graph(_grafo_cuadrado())
+    assert get_selected_nodes() == []
+    with pytest.raises(ValueError):
+        get_distance_matrix()
+    workspaces.reset_current_workspace_id(token)
+
+
+def test_desalojo_por_cantidad(monkeypatch):
+    monkeypatch.setattr(workspaces, "WORKSPACE_LIMIT", 2)
+    creados = [workspaces.create_workspace().id for _ in range(3)]
+
+    assert [workspaces.workspace_exists(workspace_id) for workspace_id in creados] == [False, True, True]
+
+
+def test_rutas_workspaces():
+    client = TestClient(app)
+    workspace_id = client.post("/workspaces").json()["workspaceId"]
+
+    response = client.get("/build-matrix", headers={"X-Workspace-Id": workspace_id})
+    assert response.status_code == 500
+    assert "No graph" in response.json()["detail"]
+
+    response = client.get("/workspaces/current", headers={"X-Workspace-Id": workspace_id})
+    assert response.json()["workspaceId"] == workspace_id
+    # no hay un listado con los ids de los demás
+    assert client.get("/workspaces").status_code == 405
+
+    assert client.delete(f"/workspaces/{workspace_id}").status_code == 200
+    assert client.delete(f"/workspaces/{workspace_id}").status_code == 404
+    response = client.get("/graph-data", headers={"X-Workspace-Id": workspace_id})
+    assert response.status_code == 404
+
+
+def test_id_desconocido_no_crea_workspace(monkeypatch):
+    client = TestClient(app)
+    monkeypatch.setattr(workspaces, "WORKSPACE_LIMIT", 2)
+    propio = client.post("/workspaces").json()["workspaceId"]
+
+    # ids inventados: 404 sin crear workspaces ni desalojar el propio
+    for i in range(5):
+        response = client.get("/build-matrix", headers={"X-Workspace-Id": f"inventado-{i}"})
+        assert response.status_code == 404
+    assert workspaces.workspace_exists(propio)
+    assert not workspaces.workspace_exists("inventado-0")
+
+    # sin encabezado se sigue usando el workspace por defecto
+    assert client.get("/workspaces/current").json()["workspaceId"] == workspaces.DEFAULT_WORKSPACE_ID
+
+
+def test_rutas_agregar_y_quitar_puntos():
+    client = TestClient(app)
+    encabezados = {"X-Workspace-Id": "rutas"}
+    token = en_workspace("rutas")
+    set_graph(_grafo_cuadrado())
+    workspaces.reset_current_workspace_id(token)
+
+    puntos = io.BytesIO(b"0.0 0.0005\n0.0005 0.001\n")
+    client.post("/upload-points", files={"file": ("p.txt", puntos, "text/plain")}, headers=encabezados)
+    assert client.get("/build-matrix", headers=encabezados).status_code == 200
+
+    response = client.post("/stops", params={"lat": 0.001, "lon": 0.0005}, headers=encabezados)
+    assert response.status_code == 200
+    assert response.json()["index"] == 2
+
+    assert client.delete("/stops/0", headers=encabezados).json()["numPoints"] == 2
+    assert client.delete("/stops/5", headers=encabezados).status_code == 404
+
+    token = en_workspace("rutas")
+    assert get_selected_nodes() == [6, 7]
+    assert len(get_distance_matrix().distances) == 2
+    workspaces.reset_current_workspace_id(token)